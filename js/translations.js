@@ -30,6 +30,9 @@ const available_langs = {
   "zh_tw": { "name": "中文(繁)", "file": "zh_tw.json", "direction": "ltr"}
 };
 
+// Pruned bundles written by scripts/build_translation_bundles.py, if the page links a manifest
+let lang_manifest = null;
+
 // Translation state - will be imported from core.js app object
 let translationState = null;
 let welcomeModal = null;
@@ -143,9 +146,28 @@ export function l(text) {
   return text;
 }
 
-function lang_translate(target_file, target_lang, target_direction) {
+async function lang_bundle_file(target_file, target_lang) {
+  if(lang_manifest === null) {
+    // Only builds processed by build_translation_bundles.py have a manifest, and they point at it
+    const manifest_url = $('meta[name="lang-manifest"]').attr('content');
+    lang_manifest = {};
+    if(manifest_url) {
+      try {
+        const manifest = await $.getJSON(manifest_url);
+        lang_manifest = manifest.languages || {};
+      } catch (error) {
+        console.log("Cannot load " + manifest_url + ", using the full language files");
+      }
+    }
+  }
+  const bundle = lang_manifest[target_lang];
+  return bundle ? bundle.file : target_file;
+}
+
+async function lang_translate(target_file, target_lang, target_direction) {
+  const file = await lang_bundle_file(target_file, target_lang);
   return new Promise((resolve, reject) => {
-    $.getJSON("lang/" + target_file)
+    $.getJSON("lang/" + file)
       .done(function(data) {
         const { lang_orig_text, lang_cur } = translationState;
         lang_set_direction(target_direction, target_lang);
@@ -184,7 +206,7 @@ function lang_translate(target_file, target_lang, target_direction) {
         resolve();
       })
       .fail(function(jqxhr, textStatus, error) {
-        console.error("Failed to load translation file:", target_file, error);
+        console.error("Failed to load translation file:", file, error);
         reject(error);
       });
   });
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+
+# (C) 2025 dualshock-tools
+#
+# This script grades the analog sticks of a batch of controllers from recorded
+# input reports, e.g. one capture per repaired controller in which the sticks
+# are rotated along their edge a few times and then released. For each stick
+# it reports:
+# - the circularity error, computed like the circularity test of the web app:
+#   the maximum distance reached in each of CIRCULARITY_DATA_SIZE angular
+#   bins (collectCircularityData() in js/core.js), then the RMS deviation of
+#   that envelope from 1 (calculateCircularityError() in js/stick-renderer.js)
+# - the center offset: the mean position of the stick while it rests near the
+#   center (within REST_RADIUS on both axes, and still)
+# - the jitter and peak distance of the resting position, and its drift
+#   between the first and last third of the capture
+# - the deadzone: the distance at which the stick starts reporting positions
+#   again after its resting position, if it skips a ring around it
+#
+# The positions are the bytes of the reports converted like the web app does
+# (see stick_axis() in decode_hid_reports.py), so the envelopes and errors
+# match the ones the circularity test would show for the same movements. As a
+# stick only has 256 x 256 raw positions, every capture is first reduced to a
+# histogram of the positions it visited, and the angular bin and distance of
+# each raw position come from a table computed once for the whole batch.
+#
+# A stick is graded ok when its circularity error is within the target range
+# (7-9 % by default, as advised by show_circularity_warning() in js/core.js),
+# low or high outside of it, and incomplete when its envelope has fewer than
+# --min-bins bins reached.
+#
+# Usage:
+#   python3 scripts/analyze_sticks.py grade captures/*.bin                  # Grade one capture per controller
+#   python3 scripts/analyze_sticks.py grade decoded.npy --json              # Decoded arrays from decode_hid_reports.py
+#   python3 scripts/analyze_sticks.py grade captures/*.bin --target 7 9 --min-bins 44
+#   python3 scripts/analyze_sticks.py verify                                # Check against the JavaScript sources
+#
+# Run it from the root directory of the project.
+# Requirements: pip install numpy
+
+import re
+import sys
+import json
+import math
+import argparse
+from pathlib import Path
+
+from decode_hid_reports import DEFAULT_HEADER, DEFAULT_REPORT_SIZE, STICK_AXES, load_capture, require_numpy, stick_axis
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Number of angular bins of the envelope, CIRCULARITY_DATA_SIZE in js/stick-renderer.js
+CIRCULARITY_DATA_SIZE = 48
+
+# Bins below this distance are ignored by the circularity error, like in calculateCircularityError()
+CIRCULARITY_MIN_DISTANCE = 0.2
+
+# Circularity error range (in %) advised by show_circularity_warning()
+TARGET_CIRCULARITY = (7.0, 9.0)
+
+# A stick rests when it is within this distance of the center on both axes
+# (as in _isStickAwayFromCenter() of js/modals/finetune-modal.js) and moved by
+# at most REST_MAX_STEP raw units since the previous report
+REST_RADIUS = 0.2
+REST_MAX_STEP = 2
+
+# Largest gap (in distance) between the resting position and the next
+# positions reported that is not counted as a deadzone, and the largest
+# deadzone looked for
+DEADZONE_MIN_GAP = 0.03
+DEADZONE_MAX = 0.3
+
+STICKS = {
+    'left': ('lx', 'ly'),
+    'right': ('rx', 'ry'),
+}
+
+JS_STICK_RENDERER = Path("js/stick-renderer.js")
+JS_CORE = Path("js/core.js")
+
+
+def position_tables():
+    """Return the (x, y, distance, angular bin) of each raw position, indexed by x_byte | y_byte << 8."""
+    require_numpy()
+    axis = stick_axis(np.arange(256))
+    x = np.tile(axis, 256)
+    y = np.repeat(axis, 256)
+    distance = np.sqrt(x * x + y * y)
+    # Math.round() rounds halves up, np.round() to even
+    angle = np.floor(np.arctan2(y, x) * CIRCULARITY_DATA_SIZE / 2.0 / np.pi + 0.5).astype(np.int64)
+    bins = (angle + CIRCULARITY_DATA_SIZE) % CIRCULARITY_DATA_SIZE
+    return x, y, distance, bins
+
+def envelope(histogram, tables):
+    """Return the maximum distance reached in each angular bin by the positions of a histogram."""
+    _, _, distance, bins = tables
+    visited = np.flatnonzero(histogram)
+    result = np.zeros(CIRCULARITY_DATA_SIZE)
+    np.maximum.at(result, bins[visited], distance[visited])
+    return result
+
+def circularity_error(data):
+    """Return the RMS deviation (in %) of an envelope from the unit circle, like calculateCircularityError()."""
+    valid = data[data > CIRCULARITY_MIN_DISTANCE]
+    if not len(valid):
+        return 0.0
+    return float(np.sqrt(np.sum((valid - 1) ** 2) / len(valid)) * 100)
+
+def deadzone(histogram, tables):
+    """Return the distance at which positions are reported again past the resting position (0 if no gap)."""
+    distance = tables[2]
+    # Distances in hundredths, so that neighbouring positions are one apart
+    reached = np.unique(np.round(distance[np.flatnonzero(histogram)] * 100).astype(np.int64))
+    reached = reached[reached <= DEADZONE_MAX * 100]
+    gaps = np.flatnonzero(np.diff(reached) > DEADZONE_MIN_GAP * 100)
+    if not len(gaps):
+        return 0.0
+    return float(reached[gaps[0] + 1]) / 100
+
+def resting(x_raw, y_raw, x, y):
+    """Return the mask of the reports in which a stick rests."""
+    near = (np.abs(x) < REST_RADIUS) & (np.abs(y) < REST_RADIUS)
+    still = np.ones(len(x_raw), dtype=bool)
+    if len(x_raw) > 1:
+        step = np.maximum(np.abs(np.diff(x_raw.astype(np.int16))), np.abs(np.diff(y_raw.astype(np.int16))))
+        still[1:] = step <= REST_MAX_STEP
+    return near & still
+
+def rest_statistics(x_raw, y_raw, tables):
+    """Return the center offset, jitter, peak and drift of the resting positions of a stick, or None."""
+    positions = x_raw.astype(np.int64) | (y_raw.astype(np.int64) << 8)
+    x = tables[0][positions]
+    y = tables[1][positions]
+    rest = np.flatnonzero(resting(x_raw, y_raw, x, y))
+    if not len(rest):
+        return None
+    rest_x = x[rest]
+    rest_y = y[rest]
+    center_x = float(rest_x.mean())
+    center_y = float(rest_y.mean())
+
+    # Drift: how far the resting position moved between the first and last third of the capture
+    third = len(x_raw) / 3
+    first = rest < third
+    last = rest >= len(x_raw) - third
+    drift = None
+    if first.any() and last.any():
+        drift = math.hypot(float(rest_x[last].mean() - rest_x[first].mean()),
+                           float(rest_y[last].mean() - rest_y[first].mean()))
+
+    return {
+        "rest_reports": int(len(rest)),
+        "center": [round(center_x, 4), round(center_y, 4)],
+        "offset": round(math.hypot(center_x, center_y), 4),
+        "jitter": round(float(np.sqrt(np.mean((rest_x - center_x) ** 2 + (rest_y - center_y) ** 2))), 4),
+        "peak": round(float(np.sqrt(rest_x ** 2 + rest_y ** 2).max()), 4),
+        "drift": None if drift is None else round(drift, 4),
+    }
+
+def grade(error, bins, target=TARGET_CIRCULARITY, min_bins=CIRCULARITY_DATA_SIZE):
+    """Return 'ok', 'low', 'high' or 'incomplete' for a circularity error and the number of bins reached."""
+    if bins < min_bins:
+        return 'incomplete'
+    if error < target[0]:
+        return 'low'
+    if error > target[1]:
+        return 'high'
+    return 'ok'
+
+def analyze_stick(x_raw, y_raw, tables, target=TARGET_CIRCULARITY, min_bins=CIRCULARITY_DATA_SIZE):
+    """Analyze the raw x and y bytes of one stick. Returns a JSON-serializable dict."""
+    histogram = np.bincount(x_raw.astype(np.int64) | (y_raw.astype(np.int64) << 8), minlength=1 << 16)
+    data = envelope(histogram, tables)
+    error = circularity_error(data)
+    bins = int(np.count_nonzero(data > CIRCULARITY_MIN_DISTANCE))
+    return {
+        "circularity_error": round(error, 2),
+        "bins": bins,
+        "grade": grade(error, bins, target, min_bins),
+        "envelope": [round(float(value), 4) for value in data],
+        "deadzone": deadzone(histogram, tables),
+        "rest": rest_statistics(x_raw, y_raw, tables),
+    }
+
+def load_sticks(path, report_size=DEFAULT_REPORT_SIZE, header=DEFAULT_HEADER):
+    """Return {axis: raw bytes} for a capture file or a .npy array saved by decode_hid_reports.py."""
+    require_numpy()
+    if Path(path).suffix == '.npy':
+        decoded = np.load(path, mmap_mode='r')
+        if decoded.dtype.names is None or not set(STICK_AXES) <= set(decoded.dtype.names):
+            raise ValueError("not an array of decoded reports")
+        return {axis: np.asarray(decoded[axis]) for axis in STICK_AXES}
+    data = load_capture(path, report_size, header)
+    # The sticks are the first four bytes of every layout
+    return {axis: np.asarray(data[:, byte]) for byte, axis in enumerate(STICK_AXES)}
+
+def analyze_capture(path, tables, target=TARGET_CIRCULARITY, min_bins=CIRCULARITY_DATA_SIZE,
+                    report_size=DEFAULT_REPORT_SIZE, header=DEFAULT_HEADER):
+    """Analyze both sticks of a capture. Returns a JSON-serializable dict."""
+    axes = load_sticks(path, report_size, header)
+    return {
+        "capture": str(path),
+        "reports": int(len(axes['lx'])),
+        "sticks": {stick: analyze_stick(axes[x_axis], axes[y_axis], tables, target, min_bins)
+                   for stick, (x_axis, y_axis) in STICKS.items()},
+    }
+
+def _format(value, spec):
+    return "-" if value is None else format(value, spec)
+
+def print_report(results, target):
+    name_width = max([len(result["capture"]) for result in results] + [7])
+    print(f"{'Capture':<{name_width}} {'Stick':<5} {'Error':>7} {'Bins':>4} {'Offset':>7} {'Deadzone':>8} "
+          f"{'Jitter':>7} {'Drift':>7}  Grade")
+    grades = {}
+    for result in results:
+        for stick, analysis in result["sticks"].items():
+            rest = analysis["rest"] or {}
+            grades[analysis["grade"]] = grades.get(analysis["grade"], 0) + 1
+            print(f"{result['capture']:<{name_width}} {stick:<5} {analysis['circularity_error']:>6.1f}% "
+                  f"{analysis['bins']:>4} {_format(rest.get('offset'), '>7.3f')} {analysis['deadzone']:>8.2f} "
+                  f"{_format(rest.get('jitter'), '>7.3f')} {_format(rest.get('drift'), '>7.3f')}  {analysis['grade']}")
+    print()
+    total = sum(grades.values())
+    print(f"{grades.get('ok', 0)} of {total} sticks within {target[0]:g}-{target[1]:g} % "
+          f"({grades.get('low', 0)} low, {grades.get('high', 0)} high, {grades.get('incomplete', 0)} incomplete)")
+
+# ---- Synchronization with the JavaScript sources ----
+
+def _js_round(value):
+    return math.floor(value + 0.5)
+
+def reference_envelope(x_raw, y_raw):
+    """Port of collectCircularityData() for one stick, one report at a time."""
+    data = [0.0] * CIRCULARITY_DATA_SIZE
+    for raw_x, raw_y in zip(x_raw.tolist(), y_raw.tolist()):
+        x = _js_round((raw_x - 127.5) / 128 * 100) / 100
+        y = _js_round((raw_y - 127.5) / 128 * 100) / 100
+        distance = math.sqrt(x * x + y * y)
+        index = (_js_round(math.atan2(y, x) * CIRCULARITY_DATA_SIZE / 2.0 / math.pi)
+                 + CIRCULARITY_DATA_SIZE) % CIRCULARITY_DATA_SIZE
+        data[index] = max(data[index], distance)
+    return data
+
+def reference_error(data):
+    """Port of calculateCircularityError()."""
+    valid = [value for value in data if value > CIRCULARITY_MIN_DISTANCE]
+    return math.sqrt(sum((value - 1) ** 2 for value in valid) / len(valid)) * 100 if valid else 0
+
+def synthetic_trace(rng, reports, radius, squareness, center=(0.0, 0.0), noise=1.0):
+    """Return the raw x and y bytes of a stick resting, rotated along its edge, then released."""
+    rest = reports // 4
+    turn = np.linspace(0, 4 * np.pi, reports - 2 * rest)
+    # Blend between a circle and a square edge, clipped to the byte range like a real stick
+    edge = radius / np.maximum(np.abs(np.cos(turn)), np.abs(np.sin(turn))) ** squareness
+    x = np.concatenate([np.full(rest, center[0]), edge * np.cos(turn), np.full(rest, center[0])])
+    y = np.concatenate([np.full(rest, center[1]), edge * np.sin(turn), np.full(rest, center[1])])
+    x_raw = np.clip(np.round(x * 128 + 127.5 + rng.normal(0, noise, reports)), 0, 255).astype(np.uint8)
+    y_raw = np.clip(np.round(y * 128 + 127.5 + rng.normal(0, noise, reports)), 0, 255).astype(np.uint8)
+    return x_raw, y_raw
+
+def verify(root=Path(".")):
+    """Check the constants against the JavaScript sources and the engine against a port of it. Returns the exit code."""
+    failed = False
+    checks = (
+        (JS_STICK_RENDERER, r"CIRCULARITY_DATA_SIZE\s*=\s*(\d+)", (CIRCULARITY_DATA_SIZE,), "CIRCULARITY_DATA_SIZE"),
+        (JS_CORE, r"circularity error of around (\d+)-(\d+) %", tuple(int(v) for v in TARGET_CIRCULARITY),
+         "the circularity target"),
+    )
+    for path, pattern, expected, what in checks:
+        try:
+            with open(Path(root) / path, 'r', encoding='utf-8') as f:
+                match = re.search(pattern, f.read())
+        except OSError as e:
+            print(f"Error reading {path}: {e}")
+            failed = True
+            continue
+        if match is None:
+            print(f"{path}: cannot find {what}")
+            failed = True
+        elif tuple(int(v) for v in match.groups()) != expected:
+            print(f"{path}: {what} is {'-'.join(match.groups())}, expected {'-'.join(map(str, expected))}")
+            failed = True
+        else:
+            print(f"{path}: {what} in sync")
+
+    # Circles, squares and off-center sticks, against the one-report-at-a-time port
+    rng = np.random.default_rng(0)
+    tables = position_tables()
+    mismatches = 0
+    traces = 0
+    for radius in (0.9, 1.0, 1.05):
+        for squareness in (0.0, 0.3, 1.0):
+            for center in ((0.0, 0.0), (0.05, -0.03)):
+                x_raw, y_raw = synthetic_trace(rng, 2000, radius, squareness, center)
+                analysis = analyze_stick(x_raw, y_raw, tables)
+                expected = reference_envelope(x_raw, y_raw)
+                traces += 1
+                if analysis["envelope"] != [round(value, 4) for value in expected] or \
+                        abs(analysis["circularity_error"] - round(reference_error(expected), 2)) > 1e-9:
+                    mismatches += 1
+                    print(f"  - radius {radius}, squareness {squareness}, center {center}: envelope differs")
+                offset = analysis["rest"]["offset"] if analysis["rest"] else None
+                if offset is None or abs(offset - math.hypot(*center)) > 0.01:
+                    mismatches += 1
+                    print(f"  - radius {radius}, squareness {squareness}, center {center}: offset is {offset}")
+    print(f"{traces} synthetic traces analyzed, {mismatches} mismatches")
+    return 1 if failed or mismatches else 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Grade the analog sticks of recorded controllers.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    grade_parser = subparsers.add_parser('grade', help="analyze and grade captures, one per controller")
+    grade_parser.add_argument('captures', type=Path, nargs='+',
+                              help="files of fixed-size raw reports, or .npy arrays saved by decode_hid_reports.py")
+    grade_parser.add_argument('--report-size', type=int, default=DEFAULT_REPORT_SIZE,
+                              help=f"bytes per report in the files (default: {DEFAULT_REPORT_SIZE})")
+    grade_parser.add_argument('--header', type=int, default=DEFAULT_HEADER,
+                              help=f"bytes before the report data, e.g. the report ID (default: {DEFAULT_HEADER})")
+    grade_parser.add_argument('--target', type=float, nargs=2, default=TARGET_CIRCULARITY, metavar=('MIN', 'MAX'),
+                              help="circularity error range in %% graded ok (default: %(default)s)")
+    grade_parser.add_argument('--min-bins', type=int, default=CIRCULARITY_DATA_SIZE,
+                              help=f"angular bins a stick must reach to be graded (default: {CIRCULARITY_DATA_SIZE})")
+    grade_parser.add_argument('--json', action='store_true', help="print the results in JSON format")
+    subparsers.add_parser('verify', help="check the constants and the engine against the JavaScript sources")
+    args = parser.parse_args()
+
+    try:
+        require_numpy()
+    except RuntimeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    if args.command == 'verify':
+        return verify()
+
+    tables = position_tables()
+    target = tuple(args.target)
+    results = []
+    for path in args.captures:
+        try:
+            results.append(analyze_capture(path, tables, target, args.min_bins, args.report_size, args.header))
+        except (OSError, ValueError) as e:
+            print(f"Error reading {path}: {e}", file=sys.stderr)
+            return 2
+
+    if args.json:
+        print(json.dumps({"target": list(target), "captures": results}, indent=2))
+    else:
+        print_report(results, target)
+    ok = all(analysis["grade"] == 'ok' for result in results for analysis in result["sticks"].values())
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
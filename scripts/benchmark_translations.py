@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+
+# (C) 2025 dualshock-tools
+#
+# This script benchmarks translation_index.py on synthetic source trees.
+#
+# For each requested scale it generates a corpus shaped like the real project
+# (js/modals/*.js, templates/*.html, index.html and lang/*.json) in a temporary
+# directory and times every phase of a translation check, run through
+# TranslationIndex like check_translations.py does:
+# - discovery:  finding the source and language files
+# - extraction: extracting and merging the strings of the source files
+# - languages:  loading the language files into the translation database
+# - diffing:    filtering excluded strings and comparing them with the keys
+# - reporting:  building the JSON result and rendering the text report
+#
+# Without --warm-cache every run starts from an empty extraction cache and an
+# in-memory database, like check_translations.py --no-cache.
+#
+# Results can be saved as JSON and compared with a previous run, failing when
+# a phase got slower than the allowed threshold.
+#
+# Usage:
+#   python3 scripts/benchmark_translations.py                          # Default scales
+#   python3 scripts/benchmark_translations.py --scales repo,medium     # Selected scales
+#   python3 scripts/benchmark_translations.py --output bench.json      # Save results
+#   python3 scripts/benchmark_translations.py --baseline bench.json    # Compare with a saved run
+#   python3 scripts/benchmark_translations.py --threshold 0.2          # Allowed slowdown (default: 0.1)
+#   python3 scripts/benchmark_translations.py --repeat 5               # Best of 5 runs per scale
+#   python3 scripts/benchmark_translations.py --jobs 4                 # Worker processes for extraction
+#   python3 scripts/benchmark_translations.py --corpus-dir /tmp/corpus # Keep the generated corpus
+#   python3 scripts/benchmark_translations.py --l-calls 20 --ds-i18n 8 --comments 10
+#
+# Scales are given by name (see SCALES) or as FILES[:LANGUAGES], e.g. 5000:60.
+
+import io
+import os
+import json
+import time
+import random
+import platform
+import argparse
+import tempfile
+import contextlib
+from pathlib import Path
+
+import translation_index
+from check_translations import print_results
+
+RESULTS_VERSION = 2
+
+# name: (source files, language files)
+SCALES = {
+    "repo": (33, 23),
+    "small": (100, 23),
+    "medium": (1000, 50),
+    "large": (10000, 100),
+}
+DEFAULT_SCALES = ("repo", "small", "medium")
+
+PHASES = ("discovery", "extraction", "languages", "diffing", "reporting")
+
+# Benchmark phase of each TranslationIndex timer phase
+TIMER_PHASES = {
+    "discovery": "discovery",
+    "extract_html": "extraction",
+    "extract_js": "extraction",
+    "load_translation_keys": "languages",
+    "cache_save": "extraction",
+    "merge": "extraction",
+    "exclude": "diffing",
+    "diff_sets": "diffing",
+    "missing_by_language": "diffing",
+}
+
+# Share of the generated source files that are HTML templates
+HTML_SHARE = 0.4
+
+# Phases faster than this (in seconds) are never reported as regressions,
+# since their timings are dominated by noise
+MIN_REGRESSION_SECONDS = 0.005
+
+WORDS = (
+    "calibrate stick center range controller button trigger touchpad battery "
+    "firmware module sensor vibration speaker microphone headphone lights "
+    "connect disconnect save reset restore sample rotate press release hold "
+    "left right slowly again finished permanently temporarily settings device"
+).split()
+
+def make_sentence(rng):
+    """Return a random sentence in the style of the UI strings."""
+    words = rng.sample(WORDS, rng.randint(2, 9))
+    words[0] = words[0].capitalize()
+    return " ".join(words) + rng.choice((".", "", "", "?", ":"))
+
+def make_vocabulary(rng, size):
+    """Return size unique sentences, in a stable order."""
+    vocabulary = []
+    seen = set()
+    while len(vocabulary) < size:
+        sentence = make_sentence(rng)
+        if sentence not in seen:
+            seen.add(sentence)
+            vocabulary.append(sentence)
+    return vocabulary
+
+def js_quote(text, rng):
+    """Quote text as a JavaScript string literal with a random quote style."""
+    quote = rng.choice(("'", '"'))
+    return quote + text.replace("\\", "\\\\").replace(quote, "\\" + quote) + quote
+
+def make_js_file(rng, index, vocabulary, l_calls, ds_i18n, comments):
+    """Return the source of a modal-like JavaScript module."""
+    lines = [
+        "'use strict';",
+        "",
+        "import { l } from '../translations.js';",
+        "import { sleep } from '../utils.js';",
+        "",
+        "/**",
+        f" * Synthetic Modal {index} Class",
+        " */",
+        f"export class SyntheticModal{index} {{",
+        "  constructor(controllerInstance, doneCallback = null) {",
+        "    this.controller = controllerInstance;",
+        "    this.doneCallback = doneCallback;",
+        "  }",
+        "",
+    ]
+    for i in range(max(l_calls, ds_i18n, comments)):
+        lines.append(f"  step{i}(value) {{")
+        if i < comments:
+            if i % 2:
+                lines.append(f"    // l({js_quote(rng.choice(vocabulary), rng)}) is not used anymore")
+            else:
+                lines.append(f"    /* Step {i}: see https://example.com/docs?step={i} */")
+        if i < l_calls:
+            lines.append(f"    const text = this.l({js_quote(rng.choice(vocabulary), rng)});")
+            lines.append("    $('#status').text(text + ' ' + value / 2);")
+        if i < ds_i18n:
+            lines.append(f"    return `<p class=\"ds-i18n\">${{l({js_quote(rng.choice(vocabulary), rng)})}}</p>`;")
+        lines.append("  }")
+        lines.append("")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+def make_html_file(rng, index, vocabulary, ds_i18n, comments):
+    """Return the source of a modal-like HTML template."""
+    lines = [
+        "<!-- Modal -->",
+        f"<div class=\"modal fade\" id=\"syntheticModal{index}\" tabindex=\"-1\" aria-hidden=\"true\">",
+        "  <div class=\"modal-dialog\">",
+        "    <div class=\"modal-content\">",
+        "      <div class=\"modal-body\">",
+    ]
+    for i in range(max(ds_i18n, comments)):
+        if i < comments:
+            lines.append(f"        <!-- <p class=\"ds-i18n\">{rng.choice(vocabulary)}</p> -->")
+        if i < ds_i18n:
+            text = rng.choice(vocabulary)
+            if i % 3 == 1:
+                words = text.split(" ", 1)
+                text = f"<b>{words[0]}</b> {words[1]}" if len(words) > 1 else text
+            lines.append(f"        <p class=\"ds-i18n\">{text}</p>")
+            lines.append(f"        <div><small>LX: <span id=\"synthetic-{index}-{i}\">0.00</span></small></div>")
+    lines += [
+        "      </div>",
+        "    </div>",
+        "  </div>",
+        "</div>",
+    ]
+    return "\n".join(lines) + "\n"
+
+def make_lang_file(rng, code, vocabulary):
+    """Return the content of a language file for most of the vocabulary."""
+    data = {".authorMsg": f"- Synthetic translation {code}", ".title": code}
+    for sentence in vocabulary:
+        roll = rng.random()
+        if roll < 0.03:
+            continue  # Missing in this language
+        data[sentence] = "" if roll < 0.15 else sentence.upper()
+    for i in range(len(vocabulary) // 50):
+        data[f"Obsolete sentence {i}"] = ""
+    data[""] = ""
+    return json.dumps(data, indent=4, ensure_ascii=False)
+
+def generate_corpus(root, source_files, languages, l_calls=10, ds_i18n=5, comments=5, seed=0):
+    """Write a synthetic project under root.
+
+    source_files are split between js/ (with a modals/ subdirectory, like the
+    real tree) and templates/, plus one index.html. Every file gets l_calls
+    l() calls (JavaScript only), ds_i18n ds-i18n elements and comments
+    commented-out strings.
+    """
+    rng = random.Random(seed)
+    root = Path(root)
+    vocabulary = make_vocabulary(rng, max(50, source_files * 3))
+
+    (root / "js" / "modals").mkdir(parents=True, exist_ok=True)
+    (root / "templates").mkdir(parents=True, exist_ok=True)
+    (root / "lang").mkdir(parents=True, exist_ok=True)
+
+    html_count = max(1, int(source_files * HTML_SHARE))
+    js_count = max(1, source_files - html_count)
+
+    (root / "index.html").write_text(make_html_file(rng, 0, vocabulary, ds_i18n * 4, comments), encoding="utf-8")
+    for i in range(1, html_count):
+        path = root / "templates" / f"synthetic-{i}-modal.html"
+        path.write_text(make_html_file(rng, i, vocabulary, ds_i18n, comments), encoding="utf-8")
+    for i in range(js_count):
+        directory = root / "js" / "modals" if i % 4 else root / "js"
+        path = directory / f"synthetic-{i}.js"
+        path.write_text(make_js_file(rng, i, vocabulary, l_calls, ds_i18n // 2, comments), encoding="utf-8")
+    for i in range(languages):
+        code = f"l{i:02d}_{i:02d}"
+        (root / "lang" / f"{code}.json").write_text(make_lang_file(rng, code, vocabulary), encoding="utf-8")
+
+def run_check(jobs, use_cache):
+    """Run one translation check in the current directory like check_translations.py, timing each phase."""
+    timer = translation_index.PhaseTimer()
+    with translation_index.TranslationIndex(use_cache=use_cache, jobs=jobs) as index:
+        index.refresh(timer)
+        comparison = index.comparison(timer)
+
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            print(json.dumps(index.report(), indent=2, ensure_ascii=False))
+            print_results(comparison)
+        reporting = time.perf_counter() - started
+
+    timings = dict.fromkeys(PHASES, 0.0)
+    for name, seconds, _ in timer.phases:
+        timings[TIMER_PHASES[name]] += seconds
+    timings["reporting"] = reporting
+    return timings
+
+def benchmark_scale(root, repeat, jobs, warm_cache):
+    """Return the best time of each phase over repeat runs in root."""
+    best = {}
+    previous_dir = os.getcwd()
+    os.chdir(root)
+    try:
+        if warm_cache:
+            # Fill the extraction cache and the translation database, so the timed runs only see hits
+            run_check(jobs, True)
+
+        for _ in range(repeat):
+            timings = run_check(jobs, warm_cache)
+            for phase, seconds in timings.items():
+                best[phase] = min(seconds, best.get(phase, seconds))
+    finally:
+        os.chdir(previous_dir)
+    return best
+
+def parse_scale(name):
+    """Return (source files, languages) for a scale name or FILES[:LANGUAGES]."""
+    if name in SCALES:
+        return SCALES[name]
+    files, _, languages = name.partition(":")
+    return int(files), int(languages or SCALES["repo"][1])
+
+def compare_results(results, baseline, threshold):
+    """Print a comparison with a baseline run and return the regressions."""
+    regressions = []
+    print()
+    print(f"{'Scale':<12} {'Phase':<12} {'Baseline':>12} {'Current':>12} {'Change':>9}")
+    print("-" * 61)
+    for scale, result in results["results"].items():
+        base = baseline.get("results", {}).get(scale)
+        if base is None:
+            continue
+        for phase in PHASES + ("total",):
+            if phase == "total":
+                current, previous = result["total"], base.get("total")
+            else:
+                current, previous = result["phases"].get(phase), base.get("phases", {}).get(phase)
+            if current is None or previous is None or previous <= 0:
+                continue
+            change = current / previous - 1
+            flag = ""
+            if change > threshold and current - previous > MIN_REGRESSION_SECONDS:
+                flag = "  REGRESSION"
+                regressions.append((scale, phase, change))
+            print(f"{scale:<12} {phase:<12} {previous * 1000:>10.1f}ms {current * 1000:>10.1f}ms {change:>+8.1%}{flag}")
+    print()
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark translation_index.py on synthetic corpora.")
+    parser.add_argument("--scales", default=",".join(DEFAULT_SCALES),
+                        help="comma separated scale names (%s) or FILES[:LANGUAGES]" % ", ".join(SCALES))
+    parser.add_argument("--l-calls", type=int, default=10, help="l() calls per JavaScript file")
+    parser.add_argument("--ds-i18n", type=int, default=5, help="ds-i18n elements per HTML file")
+    parser.add_argument("--comments", type=int, default=5, help="commented-out strings per file")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per scale, the fastest is kept")
+    parser.add_argument("--jobs", type=int, default=1, help="worker processes for parsing (default: 1)")
+    parser.add_argument("--warm-cache", action="store_true", help="time runs with a filled extraction cache")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for the corpus")
+    parser.add_argument("--corpus-dir", help="generate the corpora here and keep them")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare with the results in this JSON file")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="allowed slowdown against the baseline (default: 0.1 = 10%%)")
+    args = parser.parse_args()
+
+    results = {
+        "version": RESULTS_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {
+            "l_calls": args.l_calls,
+            "ds_i18n": args.ds_i18n,
+            "comments": args.comments,
+            "repeat": args.repeat,
+            "jobs": args.jobs,
+            "warm_cache": args.warm_cache,
+            "seed": args.seed,
+        },
+        "results": {},
+    }
+
+    with contextlib.ExitStack() as stack:
+        base_dir = args.corpus_dir or stack.enter_context(tempfile.TemporaryDirectory())
+        for scale in args.scales.split(","):
+            source_files, languages = parse_scale(scale)
+            root = Path(base_dir) / scale.replace(":", "_")
+            generate_corpus(root, source_files, languages, args.l_calls, args.ds_i18n, args.comments, args.seed)
+
+            phases = benchmark_scale(root, args.repeat, args.jobs, args.warm_cache)
+            total = sum(phases.values())
+            results["results"][scale] = {
+                "source_files": source_files,
+                "languages": languages,
+                "phases": phases,
+                "total": total,
+            }
+            details = ", ".join(f"{phase} {phases[phase] * 1000:.1f}ms" for phase in PHASES)
+            print(f"{scale}: {source_files} files, {languages} languages: {total * 1000:.1f}ms ({details})")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("version") != RESULTS_VERSION:
+            print(f"Error: {args.baseline} was measured with another version of the benchmark, run it again")
+            return 2
+        regressions = compare_results(results, baseline, args.threshold)
+        if regressions:
+            print(f"⚠️  {len(regressions)} phase(s) slower than the baseline by more than {args.threshold:.0%}")
+            return 1
+        print("✅ No regressions against the baseline")
+
+    return 0
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+
+# (C) 2025 dualshock-tools
+#
+# This script builds the translation bundles served to the browser. For each
+# lang/*.json it writes a pruned, minified copy named after a hash of its
+# content, plus a manifest that js/translations.js uses to find them:
+# - Keys that are not used by the source files (see check_translations.py)
+#   and not in WHITELIST_UNUSED are dropped
+# - Untranslated keys (empty values) are dropped, since the page shows the
+#   English text for them anyway
+# - The special keys (.title, .authorMsg) are kept
+#
+# Bundles are named <code>.<hash>.json, so they can be cached forever; older
+# bundles of the same language are removed from the output directory.
+#
+# The built index.html next to the output directory gets a
+# <meta name="lang-manifest"> tag pointing at the manifest: the page only
+# looks for a manifest when it has one, so unbuilt and development trees load
+# the plain lang/<code>.json files without a failing request.
+#
+# Usage:
+#   python3 scripts/build_translation_bundles.py                # Write to dist/lang
+#   python3 scripts/build_translation_bundles.py --out-dir DIR  # Write to DIR
+#   python3 scripts/build_translation_bundles.py --no-cache     # Don't use the extraction cache
+#
+# Run it from the root directory of the project, after `npm run build`.
+
+import os
+import re
+import sys
+import json
+import hashlib
+import argparse
+from pathlib import Path
+
+from translation_index import LANG_DIR, SPECIAL_KEYS, WHITELIST_UNUSED, TranslationIndex
+
+DEFAULT_OUT_DIR = Path("dist") / "lang"
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+# Length of the content hash in bundle file names
+HASH_LENGTH = 10
+
+MANIFEST_META_NAME = "lang-manifest"
+
+def shipped_keys(index):
+    """Return the set of keys the page can display."""
+    return index.comparison()['used_strings'] | WHITELIST_UNUSED | SPECIAL_KEYS
+
+def prune_translations(translations, keys):
+    """Keep the translated entries of keys, in their original order."""
+    return {key: value for key, value in translations.items()
+            if key in keys and isinstance(value, str) and value.strip()}
+
+def minify(translations):
+    """Serialize translations as compact UTF-8 JSON."""
+    return json.dumps(translations, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def write_bundle(out_dir, lang_code, content):
+    """Write a content-hashed bundle and remove older ones of the language.
+
+    Returns the file name of the bundle.
+    """
+    digest = hashlib.sha256(content).hexdigest()
+    file_name = f"{lang_code}.{digest[:HASH_LENGTH]}.json"
+    path = out_dir / file_name
+    if not path.exists():
+        tmp_path = path.with_name(file_name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    stale_pattern = re.compile(re.escape(lang_code) + r"\.[0-9a-f]{%d}\.json$" % HASH_LENGTH)
+    for other in out_dir.iterdir():
+        if other.name != file_name and stale_pattern.match(other.name):
+            other.unlink()
+    return file_name
+
+def build_bundles(index, out_dir):
+    """Write the bundles of every language file and return the manifest."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    keys = shipped_keys(index)
+    languages = {}
+    for lang_file in sorted(index.lang_files):
+        try:
+            with open(index.root / lang_file, 'r', encoding='utf-8') as f:
+                translations = json.load(f)
+        except Exception as e:
+            print(f"Error reading {lang_file}: {e}")
+            continue
+
+        pruned = prune_translations(translations, keys)
+        content = minify(pruned)
+        languages[lang_file.stem] = {
+            "file": write_bundle(out_dir, lang_file.stem, content),
+            "sha256": hashlib.sha256(content).hexdigest(),
+            "keys": len(pruned),
+            "bytes": len(content),
+            "source_bytes": os.path.getsize(index.root / lang_file),
+        }
+
+    return {"version": MANIFEST_VERSION, "languages": languages}
+
+def mark_index_html(html_path, manifest_url):
+    """Add the <meta> tag pointing at the manifest to a built index.html.
+
+    Returns False if the file has no <meta> tag to insert it after.
+    """
+    with open(html_path, 'r', encoding='utf-8') as f:
+        html = f.read()
+    tag = f'<meta name="{MANIFEST_META_NAME}" content="{manifest_url}">'
+    existing = re.search(r'<meta\b[^>]*\bname="?%s\b[^>]*>' % re.escape(MANIFEST_META_NAME), html)
+    if existing:
+        html = html[:existing.start()] + tag + html[existing.end():]
+    else:
+        # The first <meta> is the charset one; the tag works anywhere in <head>, even when it is minified away
+        first_meta = re.search(r'<meta\b[^>]*>', html)
+        if first_meta is None:
+            return False
+        html = html[:first_meta.end()] + tag + html[first_meta.end():]
+    tmp_path = html_path.with_name(html_path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(html)
+    os.replace(tmp_path, html_path)
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description="Build pruned, content-hashed translation bundles.")
+    parser.add_argument('--out-dir', type=Path, default=DEFAULT_OUT_DIR,
+                        help=f"output directory (default: {DEFAULT_OUT_DIR})")
+    parser.add_argument('--no-cache', action='store_true', help="don't use the extraction cache")
+    args = parser.parse_args()
+
+    with TranslationIndex(use_cache=not args.no_cache) as index:
+        index.refresh()
+        for path, error in index.errors:
+            print(f"Error reading {path}: {error}")
+        if not index.lang_files:
+            print(f"Error: No language files found in {LANG_DIR}", file=sys.stderr)
+            return 1
+        manifest = build_bundles(index, args.out_dir)
+
+    manifest_path = args.out_dir / MANIFEST_NAME
+    tmp_path = manifest_path.with_name(MANIFEST_NAME + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, manifest_path)
+
+    html_path = args.out_dir.parent / "index.html"
+    manifest_url = f"{args.out_dir.name}/{MANIFEST_NAME}"
+    if not html_path.exists() or not mark_index_html(html_path, manifest_url):
+        print(f"Warning: {html_path} not found or without a <meta> tag, the page will not use the bundles",
+              file=sys.stderr)
+
+    total_source = sum(entry["source_bytes"] for entry in manifest["languages"].values())
+    total = sum(entry["bytes"] for entry in manifest["languages"].values())
+    for lang_code, entry in manifest["languages"].items():
+        print(f"{lang_code}: {entry['keys']} keys, {entry['source_bytes']} -> {entry['bytes']} bytes ({entry['file']})")
+    print(f"Wrote {len(manifest['languages'])} bundles to {args.out_dir}: {total_source} -> {total} bytes")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
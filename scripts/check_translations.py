@@ -17,465 +17,153 @@
 # - JavaScript single-line comments (// ...)
 # - JavaScript multi-line comments (/* ... */)
 #
+# JavaScript is tokenized in a single pass (strings, template literals, regular
+# expressions and comments), so only real l() calls and string contents count.
+#
 # Usage:
 #   python3 scripts/check_translations.py           # Normal output
 #   python3 scripts/check_translations.py --verbose # Show excluded strings
 #   python3 scripts/check_translations.py --compact # Compact output (no language details)
 #   python3 scripts/check_translations.py --json    # Output in JSON format
+#   python3 scripts/check_translations.py --no-cache     # Ignore and don't update the cache
+#   python3 scripts/check_translations.py --cache-stats  # Report cache hits and misses
+#   python3 scripts/check_translations.py --jobs N       # Parse files with N processes (default: auto)
+#   python3 scripts/check_translations.py --watch        # Re-check whenever a file changes
+#   python3 scripts/check_translations.py --timings      # Time and memory of each phase (alias: --profile)
+#   python3 scripts/check_translations.py --trace-memory # Same, with exact allocation peaks (slower)
+#   python3 scripts/check_translations.py --profile-output FILE  # Write cProfile statistics to FILE
+#   python3 scripts/check_translations.py --coverage     # Translation coverage of each language
+#   python3 scripts/check_translations.py --coverage-since REV  # Same, with the changes since a git revision
+#   python3 scripts/check_translations.py --renames      # Pair missing strings with similar unused ones
+#   python3 scripts/check_translations.py --rename-patch FILE   # Same, and write them as a process_lang.py patch
+#   python3 scripts/check_translations.py --suggest      # Draft translations for missing strings (-v: per language)
+#   python3 scripts/check_translations.py --changed-since REF   # Only check the strings changed since a git revision
+#   python3 scripts/check_translations.py --staged --fail-fast  # Pre-commit: staged changes, stop at the first missing string
+#   python3 scripts/check_translations.py --occurrences-output FILE  # Save every string location to a binary file
+#   python3 scripts/check_translations.py --missing-in ja_jp  # Keys that ja_jp lacks or leaves empty
+#   python3 scripts/check_translations.py --lacking "Connect" # Languages that lack a key or leave it empty
+#
+# Extraction results are cached in .check_translations_cache.json, and the
+# language files are indexed in the .translations.sqlite database shared with
+# process_lang.py (both in the directory the script is run from), so files
+# that did not change since the previous run are not read and parsed again.
+#
+# The extraction and comparison live in translation_index.py, which other tools
+# can import; this script only parses the options and prints the reports. It
+# is imported by the functions that need it, so --staged and --changed-since
+# do not pay for it when no file changed.
 
-import os
-import re
-import json
 import sys
+import json
+import time
+import argparse
+import cProfile
+import subprocess
 from pathlib import Path
 
-# Check for flags
-VERBOSE = '--verbose' in sys.argv or '-v' in sys.argv
-JSON_OUTPUT = '--json' in sys.argv
-COMPACT = '--compact' in sys.argv
+from translation_changes import check_changes, print_changes
 
-# Directories to scan
 ROOT_DIR = Path(".")
-LANG_DIR = ROOT_DIR / "lang"
-JS_DIR = ROOT_DIR / "js"
-TEMPLATES_DIR = ROOT_DIR / "templates"
-
-# Special keys that are not in source code
-SPECIAL_KEYS = {".authorMsg", ".title"}
-
-# Patterns to exclude from translation checks (CSS selectors, technical strings, etc.)
-EXCLUDE_PATTERNS = [
-    r'^\.[\w-]+$',  # CSS class selectors like .alert, .hide
-    r'^#[\w-]+$',  # CSS ID selectors
-    r'^[\w-]+\.[\w-]+$',  # CSS compound selectors like circle.ds-touch
-    r'^path,rect,circle',  # SVG element lists
-    r'^\\x[0-9a-fA-F]+$',  # Hex escape sequences
-]
-
-# Whitelist of strings that are in language files but should be ignored by unused check
-# These strings may be used dynamically, in comments, or reserved for future use
-WHITELIST_UNUSED = {
-    "(beta)",
-    "30th Anniversary",
-    "Astro Bot",
-    "Chroma Indigo",
-    "Chroma Pearl",
-    "Chroma Teal",
-    "Cobalt Blue",
-    "Cosmic Red",
-    "Fortnite",
-    "Galactic Purple",
-    "God of War Ragnarok",
-    "Grey Camouflage",
-    "Midnight Black",
-    "Nova Pink",
-    "Spider-Man 2",
-    "Starlight Blue",
-    "Sterling Silver",
-    "The Last of Us",
-    "Volcanic Red",
-    "White",
-    "God of War 20th Anniversary",
-    "Icon Blue Limited Edition",
-    "Ghost of Yōtei Limited Edition",
-    "Marathon Limited Edition",
-    "Genshin Impact Limited Edition",
-    "007 First Light Limited Edition",
-
-    "Sony DualSense",
-    "Sony DualSense Edge",
-    "Sony DualShock 4 V1",
-    "Sony DualShock 4 V2",
-
-    "Calibration in progress",
-    "Continue",
-    "Start",
-    "Initializing...",
-    "Sampling...",
-    "left module",
-    "right module",
-    "Your device might not be a genuine Sony controller. If it is not a clone then please report this issue.",
-
-    "Adaptive Trigger",
-    "Buttons",
-    "Haptic Vibration",
-    "Headphone Jack",
-    "Lights",
-    "Microphone",
-    "Speaker",
-    "USB Connector",
-}
-
-
-def should_exclude_string(text):
-    """Check if a string should be excluded from translation checks."""
-    for pattern in EXCLUDE_PATTERNS:
-        if re.match(pattern, text):
-            return True
-    return False
-
-def find_html_files():
-    """Find all HTML files in the project."""
-    html_files = []
-    # Root HTML files
-    html_files.extend(ROOT_DIR.glob("*.html"))
-    # Template HTML files
-    html_files.extend(TEMPLATES_DIR.glob("*.html"))
-    return html_files
-
-def find_js_files():
-    """Find all JavaScript files in the js directory."""
-    js_files = []
-    js_files.extend(JS_DIR.glob("**/*.js"))
-    return js_files
-
-def extract_ds_i18n_strings(html_files):
-    """Extract strings from elements with ds-i18n class in HTML files.
-
-    Automatically ignores HTML comments (<!-- ... -->) before extraction.
-    """
-    strings = {}  # Changed to dict to track locations
-
-    # Pattern to match elements with ds-i18n class and extract their content
-    # This handles various HTML structures including multi-line content
-    # Match opening tag with ds-i18n class, then capture content until closing tag
-    pattern = r'<(\w+)[^>]*class="[^"]*ds-i18n[^"]*"[^>]*>(.*?)</\1>'
-
-    for html_file in html_files:
-        try:
-            with open(html_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-                lines = content.split('\n')
-
-                # Remove HTML comments before processing
-                # This regex handles both single-line and multi-line comments
-                content = re.sub(r'<!--.*?-->', '', content, flags=re.DOTALL)
-
-                # Find all matches (DOTALL flag allows . to match newlines)
-                matches = re.finditer(pattern, content, re.DOTALL)
-                for match in matches:
-                    text = match.group(2)
-
-                    # Skip if contains complex nested HTML tags
-                    # Allow simple formatting tags like <b>, <i>, <em>, <strong>, <span>
-                    if '<' in text and '>' in text:
-                        # Check if it contains only simple formatting tags
-                        # Remove simple formatting tags temporarily to check for other HTML
-                        text_without_simple_tags = re.sub(r'</?(?:b|i|em|strong|span)>', '', text)
-                        if '<' in text_without_simple_tags:
-                            # Contains other HTML elements (complex content), skip it
-                            continue
-                        # Otherwise, keep the original text with simple formatting tags
-
-                    if text:
-                        # Calculate line and column number
-                        line_num = content[:match.start()].count('\n') + 1
-                        col_num = match.start() - content[:match.start()].rfind('\n')
-
-                        # Store location info
-                        if text not in strings:
-                            strings[text] = []
-                        strings[text].append({
-                            'file': str(html_file),
-                            'line': line_num,
-                            'col': col_num
-                        })
-
-        except Exception as e:
-            print(f"Error reading {html_file}: {e}")
-
-    return strings
-
-def extract_l_function_strings(js_files):
-    """Extract strings passed to l() function in JavaScript files.
-
-    Automatically ignores JavaScript comments (// and /* ... */) before extraction.
-    """
-    strings = {}  # Changed to dict to track locations
-
-    # Pattern to match l("string") or l('string') or this.l("string") or this.l('string')
-    # Handles both single and double quotes
-    # Use word boundary \b to ensure 'l' is not part of a larger word (e.g., .html)
-    pattern = r'(?:this\.)?\bl\s*\(\s*["\'`]([^"\'`]+)["\'`]\s*\)'
-
-    for js_file in js_files:
-        try:
-            with open(js_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-
-                # Remove JavaScript comments before processing
-                # Remove single-line comments (// ...)
-                content = re.sub(r'//.*?$', '', content, flags=re.MULTILINE)
-                # Remove multi-line comments (/* ... */)
-                content = re.sub(r'/\*.*?\*/', '', content, flags=re.DOTALL)
-
-                # Find all matches
-                matches = re.finditer(pattern, content)
-                for match in matches:
-                    text = match.group(1)
-                    if text:
-                        # Calculate line and column number
-                        line_num = content[:match.start()].count('\n') + 1
-                        col_num = match.start() - content[:match.start()].rfind('\n')
-
-                        # Store location info
-                        if text not in strings:
-                            strings[text] = []
-                        strings[text].append({
-                            'file': str(js_file),
-                            'line': line_num,
-                            'col': col_num
-                        })
-
-        except Exception as e:
-            print(f"Error reading {js_file}: {e}")
-
-    return strings
-
-def extract_html_strings_from_js(js_files):
-    """Extract strings from HTML embedded in JavaScript files.
-
-    This function looks for HTML strings in JavaScript that contain elements with ds-i18n class.
-    Automatically ignores JavaScript comments (// and /* ... */) before extraction.
-    """
-    strings = {}  # Dict to track locations
-
-    # Pattern to match elements with ds-i18n class in HTML strings
-    # This handles HTML within JavaScript strings (both single and double quotes)
-    pattern = r'<(\w+)[^>]*class=["\'`][^"\'`]*ds-i18n[^"\'`]*["\'`][^>]*>(.*?)</\1>'
-
-    # Pattern to match template literal function calls like ${l('string')} or ${l("string")}
-    template_literal_pattern = r'\$\{l\s*\(\s*["\'`]([^"\'`]+)["\'`]\s*\)\}'
-
-    for js_file in js_files:
-        try:
-            with open(js_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-                original_content = content  # Keep original for line number calculation
-
-                # Remove JavaScript comments before processing
-                # Remove single-line comments (// ...)
-                content = re.sub(r'//.*?$', '', content, flags=re.MULTILINE)
-                # Remove multi-line comments (/* ... */)
-                content = re.sub(r'/\*.*?\*/', '', content, flags=re.DOTALL)
-
-                # Find all matches (DOTALL flag allows . to match newlines)
-                matches = re.finditer(pattern, content, re.DOTALL)
-                for match in matches:
-                    text = match.group(2)
-
-                    # Skip if contains complex nested HTML tags
-                    # Allow simple formatting tags like <b>, <i>, <em>, <strong>, <span>
-                    if '<' in text and '>' in text:
-                        # Check if it contains only simple formatting tags
-                        # Remove simple formatting tags temporarily to check for other HTML
-                        text_without_simple_tags = re.sub(r'</?(?:b|i|em|strong|span)>', '', text)
-                        if '<' in text_without_simple_tags:
-                            # Contains other HTML elements (complex content), skip it
-                            continue
-                        # Otherwise, keep the original text with simple formatting tags
-
-                    if text:
-                        # Extract any template literal function calls like ${l('string')}
-                        template_matches = re.finditer(template_literal_pattern, text)
-                        for template_match in template_matches:
-                            extracted_string = template_match.group(1)
-                            if extracted_string:
-                                # Calculate line and column number using original content
-                                line_num = original_content[:match.start()].count('\n') + 1
-                                col_num = match.start() - original_content[:match.start()].rfind('\n')
-
-                                # Store location info
-                                if extracted_string not in strings:
-                                    strings[extracted_string] = []
-                                strings[extracted_string].append({
-                                    'file': str(js_file),
-                                    'line': line_num,
-                                    'col': col_num
-                                })
-
-                        # Also handle text that doesn't contain template literal patterns
-                        # (for backwards compatibility with non-template literal strings)
-                        if not re.search(template_literal_pattern, text):
-                            # Calculate line and column number using original content
-                            line_num = original_content[:match.start()].count('\n') + 1
-                            col_num = match.start() - original_content[:match.start()].rfind('\n')
-
-                            # Store location info
-                            if text not in strings:
-                                strings[text] = []
-                            strings[text].append({
-                                'file': str(js_file),
-                                'line': line_num,
-                                'col': col_num
-                            })
-
-        except Exception as e:
-            print(f"Error reading {js_file}: {e}")
-
-    return strings
-
-def load_translation_keys():
-    """Load all translation keys from language files.
-
-    Returns:
-        tuple: (all_keys, keys_by_language)
-            - all_keys: set of all unique keys across all language files
-            - keys_by_language: dict mapping language code to set of keys in that language
-    """
-    all_keys = set()
-    keys_by_language = {}
-
-    lang_files = list(LANG_DIR.glob("*.json"))
-
-    if not lang_files:
-        print(f"Warning: No language files found in {LANG_DIR}")
-        return all_keys, keys_by_language
-
-    # Load keys from all language files
-    for lang_file in lang_files:
-        try:
-            # Extract language code from filename (e.g., "en_us" from "en_us.json")
-            lang_code = lang_file.stem
-
-            with open(lang_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                keys = set(data.keys())
-                keys.discard("")  # Remove empty string key if present
-
-                keys_by_language[lang_code] = keys
-                all_keys.update(keys)
-        except Exception as e:
-            print(f"Error reading {lang_file}: {e}")
-
-    # Remove empty string key if present
-    all_keys.discard("")
-
-    return all_keys, keys_by_language
 
-def main():
-    if not JSON_OUTPUT:
-        print("=" * 80)
-        print("Translation String Checker")
-        print("=" * 80)
-        print()
-
-    # Find all source files
-    if not JSON_OUTPUT:
-        print("Scanning source files...")
-    html_files = find_html_files()
-    js_files = find_js_files()
-
-    if not JSON_OUTPUT:
-        print(f"Found {len(html_files)} HTML files")
-        print(f"Found {len(js_files)} JavaScript files")
-        print()
-
-    # Extract strings from source files
-    if not JSON_OUTPUT:
-        print("Extracting translation strings from source files...")
-    ds_i18n_strings = extract_ds_i18n_strings(html_files)
-    l_function_strings = extract_l_function_strings(js_files)
-    html_in_js_strings = extract_html_strings_from_js(js_files)
-
-    if not JSON_OUTPUT:
-        print(f"Found {len(ds_i18n_strings)} strings with ds-i18n class in HTML files")
-        print(f"Found {len(l_function_strings)} strings in l() function calls")
-        print(f"Found {len(html_in_js_strings)} strings with ds-i18n class in JavaScript files")
-        print()
-
-    # Combine all used strings and filter out excluded patterns
-    # Merge the three dictionaries, combining location lists for duplicate strings
-    all_used_strings_with_locations = {}
-    for text, locations in ds_i18n_strings.items():
-        all_used_strings_with_locations[text] = locations.copy()
-    for text, locations in l_function_strings.items():
-        if text in all_used_strings_with_locations:
-            all_used_strings_with_locations[text].extend(locations)
-        else:
-            all_used_strings_with_locations[text] = locations.copy()
-    for text, locations in html_in_js_strings.items():
-        if text in all_used_strings_with_locations:
-            all_used_strings_with_locations[text].extend(locations)
-        else:
-            all_used_strings_with_locations[text] = locations.copy()
-
-    excluded_strings = {s for s in all_used_strings_with_locations.keys() if should_exclude_string(s)}
-    used_strings_with_locations = {k: v for k, v in all_used_strings_with_locations.items() if k not in excluded_strings}
-    used_strings = set(used_strings_with_locations.keys())
-
-    if not JSON_OUTPUT and excluded_strings:
-        print(f"Excluded {len(excluded_strings)} non-translatable strings (CSS selectors, etc.)")
-        if VERBOSE:
-            for s in sorted(excluded_strings):
-                print(f"  - \"{s}\"")
-        print()
-
-    # Load translation keys
-    if not JSON_OUTPUT:
-        print("Loading translation keys from language files...")
-    translation_keys, keys_by_language = load_translation_keys()
-    if not JSON_OUTPUT:
-        print(f"Found {len(translation_keys)} keys in translation files")
-        print(f"Found {len(keys_by_language)} language files")
+# Seconds between two polls of the watched files in --watch mode
+WATCH_INTERVAL = 0.25
+
+
+def parse_jobs(value):
+    """Parse the --jobs value: a positive number, or 'auto' (None)."""
+    if value == 'auto':
+        return None
+    try:
+        jobs = int(value)
+    except ValueError:
+        jobs = 0
+    if jobs < 1:
+        raise argparse.ArgumentTypeError(f"expects a positive number or 'auto', got '{value}'")
+    return jobs
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compare the translation strings used in code with the language files.")
+    parser.add_argument('-v', '--verbose', action='store_true', help="show excluded strings")
+    parser.add_argument('--compact', action='store_true', help="compact output (no language details)")
+    parser.add_argument('--json', action='store_true', help="output in JSON format")
+    parser.add_argument('--no-cache', action='store_true', help="ignore and don't update the cache")
+    parser.add_argument('--cache-stats', action='store_true', help="report cache hits and misses")
+    parser.add_argument('-j', '--jobs', type=parse_jobs, default=None, metavar='N',
+                        help="parse files with N processes (default: auto)")
+    parser.add_argument('--watch', action='store_true', help="re-check whenever a file changes")
+    parser.add_argument('--timings', '--profile', action='store_true',
+                        help="time and memory of each phase")
+    parser.add_argument('--trace-memory', action='store_true',
+                        help="same as --timings, with exact allocation peaks (slower)")
+    parser.add_argument('--profile-output', metavar='FILE', help="write cProfile statistics to FILE")
+    parser.add_argument('--coverage', action='store_true',
+                        help="report the share of used strings translated in each language")
+    parser.add_argument('--coverage-since', metavar='REV',
+                        help="same as --coverage, with the changes since a git revision")
+    parser.add_argument('--renames', action='store_true',
+                        help="propose unused keys that look like the old text of missing strings")
+    parser.add_argument('--rename-patch', metavar='FILE',
+                        help="same as --renames, and write the proposals as a process_lang.py patch")
+    parser.add_argument('--suggest', action='store_true',
+                        help="suggest draft translations for missing strings from similar translated keys")
+    parser.add_argument('--changed-since', metavar='REF',
+                        help="only check the strings added or removed by the files changed since a git revision")
+    parser.add_argument('--staged', action='store_true',
+                        help="only check the strings added or removed by the staged changes")
+    parser.add_argument('--fail-fast', action='store_true',
+                        help="with --changed-since or --staged, stop at the first missing string")
+    parser.add_argument('--occurrences-output', metavar='FILE',
+                        help="write the locations of every extracted string to FILE (binary, see OccurrenceStore)")
+    parser.add_argument('--missing-in', metavar='LANG',
+                        help="list the keys of the other languages that LANG lacks or leaves empty")
+    parser.add_argument('--lacking', metavar='KEY',
+                        help="list the languages that lack KEY or leave it empty")
+    args = parser.parse_args(argv)
+    if args.fail_fast and not (args.changed_since or args.staged):
+        parser.error("--fail-fast requires --changed-since or --staged")
+    if args.changed_since and args.staged:
+        parser.error("--changed-since and --staged cannot be combined")
+    if args.missing_in is not None and args.lacking is not None:
+        parser.error("--missing-in and --lacking cannot be combined")
+    args.timings = args.timings or args.trace_memory
+    args.coverage = args.coverage or args.coverage_since is not None
+    args.renames = args.renames or args.rename_patch is not None
+    return args
+
+def print_timings(timings):
+    """Print the TIMINGS section of the text report."""
+    print("=" * 80)
+    print("TIMINGS")
+    print("=" * 80)
+    if timings["memory_source"] == "tracemalloc":
+        print("Memory: peak of Python allocations during each phase (tracemalloc)")
+    else:
+        print("Memory: peak resident memory of the process at the end of each phase")
+    print()
+    for phase in timings["phases"]:
+        peak = phase["peak_memory_bytes"]
+        memory = f"{peak / 1024 / 1024:>10.1f} MiB" if peak is not None else f"{'n/a':>14}"
+        print(f"{phase['name']:<24} {phase['seconds'] * 1000:>10.1f} ms {memory}")
+    print(f"{'total':<24} {timings['total_seconds'] * 1000:>10.1f} ms")
+    if timings["slowest_files"]:
         print()
+        print("Slowest files to parse:")
+        for entry in timings["slowest_files"]:
+            print(f"  {entry['seconds'] * 1000:>8.1f} ms  {entry['file']}")
+    print()
 
-    # Remove special keys from comparison
-    translation_keys_for_comparison = translation_keys - SPECIAL_KEYS
-
-    # Remove special keys from each language's key set
-    keys_by_language_filtered = {}
-    for lang_code, keys in keys_by_language.items():
-        keys_by_language_filtered[lang_code] = keys - SPECIAL_KEYS
-
-    # Find missing translations (used in code but not in translation files)
-    missing_translations = used_strings - translation_keys_for_comparison
-
-    # For each missing translation, find which languages are missing it
-    missing_by_language = {}
-    for string in missing_translations:
-        missing_langs = []
-        for lang_code, keys in keys_by_language_filtered.items():
-            if string not in keys:
-                missing_langs.append(lang_code)
-        missing_by_language[string] = sorted(missing_langs)
-
-    # Find unused translations (in translation files but not used in code)
-    # Exclude whitelisted strings from unused check
-    unused_translations = (translation_keys_for_comparison - used_strings) - WHITELIST_UNUSED
+def print_results(comparison, compact=False):
+    """Print the RESULTS and SUMMARY sections of the text report.
 
-    # Output results
-    if JSON_OUTPUT:
-        # Build missing translations with locations and missing languages
-        missing_with_locations = []
-        for string in sorted(missing_translations):
-            entry = {
-                "string": string,
-                "missing_from_languages": missing_by_language.get(string, [])
-            }
-            if string in used_strings_with_locations:
-                entry["locations"] = used_strings_with_locations[string]
-            missing_with_locations.append(entry)
-
-        result = {
-            "summary": {
-                "total_strings_used": len(used_strings),
-                "total_translation_keys": len(translation_keys_for_comparison),
-                "total_languages": len(keys_by_language),
-                "missing_count": len(missing_translations),
-                "unused_count": len(unused_translations),
-                "excluded_count": len(excluded_strings),
-                "whitelisted_count": len(WHITELIST_UNUSED)
-            },
-            "missing_translations": missing_with_locations,
-            "unused_translations": sorted(unused_translations),
-            "excluded_strings": sorted(excluded_strings),
-            "whitelisted_strings": sorted(WHITELIST_UNUSED)
-        }
-        print(json.dumps(result, indent=2, ensure_ascii=False))
-        return 1 if (missing_translations or unused_translations) else 0
+    Returns the exit code: 1 if translation files need updates, 0 otherwise.
+    """
+    used_strings_with_locations = comparison['used_strings_with_locations']
+    keys_by_language = comparison['keys_by_language']
+    missing_translations = comparison['missing_translations']
+    missing_by_language = comparison['missing_by_language']
+    unused_translations = comparison['unused_translations']
 
-    # Print results (text format)
     print("=" * 80)
     print("RESULTS")
     print("=" * 80)
@@ -488,7 +176,7 @@ def main():
         for string in sorted(missing_translations):
             print(f"  - \"{string}\"")
             # Show first location where this string was found (skip in compact mode)
-            if not COMPACT and string in used_strings_with_locations:
+            if not compact and string in used_strings_with_locations:
                 locations = used_strings_with_locations[string]
                 if locations:
                     loc = locations[0]
@@ -496,7 +184,7 @@ def main():
                     if len(locations) > 1:
                         print(f"    (and {len(locations) - 1} more location{'s' if len(locations) > 2 else ''})")
             # Show which languages are missing this translation (skip in compact mode)
-            if not COMPACT and string in missing_by_language:
+            if not compact and string in missing_by_language:
                 missing_langs = missing_by_language[string]
                 if len(missing_langs) == len(keys_by_language):
                     print(f"    Missing from: ALL languages ({len(missing_langs)})")
@@ -526,10 +214,11 @@ def main():
     print("=" * 80)
     print("SUMMARY")
     print("=" * 80)
-    print(f"Total strings used in code: {len(used_strings)}")
-    print(f"Total keys in translation files: {len(translation_keys_for_comparison)}")
+    print(f"Total strings used in code: {len(comparison['used_strings'])}")
+    print(f"Total keys in translation files: {len(comparison['translation_keys_for_comparison'])}")
     print(f"Missing translations: {len(missing_translations)}")
     print(f"Unused translations: {len(unused_translations)}")
+    from translation_index import WHITELIST_UNUSED
     print(f"Whitelisted strings: {len(WHITELIST_UNUSED)}")
     print()
 
@@ -540,5 +229,258 @@ def main():
         print("✅ All translations are in sync!")
         return 0
 
+def print_errors(index, json_output=False):
+    """Print the files that could not be read during the last refresh."""
+    for path, error in index.errors:
+        print(f"Error reading {path}: {error}", file=sys.stderr if json_output else sys.stdout)
+
+def query_database(index, args):
+    """Answer --missing-in / --lacking from the translation database, without extracting strings."""
+    from translation_index import LANG_DIR
+    db = index.db
+    _, errors = db.refresh()
+    for path, error in errors:
+        print(f"Error reading {path}: {error}", file=sys.stderr if args.json else sys.stdout)
+
+    if args.missing_in is not None:
+        if args.missing_in not in db.languages():
+            print(f"Error: no language file for {args.missing_in} in {LANG_DIR}", file=sys.stderr)
+            return 2
+        result = {"language": args.missing_in, **db.keys_missing_in(args.missing_in)}
+        title, item = f"Keys missing in {args.missing_in}", "keys"
+    else:
+        result = {"key": args.lacking, **db.languages_lacking(args.lacking)}
+        title, item = f"Languages lacking \"{args.lacking}\"", "languages"
+    exit_code = 1 if (result["absent"] or result["untranslated"]) else 0
+
+    if args.json:
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+        return exit_code
+
+    print(f"{title}: {len(result['absent'])} absent, {len(result['untranslated'])} untranslated")
+    for state in ("absent", "untranslated"):
+        if result[state] and not args.compact:
+            print()
+            print(f"{state.capitalize()} {item}:")
+            for value in result[state]:
+                print(f"  - \"{value}\"" if item == "keys" else f"  - {value}")
+    return exit_code
+
+def watch(index, json_output=False, compact=False, interval=WATCH_INTERVAL):
+    """Re-check translations whenever a source or language file changes.
+
+    Polls js/, templates/, the root HTML files and lang/ every interval
+    seconds. Only files whose size or mtime changed are extracted again; the
+    index keeps everything else in memory between checks. Runs until
+    interrupted.
+    """
+    try:
+        while True:
+            started = time.perf_counter()
+            changed = index.refresh()
+            if not changed:
+                time.sleep(interval)
+                continue
+
+            comparison = index.comparison()
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            print_errors(index, json_output)
+
+            if json_output:
+                print(json.dumps(index.report(), indent=2, ensure_ascii=False), flush=True)
+                continue
+
+            print()
+            print(f"[{time.strftime('%H:%M:%S')}] {len(changed)} file(s) changed, "
+                  f"checked in {elapsed_ms:.1f} ms")
+            print_results(comparison, compact)
+            print("Watching for changes (Ctrl+C to stop)...", flush=True)
+    except KeyboardInterrupt:
+        return 0
+
+def open_index(args):
+    """Return a TranslationIndex of the project for the options."""
+    from translation_index import TranslationIndex
+    return TranslationIndex(ROOT_DIR, use_cache=not args.no_cache, jobs=args.jobs)
+
+def check_changed(args):
+    """Run the diff-scoped check of --changed-since / --staged."""
+    index = None
+    try:
+        result, index = check_changes(lambda: open_index(args), args.changed_since, args.staged, args.fail_fast,
+                                      ROOT_DIR)
+    except subprocess.CalledProcessError as e:
+        print(f"Error: git {' '.join(e.cmd[1:3])} failed: {e.stderr.decode('utf-8', 'replace').strip()}",
+              file=sys.stderr)
+        return 2
+    finally:
+        if index is not None:
+            index.close()
+    if index is not None:
+        print_errors(index, args.json)
+
+    if args.json:
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+        return 1 if (result['missing_translations'] or result['unused_translations']) else 0
+    return print_changes(result, args.compact)
+
+def main(args):
+    if args.changed_since or args.staged:
+        return check_changed(args)
+
+    with open_index(args) as index:
+        if args.missing_in is not None or args.lacking is not None:
+            return query_database(index, args)
+        if args.watch:
+            return watch(index, args.json, args.compact)
+        return check_all(index, args)
+
+def check_all(index, args):
+    """Run the full check and print its report."""
+    from translation_index import LANG_DIR, PhaseTimer
+    from translation_coverage import build_coverage, print_coverage
+    from translation_renames import detect_renames, print_renames, write_rename_patch
+    from translation_memory import print_suggestions, suggest_translations
+
+    timer = PhaseTimer(enabled=args.timings, trace_memory=args.trace_memory)
+    json_output = args.json
+
+    if not json_output:
+        print("=" * 80)
+        print("Translation String Checker")
+        print("=" * 80)
+        print()
+
+    # Find and extract all source and language files
+    if not json_output:
+        print("Scanning source files...")
+    index.refresh(timer)
+    print_errors(index, json_output)
+
+    if not json_output:
+        print(f"Found {len(index.html_files)} HTML files")
+        print(f"Found {len(index.js_files)} JavaScript files")
+        print()
+
+        print("Extracting translation strings from source files...")
+    strings, counts = index.strings(timer)
+
+    if not json_output:
+        print(f"Found {counts['ds_i18n']} strings with ds-i18n class in HTML files")
+        print(f"Found {counts['l_function']} strings in l() function calls")
+        print(f"Found {counts['html_in_js']} strings with ds-i18n class in JavaScript files")
+        print()
+
+    if args.occurrences_output:
+        try:
+            strings.save(args.occurrences_output)
+        except OSError as e:
+            print(f"Error writing {args.occurrences_output}: {e}", file=sys.stderr)
+            return 2
+        if not json_output:
+            print(f"Wrote {len(strings.lines)} locations of {len(strings)} strings to {args.occurrences_output}")
+            print()
+
+    comparison = index.comparison(timer)
+    excluded_strings = comparison['excluded_strings']
+
+    if not json_output and excluded_strings:
+        print(f"Excluded {len(excluded_strings)} non-translatable strings (CSS selectors, etc.)")
+        if args.verbose:
+            for s in sorted(excluded_strings):
+                print(f"  - \"{s}\"")
+        print()
+
+    # Translation keys
+    if not json_output:
+        print("Loading translation keys from language files...")
+    if not index.lang_files:
+        print(f"Warning: No language files found in {LANG_DIR}")
+    if not json_output:
+        print(f"Found {len(comparison['translation_keys'])} keys in translation files")
+        print(f"Found {len(comparison['keys_by_language'])} language files")
+        print()
+
+    coverage = None
+    if args.coverage:
+        try:
+            with timer.phase('coverage'):
+                coverage = build_coverage(index, args.coverage_since)
+        except (OSError, subprocess.CalledProcessError) as e:
+            error = e.stderr.strip() if getattr(e, 'stderr', None) else e
+            print(f"Error: cannot read the language files at {args.coverage_since}: {error}", file=sys.stderr)
+            return 2
+
+    renames = None
+    if args.renames:
+        with timer.phase('renames'):
+            renames = detect_renames(comparison['missing_translations'], comparison['unused_translations'])
+        if args.rename_patch:
+            try:
+                write_rename_patch(renames, args.rename_patch)
+            except OSError as e:
+                print(f"Error writing {args.rename_patch}: {e}", file=sys.stderr)
+                return 2
+
+    suggestions = None
+    if args.suggest:
+        with timer.phase('suggest'):
+            suggestions = suggest_translations(index, comparison['missing_translations'])
+
+    cache = index.cache
+    if not json_output and args.cache_stats:
+        if cache.enabled:
+            print(f"Cache: {cache.hits} hits, {cache.misses} misses")
+        else:
+            print("Cache: disabled")
+        print()
+
+    # Output results
+    if json_output:
+        with timer.phase('report'):
+            result = index.report()
+        if coverage is not None:
+            result["coverage"] = coverage
+        if renames is not None:
+            result["renames"] = renames
+        if suggestions is not None:
+            result["suggestions"] = suggestions
+        if args.timings:
+            result["timings"] = timer.result(cache)
+        if args.cache_stats:
+            result["cache"] = {
+                "enabled": cache.enabled,
+                "hits": cache.hits,
+                "misses": cache.misses
+            }
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+        return 1 if (comparison['missing_translations'] or comparison['unused_translations']) else 0
+
+    # Print results (text format)
+    with timer.phase('report'):
+        exit_code = print_results(comparison, args.compact)
+    if renames is not None:
+        print()
+        print_renames(renames)
+        if args.rename_patch:
+            print(f"Wrote {len(renames)} rename(s) to {args.rename_patch}")
+            print()
+    if suggestions is not None:
+        print()
+        print_suggestions(suggestions, args.verbose)
+    if coverage is not None:
+        print()
+        print_coverage(coverage)
+    if args.timings:
+        print()
+        print_timings(timer.result(cache))
+    return exit_code
+
 if __name__ == "__main__":
-    exit(main())
+    args = parse_args()
+    if args.profile_output:
+        profiler = cProfile.Profile()
+        exit_code = profiler.runcall(main, args)
+        profiler.dump_stats(args.profile_output)
+        exit(exit_code)
+    exit(main(args))
@@ -0,0 +1,485 @@
+#!/usr/bin/env python3
+
+# (C) 2025 dualshock-tools
+#
+# This script decodes recorded DS4 / DualSense input reports offline, e.g. the
+# millions of reports captured from a controller on a test bench. It reads
+# the same fields as the web app (see _recordButtonStates() and
+# _parseTouchPoints() in js/controller-manager.js):
+# - sticks (bytes 0-3) and the L2/R2 analog bytes
+# - the d-pad hat nibble and every button of the controller's button map
+# - the two touchpad points at touchpadOffset
+# - the trigger stop sliders of the DualSense Edge
+#
+# A whole capture is decoded at once into a NumPy structured array (one
+# record per report, one field per input), with one vectorized operation per
+# field instead of a Python loop per report.
+#
+# The byte layouts mirror DS4_BUTTON_MAP / DS4_INPUT_CONFIG in
+# js/controllers/ds4-controller.js, DS5_BUTTON_MAP / DS5_INPUT_CONFIG in
+# js/controllers/ds5-controller.js and the extra buttons of
+# js/controllers/ds5-edge-controller.js. `verify` reads those maps from the
+# JavaScript files, compares them with the ones below and runs the decoder on
+# test vectors, so the two stay in sync.
+#
+# A capture is a file of fixed-size reports, as read from the device: by
+# default 64 bytes each, starting with the report ID (which WebHID strips
+# from event.data, so the offsets below do not count it). Only the USB
+# layouts are supported.
+#
+# Usage:
+#   python3 scripts/decode_hid_reports.py decode ds5 capture.bin               # Summary of a capture
+#   python3 scripts/decode_hid_reports.py decode ds5 capture.bin -o out.npy    # Save the decoded array
+#   python3 scripts/decode_hid_reports.py decode ds4 capture.bin --report-size 64 --header 1
+#   python3 scripts/decode_hid_reports.py verify                               # Check the maps and test vectors
+#
+# Run it from the root directory of the project.
+# Requirements: pip install numpy
+
+import re
+import sys
+import json
+import argparse
+from collections import namedtuple
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Byte layout of the input report data (report ID excluded). button_map lists
+# (name, byte, mask) like the JavaScript maps; the d-pad entries are decoded
+# from the hat nibble of dpad_byte instead of their mask.
+InputLayout = namedtuple('InputLayout', [
+    'button_map', 'dpad_byte', 'l2_analog_byte', 'r2_analog_byte', 'touchpad_offset', 'trigger_stop_byte',
+])
+
+DS4_BUTTON_MAP = (
+    ('up', 4, 0x0),
+    ('right', 4, 0x1),
+    ('down', 4, 0x2),
+    ('left', 4, 0x3),
+    ('square', 4, 0x10),
+    ('cross', 4, 0x20),
+    ('circle', 4, 0x40),
+    ('triangle', 4, 0x80),
+    ('l1', 5, 0x01),
+    ('l2', 5, 0x04),
+    ('r1', 5, 0x02),
+    ('r2', 5, 0x08),
+    ('create', 5, 0x10),
+    ('options', 5, 0x20),
+    ('l3', 5, 0x40),
+    ('r3', 5, 0x80),
+    ('ps', 6, 0x01),
+    ('touchpad', 6, 0x02),
+)
+
+DS5_BUTTON_MAP = (
+    ('up', 7, 0x0),
+    ('right', 7, 0x1),
+    ('down', 7, 0x2),
+    ('left', 7, 0x3),
+    ('square', 7, 0x10),
+    ('cross', 7, 0x20),
+    ('circle', 7, 0x40),
+    ('triangle', 7, 0x80),
+    ('l1', 8, 0x01),
+    ('l2', 4, 0xff),
+    ('r1', 8, 0x02),
+    ('r2', 5, 0xff),
+    ('create', 8, 0x10),
+    ('options', 8, 0x20),
+    ('l3', 8, 0x40),
+    ('r3', 8, 0x80),
+    ('ps', 9, 0x01),
+    ('touchpad', 9, 0x02),
+    ('mute', 9, 0x04),
+)
+
+DS5_EDGE_EXTRA_BUTTONS = (
+    ('fn_left', 9, 0x10),
+    ('fn_right', 9, 0x20),
+    ('paddle_left', 9, 0x40),
+    ('paddle_right', 9, 0x80),
+)
+
+LAYOUTS = {
+    'ds4': InputLayout(DS4_BUTTON_MAP, dpad_byte=4, l2_analog_byte=7, r2_analog_byte=8, touchpad_offset=34,
+                       trigger_stop_byte=None),
+    'ds5': InputLayout(DS5_BUTTON_MAP, dpad_byte=7, l2_analog_byte=4, r2_analog_byte=5, touchpad_offset=32,
+                       trigger_stop_byte=None),
+    'ds5_edge': InputLayout(DS5_BUTTON_MAP + DS5_EDGE_EXTRA_BUTTONS, dpad_byte=7, l2_analog_byte=4,
+                            r2_analog_byte=5, touchpad_offset=32, trigger_stop_byte=49),
+}
+
+# JavaScript files each layout is defined in, and the names used there
+JS_SOURCES = {
+    'ds4': (Path("js/controllers/ds4-controller.js"), 'DS4'),
+    'ds5': (Path("js/controllers/ds5-controller.js"), 'DS5'),
+    'ds5_edge': (Path("js/controllers/ds5-edge-controller.js"), None),
+}
+
+DEFAULT_REPORT_SIZE = 64
+DEFAULT_HEADER = 1
+
+# Reports decoded per step, to bound the temporary arrays on long captures
+DECODE_CHUNK_REPORTS = 1 << 20
+
+STICK_AXES = ('lx', 'ly', 'rx', 'ry')
+DPAD_DIRECTIONS = ('up', 'right', 'down', 'left')
+TOUCH_POINTS = 2
+
+# Hat values (low nibble of the d-pad byte) that press each direction; 8 is
+# released, like dpad_map in _recordButtonStates()
+DPAD_HATS = {
+    'up': (0, 1, 7),
+    'right': (1, 2, 3),
+    'down': (3, 4, 5),
+    'left': (5, 6, 7),
+}
+
+
+def require_numpy():
+    if np is None:
+        raise RuntimeError("numpy is required: pip install numpy")
+
+def report_dtype(layout):
+    """Return the NumPy structured dtype of the decoded reports of a layout."""
+    require_numpy()
+    touch = np.dtype([('active', '?'), ('id', 'u1'), ('x', 'u2'), ('y', 'u2')])
+    fields = [(axis, 'u1') for axis in STICK_AXES]
+    fields += [('l2_analog', 'u1'), ('r2_analog', 'u1')]
+    fields += [(name, '?') for name, _, _ in layout.button_map]
+    fields.append(('touch', touch, (TOUCH_POINTS,)))
+    if layout.trigger_stop_byte is not None:
+        fields += [('l2_stop_slider', 'u1'), ('r2_stop_slider', 'u1')]
+    return np.dtype(fields)
+
+def min_report_size(layout):
+    """Return the number of data bytes a report needs for every field of a layout."""
+    last = max([byte for _, byte, _ in layout.button_map]
+               + [layout.dpad_byte, layout.l2_analog_byte, layout.r2_analog_byte,
+                  layout.touchpad_offset + 4 * TOUCH_POINTS - 1, layout.trigger_stop_byte or 0])
+    return last + 1
+
+def _dpad_table():
+    """Return a (16, 4) bool table: the d-pad directions pressed for each hat value."""
+    table = np.zeros((16, len(DPAD_DIRECTIONS)), dtype=bool)
+    for column, direction in enumerate(DPAD_DIRECTIONS):
+        table[list(DPAD_HATS[direction]), column] = True
+    return table
+
+def decode_reports(data, layout):
+    """Decode report data into a structured array (see report_dtype()).
+
+    data is an (N, size) uint8 array of reports without their report ID.
+    """
+    require_numpy()
+    data = np.asarray(data, dtype=np.uint8)
+    if data.ndim != 2 or data.shape[1] < min_report_size(layout):
+        raise ValueError(f"expected reports of at least {min_report_size(layout)} bytes, got shape {data.shape}")
+
+    decoded = np.zeros(len(data), dtype=report_dtype(layout))
+    for byte, axis in enumerate(STICK_AXES):
+        decoded[axis] = data[:, byte]
+    decoded['l2_analog'] = data[:, layout.l2_analog_byte]
+    decoded['r2_analog'] = data[:, layout.r2_analog_byte]
+
+    directions = _dpad_table()[data[:, layout.dpad_byte] & 0x0F]
+    for column, direction in enumerate(DPAD_DIRECTIONS):
+        decoded[direction] = directions[:, column]
+    for name, byte, mask in layout.button_map:
+        if name not in DPAD_DIRECTIONS:
+            decoded[name] = (data[:, byte] & mask) != 0
+
+    # Each point is 4 bytes: active flag (bit 7 clear) and id, then 12-bit x and y
+    for point in range(TOUCH_POINTS):
+        base = layout.touchpad_offset + 4 * point
+        b0, b1, b2, b3 = (data[:, base + i].astype(np.uint16) for i in range(4))
+        touch = decoded['touch'][:, point]
+        touch['active'] = (b0 & 0x80) == 0
+        touch['id'] = b0 & 0x7F
+        touch['x'] = ((b2 & 0x0F) << 8) | b1
+        touch['y'] = (b3 << 4) | (b2 >> 4)
+
+    if layout.trigger_stop_byte is not None:
+        stops = data[:, layout.trigger_stop_byte]
+        decoded['l2_stop_slider'] = (stops >> 4) & 3
+        decoded['r2_stop_slider'] = stops >> 6
+    return decoded
+
+def stick_axis(raw):
+    """Return stick bytes as the -1..1 positions shown by the web app (rounded to 0.01)."""
+    require_numpy()
+    return np.round((np.asarray(raw, dtype=np.float64) - 127.5) / 128, 2)
+
+def load_capture(path, report_size=DEFAULT_REPORT_SIZE, header=DEFAULT_HEADER):
+    """Map a capture file as an (N, report_size - header) uint8 array of report data.
+
+    The file is memory-mapped, so only the parts being decoded are read.
+    """
+    require_numpy()
+    size = Path(path).stat().st_size
+    if size % report_size:
+        raise ValueError(f"{path}: {size} bytes is not a multiple of the report size ({report_size})")
+    if size == 0:
+        return np.zeros((0, report_size - header), dtype=np.uint8)
+    reports = np.memmap(path, dtype=np.uint8, mode='r').reshape(-1, report_size)
+    return reports[:, header:]
+
+def decode_capture(path, layout, report_size=DEFAULT_REPORT_SIZE, header=DEFAULT_HEADER,
+                   chunk=DECODE_CHUNK_REPORTS):
+    """Decode every report of a capture file into one structured array."""
+    data = load_capture(path, report_size, header)
+    decoded = np.empty(len(data), dtype=report_dtype(layout))
+    for start in range(0, len(data), chunk):
+        decoded[start:start + chunk] = decode_reports(data[start:start + chunk], layout)
+    return decoded
+
+def summarize(decoded, layout):
+    """Return a JSON-serializable summary of decoded reports.
+
+    For each button, the number of reports it is held in and the number of
+    presses (released to pressed transitions); for sticks and triggers, the
+    range of their raw values.
+    """
+    summary = {"reports": int(len(decoded)), "buttons": {}, "axes": {}}
+    for name, _, _ in layout.button_map:
+        held = decoded[name]
+        presses = int(held[0]) + int(np.count_nonzero(held[1:] & ~held[:-1])) if len(held) else 0
+        summary["buttons"][name] = {"held": int(np.count_nonzero(held)), "presses": presses}
+    for axis in STICK_AXES + ('l2_analog', 'r2_analog'):
+        values = decoded[axis]
+        summary["axes"][axis] = [int(values.min()), int(values.max())] if len(values) else None
+    summary["touch_reports"] = int(np.count_nonzero(decoded['touch']['active'].any(axis=1)))
+    return summary
+
+def print_summary(summary):
+    print(f"{summary['reports']} reports")
+    print()
+    print(f"{'Button':<14} {'Held':>10} {'Presses':>9}")
+    for name, counts in summary["buttons"].items():
+        print(f"{name:<14} {counts['held']:>10} {counts['presses']:>9}")
+    print()
+    for axis, bounds in summary["axes"].items():
+        if bounds is not None:
+            print(f"{axis:<14} {bounds[0]:>3} - {bounds[1]:<3}")
+    print(f"Reports with a touch: {summary['touch_reports']}")
+
+# ---- Synchronization with the JavaScript maps ----
+
+JS_BUTTON_PATTERN = re.compile(r"\{\s*name:\s*'(\w+)',\s*byte:\s*(\d+),\s*mask:\s*(0x[0-9a-fA-F]+|\d+)")
+JS_CONFIG_FIELDS = {
+    'dpad_byte': 'dpadByte',
+    'l2_analog_byte': 'l2AnalogByte',
+    'r2_analog_byte': 'r2AnalogByte',
+    'touchpad_offset': 'touchpadOffset',
+}
+
+def _js_block(source, start_pattern, end):
+    match = re.search(start_pattern, source)
+    if match is None:
+        raise ValueError(f"cannot find {start_pattern!r}")
+    return source[match.end():source.index(end, match.end())]
+
+def _js_buttons(block):
+    return tuple((name, int(byte), int(mask, 0)) for name, byte, mask in JS_BUTTON_PATTERN.findall(block))
+
+def read_js_layout(name, root=Path(".")):
+    """Read the layout of a controller from its JavaScript source."""
+    path, prefix = JS_SOURCES[name]
+    with open(Path(root) / path, 'r', encoding='utf-8') as f:
+        source = f.read()
+
+    if prefix is None:
+        # DS5 Edge: the DS5 layout, plus the buttons and trigger byte of the Edge
+        base = read_js_layout('ds5', root)
+        extra = _js_buttons(_js_block(source, r"getInputConfig\(\)\s*\{", "}\n  }"))
+        stop = re.search(r"parseDeviceSpecificInputs\(data\)\s*\{\s*const \w+ = data\.getUint8\((\d+)\)", source)
+        if stop is None:
+            raise ValueError(f"{path}: cannot find the trigger stop byte")
+        return base._replace(button_map=base.button_map + extra, trigger_stop_byte=int(stop.group(1)))
+
+    buttons = _js_buttons(_js_block(source, rf"const {prefix}_BUTTON_MAP\s*=\s*\[", "];"))
+    config = _js_block(source, rf"const {prefix}_INPUT_CONFIG\s*=\s*\{{", "};")
+    values = {}
+    for field, js_name in JS_CONFIG_FIELDS.items():
+        match = re.search(rf"\b{js_name}:\s*(\d+)", config)
+        if match is None:
+            raise ValueError(f"{path}: cannot find {js_name} in {prefix}_INPUT_CONFIG")
+        values[field] = int(match.group(1))
+    return InputLayout(buttons, trigger_stop_byte=None, **values)
+
+def compare_layouts(expected, actual):
+    """Return the differences between two layouts, as messages."""
+    problems = []
+    for field in InputLayout._fields:
+        if field != 'button_map' and getattr(expected, field) != getattr(actual, field):
+            problems.append(f"{field} is {getattr(actual, field)}, expected {getattr(expected, field)}")
+    expected_buttons = {name: (byte, mask) for name, byte, mask in expected.button_map}
+    actual_buttons = {name: (byte, mask) for name, byte, mask in actual.button_map}
+    for name in expected_buttons.keys() - actual_buttons.keys():
+        problems.append(f"button {name} is missing")
+    for name in actual_buttons.keys() - expected_buttons.keys():
+        problems.append(f"button {name} is not in the JavaScript map")
+    for name in expected_buttons.keys() & actual_buttons.keys():
+        if expected_buttons[name] != actual_buttons[name]:
+            byte, mask = actual_buttons[name]
+            problems.append(f"button {name} is byte {byte} mask {mask:#04x}, "
+                            f"expected byte {expected_buttons[name][0]} mask {expected_buttons[name][1]:#04x}")
+    return sorted(problems)
+
+def neutral_report(layout, size=None):
+    """Return the data of a report with the sticks centered and nothing pressed or touched."""
+    report = bytearray(size or min_report_size(layout))
+    report[0:4] = b'\x80\x80\x80\x80'
+    report[layout.dpad_byte] = 0x08
+    for point in range(TOUCH_POINTS):
+        report[layout.touchpad_offset + 4 * point] = 0x80
+    return report
+
+# Hand-decoded reports: (layout, {data byte: value} over neutral_report(), expected fields)
+TEST_VECTORS = (
+    ('ds4', {}, {'lx': 0x80, 'up': False, 'cross': False, 'l2': False,
+                 'touch': [(False, 0, 0, 0), (False, 0, 0, 0)]}),
+    ('ds4', {0: 0x00, 3: 0xff, 4: 0x16, 5: 0x0c, 7: 0x40, 8: 0xff},
+     {'lx': 0x00, 'ry': 0xff, 'left': True, 'up': False, 'down': False, 'square': True, 'cross': False,
+      'l2': True, 'r2': True, 'l1': False, 'l2_analog': 0x40, 'r2_analog': 0xff}),
+    ('ds4', {34: 0x05, 35: 0x34, 36: 0x12, 37: 0x56, 38: 0x86, 39: 0xff, 40: 0xff, 41: 0xff},
+     {'touch': [(True, 5, 0x234, 0x561), (False, 6, 0xfff, 0xfff)]}),
+    ('ds5', {4: 0x01, 7: 0x21, 9: 0x06},
+     {'up': True, 'right': True, 'down': False, 'cross': True, 'l2': True, 'r2': False, 'l2_analog': 1,
+      'touchpad': True, 'mute': True, 'ps': False}),
+    ('ds5', {7: 0x0f, 8: 0xc0}, {'up': False, 'right': False, 'down': False, 'left': False, 'l3': True,
+                                 'r3': True, 'options': False}),
+    ('ds5', {32: 0x7f, 33: 0x00, 34: 0xf0, 35: 0x43},
+     {'touch': [(True, 0x7f, 0x000, 0x43f), (False, 0, 0, 0)]}),
+    ('ds5_edge', {9: 0x50, 49: 0x9a}, {'fn_left': True, 'fn_right': False, 'paddle_left': True,
+                                       'paddle_right': False, 'mute': False, 'l2_stop_slider': 1,
+                                       'r2_stop_slider': 2}),
+)
+
+def _check_fields(record, expected):
+    problems = []
+    for field, value in expected.items():
+        if field == 'touch':
+            actual = [tuple(point.item()) for point in record['touch']]
+        else:
+            actual = record[field].item()
+        if actual != value:
+            problems.append(f"{field} is {actual}, expected {value}")
+    return problems
+
+def run_test_vectors(layouts):
+    """Decode the test vectors, plus one report per button of each layout.
+
+    Returns (number of reports checked, problems).
+    """
+    problems = []
+    count = 0
+    for name, changes, expected in TEST_VECTORS:
+        report = neutral_report(layouts[name])
+        for byte, value in changes.items():
+            report[byte] = value
+        record = decode_reports(np.frombuffer(bytes(report), dtype=np.uint8).reshape(1, -1), layouts[name])[0]
+        problems += [f"{name} vector {report.hex()}: {problem}" for problem in _check_fields(record, expected)]
+        count += 1
+
+    # Every button alone, and every hat value, in one batch per layout
+    for name, layout in layouts.items():
+        reports = []
+        expected = []
+        for button, byte, mask in layout.button_map:
+            if button in DPAD_DIRECTIONS:
+                continue
+            report = neutral_report(layout)
+            report[byte] |= mask
+            reports.append(report)
+            pressed = {other: other == button for other, _, _ in layout.button_map}
+            pressed.update({direction: False for direction in DPAD_DIRECTIONS})
+            expected.append(pressed)
+        for hat in range(16):
+            report = neutral_report(layout)
+            report[layout.dpad_byte] = hat
+            reports.append(report)
+            expected.append({direction: hat in DPAD_HATS[direction] for direction in DPAD_DIRECTIONS})
+        decoded = decode_reports(np.frombuffer(b''.join(reports), dtype=np.uint8).reshape(len(reports), -1), layout)
+        for report, record, fields in zip(reports, decoded, expected):
+            problems += [f"{name} report {report.hex()}: {problem}" for problem in _check_fields(record, fields)]
+        count += len(reports)
+    return count, problems
+
+def verify(root=Path(".")):
+    """Check the layouts against the JavaScript sources and run the test vectors. Returns the exit code."""
+    failed = False
+    js_layouts = {}
+    for name, layout in LAYOUTS.items():
+        path = JS_SOURCES[name][0]
+        try:
+            js_layouts[name] = read_js_layout(name, root)
+        except (OSError, ValueError) as e:
+            print(f"Error reading {path}: {e}")
+            failed = True
+            continue
+        problems = compare_layouts(js_layouts[name], layout)
+        if problems:
+            failed = True
+            print(f"{name}: out of sync with {path}:")
+            for problem in problems:
+                print(f"  - {problem}")
+        else:
+            print(f"{name}: in sync with {path}")
+
+    # The vectors run against the JavaScript maps where they could be read
+    count, problems = run_test_vectors({**LAYOUTS, **js_layouts})
+    for problem in problems:
+        print(f"  - {problem}")
+    print(f"{count} test reports decoded, {len(problems)} mismatches")
+    return 1 if failed or problems else 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Decode recorded DS4 / DualSense input reports.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    decode = subparsers.add_parser('decode', help="decode a capture file")
+    decode.add_argument('layout', choices=sorted(LAYOUTS), help="controller layout")
+    decode.add_argument('capture', type=Path, help="file of fixed-size raw reports")
+    decode.add_argument('--report-size', type=int, default=DEFAULT_REPORT_SIZE,
+                        help=f"bytes per report in the file (default: {DEFAULT_REPORT_SIZE})")
+    decode.add_argument('--header', type=int, default=DEFAULT_HEADER,
+                        help=f"bytes before the report data, e.g. the report ID (default: {DEFAULT_HEADER})")
+    decode.add_argument('-o', '--output', type=Path, help="save the decoded structured array as .npy")
+    decode.add_argument('--json', action='store_true', help="print the summary in JSON format")
+    subparsers.add_parser('verify', help="check the layouts against js/controllers and run the test vectors")
+    args = parser.parse_args()
+
+    try:
+        require_numpy()
+    except RuntimeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    if args.command == 'verify':
+        return verify()
+
+    layout = LAYOUTS[args.layout]
+    try:
+        decoded = decode_capture(args.capture, layout, args.report_size, args.header)
+    except (OSError, ValueError) as e:
+        print(f"Error reading {args.capture}: {e}", file=sys.stderr)
+        return 2
+    if args.output:
+        np.save(args.output, decoded)
+
+    summary = summarize(decoded, layout)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print_summary(summary)
+        if args.output:
+            print(f"Saved {len(decoded)} decoded reports to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,473 @@
+#!/usr/bin/env python3
+
+# (C) 2025 dualshock-tools
+#
+# This script reads and writes capture files of controller input reports, as
+# received by BaseController from WebHID (the inputreport events of the
+# device): each record holds the event time, the report ID and the report
+# data (event.data, without the report ID).
+#
+# The format is compact and append-only, so a soak test can record for hours
+# and a crash only loses the records not written yet:
+# - a file header: CAPTURE_MAGIC, the format version and the wall-clock time
+#   (in microseconds since the epoch) the capture started at
+# - chunks of up to CHUNK_RECORDS records, each starting with a chunk header:
+#   CHUNK_MAGIC, the number of records, the number of the first record (in
+#   the whole capture), the times of its first and last records and the
+#   length of their data; all the records of a chunk have the same length
+# - each record: its time (in microseconds, relative to the start of the
+#   capture), report ID and data length (RECORD_HEADER), then the data
+#
+# The chunk headers are the sparse index of the capture: a reader hops from
+# one to the next (about 1,700 hops per gigabyte of 64-byte reports) to find
+# the chunks that hold a range of times or record numbers, then
+# binary-searches the times of those records in place. The file is
+# memory-mapped, so records are returned as memoryviews, or as NumPy
+# structured arrays (one per chunk), on the file itself: a multi-gigabyte
+# capture can be sliced without reading it whole.
+#
+# A chunk left incomplete by a crash is ignored by the reader (and dropped
+# when the capture is appended to again).
+#
+# Usage:
+#   python3 scripts/hid_capture.py info soak.dshc                              # Records, chunks and duration
+#   python3 scripts/hid_capture.py convert capture.bin soak.dshc --rate 250    # From fixed-size raw reports
+#   python3 scripts/hid_capture.py slice soak.dshc part.bin --from 60 --to 120 # Raw reports of a time range (s)
+#   python3 scripts/hid_capture.py verify                                      # Self-test of the format
+#
+# Run it from the root directory of the project.
+# Optional: pip install numpy (for arrays of records)
+
+import os
+import sys
+import mmap
+import time
+import struct
+import bisect
+import argparse
+import tempfile
+from collections import namedtuple
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+CAPTURE_MAGIC = b'DSHC'
+CAPTURE_VERSION = 1
+CAPTURE_EXTENSION = '.dshc'
+
+# magic, version, reserved, start time (us since the epoch)
+FILE_HEADER = struct.Struct('<4sHHq')
+# magic, records, first record number, first time, last time, record data length
+CHUNK_MAGIC = b'CHNK'
+CHUNK_HEADER = struct.Struct('<4sIQqqH2x')
+# time (us since the start of the capture), report ID, data length
+RECORD_HEADER = struct.Struct('<qBxH')
+
+# Records per chunk: the granularity of the index, and what a writer buffers
+CHUNK_RECORDS = 8192
+
+DEFAULT_REPORT_SIZE = 64
+DEFAULT_HEADER = 1
+DEFAULT_RATE = 250
+
+# A chunk of the capture: offset of its header in the file, and its header fields
+Chunk = namedtuple('Chunk', ['offset', 'count', 'first_record', 'first_time', 'last_time', 'length'])
+
+
+def require_numpy():
+    if np is None:
+        raise RuntimeError("numpy is required: pip install numpy")
+
+def record_dtype(length):
+    """Return the NumPy structured dtype of the records with length bytes of data."""
+    require_numpy()
+    return np.dtype([('time', '<i8'), ('report_id', 'u1'), ('reserved', 'u1'), ('length', '<u2'),
+                     ('data', 'u1', (length,))])
+
+def _read_chunks(buffer, size):
+    """Walk the chunk headers of a capture. Returns (chunks, offset of the end of the last complete chunk)."""
+    chunks = []
+    offset = FILE_HEADER.size
+    while offset + CHUNK_HEADER.size <= size:
+        magic, count, first_record, first_time, last_time, length = CHUNK_HEADER.unpack_from(buffer, offset)
+        if magic != CHUNK_MAGIC:
+            raise ValueError(f"bad chunk header at offset {offset}")
+        end = offset + CHUNK_HEADER.size + count * (RECORD_HEADER.size + length)
+        if end > size:
+            break
+        chunks.append(Chunk(offset, count, first_record, first_time, last_time, length))
+        offset = end
+    return chunks, offset
+
+class _ChunkTimes:
+    """The record times of a chunk, read in place, as a sequence for bisect."""
+
+    def __init__(self, buffer, chunk):
+        self.buffer = buffer
+        self.start = chunk.offset + CHUNK_HEADER.size
+        self.stride = RECORD_HEADER.size + chunk.length
+        self.count = chunk.count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        return RECORD_HEADER.unpack_from(self.buffer, self.start + i * self.stride)[0]
+
+class HidCapture:
+    """Memory-mapped capture file, read-only.
+
+    Records are addressed by number (0 to len() - 1); time_range() converts a
+    range of times to one of record numbers.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < FILE_HEADER.size:
+                raise ValueError("not a capture file (too short)")
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buffer = memoryview(self._mmap)
+        magic, version, _, self.start_time = FILE_HEADER.unpack_from(self._buffer, 0)
+        if magic != CAPTURE_MAGIC:
+            self.close()
+            raise ValueError("not a capture file")
+        if version != CAPTURE_VERSION:
+            self.close()
+            raise ValueError(f"unsupported capture version {version}")
+        try:
+            self.chunks, self.end = _read_chunks(self._buffer, size)
+        except ValueError:
+            self.close()
+            raise
+        # Bytes of an incomplete chunk at the end of the file, if any
+        self.truncated = size - self.end
+        self._first_records = [chunk.first_record for chunk in self.chunks]
+        self._last_times = [chunk.last_time for chunk in self.chunks]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._mmap is None:
+            return
+        try:
+            self._buffer.release()
+            self._mmap.close()
+        except BufferError:
+            # Records returned earlier are still in use; the file is unmapped when they are gone
+            pass
+        self._mmap = None
+
+    def __len__(self):
+        if not self.chunks:
+            return 0
+        return self.chunks[-1].first_record + self.chunks[-1].count
+
+    @property
+    def duration(self):
+        """Time between the first and last records, in microseconds."""
+        return self.chunks[-1].last_time - self.chunks[0].first_time if self.chunks else 0
+
+    def find_time(self, t):
+        """Return the number of the first record at or after time t (len() if none)."""
+        i = bisect.bisect_left(self._last_times, t)
+        if i == len(self.chunks):
+            return len(self)
+        chunk = self.chunks[i]
+        return chunk.first_record + bisect.bisect_left(_ChunkTimes(self._buffer, chunk), t)
+
+    def time_range(self, start=None, end=None):
+        """Return the record numbers (first, end) of the records with start <= time < end."""
+        first = 0 if start is None else self.find_time(start)
+        return first, len(self) if end is None else max(first, self.find_time(end))
+
+    def _spans(self, first, end):
+        """Yield (chunk, index of the first record in it, index past the last) for a range of records."""
+        first = max(first, 0)
+        end = min(len(self), end)
+        i = bisect.bisect_right(self._first_records, first) - 1
+        while first < end:
+            chunk = self.chunks[i]
+            stop = min(end, chunk.first_record + chunk.count)
+            yield chunk, first - chunk.first_record, stop - chunk.first_record
+            first = stop
+            i += 1
+
+    def records(self, first=0, end=None):
+        """Yield (time, report ID, data memoryview) for the records first to end - 1.
+
+        The memoryviews point into the file, which stays mapped while they are in use.
+        """
+        for chunk, start, stop in self._spans(first, len(self) if end is None else end):
+            stride = RECORD_HEADER.size + chunk.length
+            offset = chunk.offset + CHUNK_HEADER.size + start * stride
+            for _ in range(stop - start):
+                t, report_id, length = RECORD_HEADER.unpack_from(self._buffer, offset)
+                yield t, report_id, self._buffer[offset + RECORD_HEADER.size:offset + RECORD_HEADER.size + length]
+                offset += stride
+
+    def arrays(self, first=0, end=None):
+        """Yield the records first to end - 1 as structured arrays (see record_dtype()), one per chunk.
+
+        The arrays are views on the file, not copies.
+        """
+        require_numpy()
+        for chunk, start, stop in self._spans(first, len(self) if end is None else end):
+            dtype = record_dtype(chunk.length)
+            yield np.ndarray((stop - start,), dtype=dtype, buffer=self._buffer,
+                             offset=chunk.offset + CHUNK_HEADER.size + start * dtype.itemsize)
+
+    def array(self, first=0, end=None):
+        """Return the records first to end - 1 as one structured array.
+
+        It is a view on the file when the records are in one chunk, a copy of
+        them otherwise. All the records must have the same length.
+        """
+        parts = list(self.arrays(first, end))
+        if not parts:
+            return np.zeros(0, dtype=record_dtype(0))
+        if len({part.dtype for part in parts}) > 1:
+            raise ValueError("records of different lengths; use arrays()")
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+class CaptureWriter:
+    """Append records to a capture file, creating it if needed.
+
+    Records are buffered and written one chunk at a time; flush() writes the
+    current chunk (e.g. periodically during a soak test). Times are in
+    microseconds since the start of the capture and must not decrease.
+    """
+
+    def __init__(self, path, start_time=None):
+        self.path = Path(path)
+        self.next_record = 0
+        self.last_time = None
+        if self.path.exists() and self.path.stat().st_size > 0:
+            with HidCapture(self.path) as capture:
+                self.start_time = capture.start_time
+                self.next_record = len(capture)
+                if capture.chunks:
+                    self.last_time = capture.chunks[-1].last_time
+                end = capture.end
+            self._file = open(self.path, 'r+b')
+            # Drop an incomplete chunk left by a crash
+            self._file.truncate(end)
+            self._file.seek(end)
+        else:
+            self.start_time = time.time_ns() // 1000 if start_time is None else start_time
+            self._file = open(self.path, 'wb')
+            self._file.write(FILE_HEADER.pack(CAPTURE_MAGIC, CAPTURE_VERSION, 0, self.start_time))
+        self._chunk = bytearray()
+        self._count = 0
+        self._length = None
+        self._first_time = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, t, report_id, data):
+        """Append a record: time t (us), report ID and data (bytes-like)."""
+        if self.last_time is not None and t < self.last_time:
+            raise ValueError(f"record time {t} is before the previous one ({self.last_time})")
+        data = bytes(data)
+        if self._count and (len(data) != self._length or self._count == CHUNK_RECORDS):
+            self.flush()
+        if not self._count:
+            self._length = len(data)
+            self._first_time = t
+        self._chunk += RECORD_HEADER.pack(t, report_id, len(data))
+        self._chunk += data
+        self._count += 1
+        self.last_time = t
+
+    def flush(self):
+        """Write the buffered records as a chunk."""
+        if not self._count:
+            return
+        self._file.write(CHUNK_HEADER.pack(CHUNK_MAGIC, self._count, self.next_record, self._first_time,
+                                           self.last_time, self._length))
+        self._file.write(self._chunk)
+        self._file.flush()
+        self.next_record += self._count
+        self._chunk = bytearray()
+        self._count = 0
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+
+def _seconds(t):
+    return None if t is None else round(t * 1_000_000)
+
+def info(path):
+    with HidCapture(path) as capture:
+        lengths = {}
+        for chunk in capture.chunks:
+            lengths[chunk.length] = lengths.get(chunk.length, 0) + chunk.count
+        started = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(capture.start_time / 1_000_000))
+        print(f"{path}: {len(capture)} records in {len(capture.chunks)} chunks, started {started}")
+        print(f"Duration: {capture.duration / 1_000_000:.3f} s")
+        for length, count in sorted(lengths.items()):
+            print(f"  {count} records of {length} bytes")
+        if capture.truncated:
+            print(f"Incomplete last chunk: {capture.truncated} bytes ignored")
+
+def convert(source, target, report_size=DEFAULT_REPORT_SIZE, header=DEFAULT_HEADER, rate=DEFAULT_RATE):
+    """Convert a file of fixed-size raw reports (report ID first) to a capture. Returns the record count."""
+    if header not in (0, 1):
+        raise ValueError("the header must be 0 bytes or the report ID")
+    size = Path(source).stat().st_size
+    if size % report_size:
+        raise ValueError(f"{size} bytes is not a multiple of the report size ({report_size})")
+    count = 0
+    with open(source, 'rb') as f, CaptureWriter(target) as writer:
+        t = 0 if writer.last_time is None else writer.last_time
+        while report := f.read(report_size):
+            writer.write(t + round(count * 1_000_000 / rate), report[0] if header else 0, report[header:])
+            count += 1
+    return count
+
+def slice_capture(source, target, start=None, end=None, report_id=None):
+    """Write the records of a time range as fixed-size raw reports (report ID first). Returns the record count."""
+    count = 0
+    length = None
+    tmp_path = Path(target).with_name(Path(target).name + '.tmp')
+    with HidCapture(source) as capture:
+        f = open(tmp_path, 'wb')
+        try:
+            with f:
+                for t, rid, data in capture.records(*capture.time_range(start, end)):
+                    if report_id is not None and rid != report_id:
+                        continue
+                    if length is None:
+                        length = len(data)
+                    elif len(data) != length:
+                        raise ValueError("records of different lengths; select a report ID with --report-id")
+                    f.write(bytes((rid,)))
+                    f.write(data)
+                    count += 1
+            os.replace(tmp_path, target)
+        except BaseException:
+            tmp_path.unlink()
+            raise
+    return count
+
+def verify():
+    """Write captures covering the edge cases of the format, read them back and compare. Returns the exit code."""
+    problems = []
+    # Two report lengths (like DS4 reports 0x01 and 0x11 over Bluetooth), several chunks, repeated times
+    expected = []
+    for i in range(3 * CHUNK_RECORDS + 100):
+        report_id, length = (0x11, 77) if 5000 <= i < 5010 else (0x01, 63)
+        expected.append((i * 4000 // 3, report_id, bytes((i + j) & 0xff for j in range(length))))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / f"test{CAPTURE_EXTENSION}"
+        with CaptureWriter(path, start_time=0) as writer:
+            for record in expected[:10000]:
+                writer.write(*record)
+        # Appending continues the record numbers and times
+        with CaptureWriter(path) as writer:
+            for record in expected[10000:]:
+                writer.write(*record)
+            try:
+                writer.write(0, 1, b'')
+                problems.append("a record going back in time was accepted")
+            except ValueError:
+                pass
+
+        with HidCapture(path) as capture:
+            actual = [(t, report_id, bytes(data)) for t, report_id, data in capture.records()]
+            if actual != expected:
+                problems.append("the records read back differ from the ones written")
+            for t in (-1, 0, 1, 6_666_666, 6_666_667, expected[-1][0], expected[-1][0] + 1):
+                first = next((i for i, record in enumerate(expected) if record[0] >= t), len(expected))
+                if capture.find_time(t) != first:
+                    problems.append(f"find_time({t}) is {capture.find_time(t)}, expected {first}")
+            first, end = capture.time_range(1_000_000, 12_000_000)
+            if [bytes(data) for _, _, data in capture.records(first, end)] != \
+                    [data for t, _, data in expected if 1_000_000 <= t < 12_000_000]:
+                problems.append("the records of a time range differ")
+            if np is not None:
+                array = capture.array(*capture.time_range(0, 6_000_000))
+                if array['data'].tobytes() != b''.join(data for t, _, data in expected if t < 6_000_000):
+                    problems.append("the array of a time range differs")
+                view = next(capture.arrays(100, 200))
+                if view.base is None or view['time'][0] != expected[100][0]:
+                    problems.append("arrays() does not return views on the file")
+            size = capture.end
+
+        # A crash in the middle of a chunk: the reader ignores it, a writer drops it
+        with open(path, 'ab') as f:
+            f.write(CHUNK_HEADER.pack(CHUNK_MAGIC, 10, len(expected), 0, 0, 63) + b'\0' * 100)
+        with HidCapture(path) as capture:
+            if len(capture) != len(expected) or capture.truncated != CHUNK_HEADER.size + 100:
+                problems.append("an incomplete chunk is not ignored")
+        with CaptureWriter(path) as writer:
+            writer.write(expected[-1][0], 1, b'\1' * 63)
+        with HidCapture(path) as capture:
+            if len(capture) != len(expected) + 1 or capture.truncated or capture.chunks[-1].offset != size:
+                problems.append("an incomplete chunk is not dropped when appending")
+
+    for problem in problems:
+        print(f"  - {problem}")
+    print(f"{len(expected)} records written and read back, {len(problems)} problems")
+    return 1 if problems else 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Read and write capture files of controller input reports.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    info_parser = subparsers.add_parser('info', help="describe a capture")
+    info_parser.add_argument('capture', type=Path)
+    convert_parser = subparsers.add_parser('convert', help="convert (or append) fixed-size raw reports to a capture")
+    convert_parser.add_argument('source', type=Path, help="file of fixed-size raw reports")
+    convert_parser.add_argument('capture', type=Path)
+    convert_parser.add_argument('--report-size', type=int, default=DEFAULT_REPORT_SIZE,
+                                help=f"bytes per report in the file (default: {DEFAULT_REPORT_SIZE})")
+    convert_parser.add_argument('--header', type=int, default=DEFAULT_HEADER,
+                                help=f"1 if the reports start with their report ID, else 0 (default: {DEFAULT_HEADER})")
+    convert_parser.add_argument('--rate', type=float, default=DEFAULT_RATE,
+                                help=f"reports per second, to time them (default: {DEFAULT_RATE})")
+    slice_parser = subparsers.add_parser('slice', help="write the reports of a time range as fixed-size raw reports")
+    slice_parser.add_argument('capture', type=Path)
+    slice_parser.add_argument('output', type=Path)
+    slice_parser.add_argument('--from', dest='start', type=float, help="start time in seconds (default: start)")
+    slice_parser.add_argument('--to', dest='end', type=float, help="end time in seconds, excluded (default: end)")
+    slice_parser.add_argument('--report-id', type=lambda value: int(value, 0), help="only keep this report ID")
+    subparsers.add_parser('verify', help="self-test of the capture format")
+    args = parser.parse_args()
+
+    if args.command == 'verify':
+        return verify()
+
+    path = args.capture
+    try:
+        if args.command == 'info':
+            info(path)
+        elif args.command == 'convert':
+            path = args.source
+            count = convert(args.source, args.capture, args.report_size, args.header, args.rate)
+            print(f"Wrote {count} records to {args.capture}")
+        else:
+            count = slice_capture(args.capture, args.output, _seconds(args.start), _seconds(args.end), args.report_id)
+            print(f"Wrote {count} reports to {args.output}")
+    except (OSError, ValueError) as e:
+        print(f"Error reading {path}: {e}", file=sys.stderr)
+        return 2
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+
+# (C) 2025 dualshock-tools
+#
+# This script precompresses the built site, so the web server can send the
+# files as they are (gzip_static / brotli_static in nginx) instead of
+# compressing them on every request:
+# - <file>.gz next to each text asset in dist/, at maximum compression
+# - <file>.br as well, when the brotli module is installed
+# - dist/precompressed.json, a manifest with the size, SHA-256 and ETag of
+#   every asset and of its compressed variants
+#
+# Inputs whose hash did not change since the previous run (according to the
+# manifest) are not compressed again, so repeated builds stay fast. Variants
+# that would not be smaller than the original are not written, and variants
+# of deleted assets are removed.
+#
+# Usage:
+#   python3 scripts/precompress_assets.py                # Compress dist/
+#   python3 scripts/precompress_assets.py --dir DIR      # Compress DIR
+#   python3 scripts/precompress_assets.py --force        # Ignore the manifest and compress everything
+#
+# Run it from the root directory of the project, after `npm run build`.
+# Optional: pip install brotli (for .br files)
+
+import os
+import sys
+import gzip
+import json
+import hashlib
+import argparse
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DEFAULT_DIR = Path("dist")
+MANIFEST_NAME = "precompressed.json"
+MANIFEST_VERSION = 1
+
+# Extensions of the files worth compressing (images such as PNG are already compressed)
+COMPRESSIBLE_EXTENSIONS = {
+    ".css", ".html", ".ico", ".js", ".json", ".map", ".mjs", ".svg", ".txt", ".webmanifest", ".xml",
+}
+
+
+def compress_gzip(data):
+    # mtime=0 keeps the output identical for identical inputs
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+def compress_brotli(data):
+    return brotli.compress(data, quality=11)
+
+def available_encodings():
+    """Return a dict mapping file suffix to compressor for the usable encodings."""
+    encodings = {".gz": compress_gzip}
+    if brotli is not None:
+        encodings[".br"] = compress_brotli
+    return encodings
+
+def find_assets(root):
+    """Return the sorted paths (relative to root) of the compressible files."""
+    assets = []
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = Path(dirpath) / filename
+            if path.suffix in COMPRESSIBLE_EXTENSIONS and filename != MANIFEST_NAME:
+                assets.append(path.relative_to(root))
+    return sorted(assets)
+
+def etag(digest):
+    return f'"{digest[:16]}"'
+
+def write_atomic(path, content):
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+def load_manifest(root):
+    try:
+        with open(root / MANIFEST_NAME, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get("version") != MANIFEST_VERSION:
+        return {}
+    return manifest.get("files", {})
+
+def is_up_to_date(root, asset, entry, digest, encodings):
+    """Check that a previous entry matches the asset and its variants exist."""
+    if entry is None or entry["sha256"] != digest:
+        return False
+    if set(entry["encodings"]) != {suffix[1:] for suffix in encodings} - set(entry.get("skipped", [])):
+        return False
+    for encoding, variant in entry["encodings"].items():
+        try:
+            if os.path.getsize(root / f"{asset}.{encoding}") != variant["bytes"]:
+                return False
+        except OSError:
+            return False
+    return True
+
+def precompress(root, force=False):
+    """Compress the assets under root and return (manifest, compressed, unchanged)."""
+    encodings = available_encodings()
+    previous = {} if force else load_manifest(root)
+    files = {}
+    compressed = unchanged = 0
+
+    for asset in find_assets(root):
+        path = root / asset
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError as e:
+            print(f"Error reading {path}: {e}")
+            continue
+        digest = hashlib.sha256(data).hexdigest()
+        key = asset.as_posix()
+
+        entry = previous.get(key)
+        if is_up_to_date(root, asset, entry, digest, encodings):
+            files[key] = entry
+            unchanged += 1
+            continue
+
+        entry = {"bytes": len(data), "sha256": digest, "etag": etag(digest), "encodings": {}, "skipped": []}
+        for suffix, compress in encodings.items():
+            variant_path = root / f"{asset}{suffix}"
+            variant = compress(data)
+            if len(variant) >= len(data):
+                # Not worth it: let the server send the original
+                entry["skipped"].append(suffix[1:])
+                if variant_path.exists():
+                    variant_path.unlink()
+                continue
+            write_atomic(variant_path, variant)
+            variant_digest = hashlib.sha256(variant).hexdigest()
+            entry["encodings"][suffix[1:]] = {
+                "bytes": len(variant),
+                "sha256": variant_digest,
+                "etag": etag(variant_digest),
+            }
+        files[key] = entry
+        compressed += 1
+
+    # Drop the variants of assets that no longer exist
+    for key in set(previous) - set(files):
+        for encoding in previous[key].get("encodings", {}):
+            variant_path = root / f"{key}.{encoding}"
+            if variant_path.exists():
+                variant_path.unlink()
+
+    return {"version": MANIFEST_VERSION, "files": files}, compressed, unchanged
+
+def main():
+    parser = argparse.ArgumentParser(description="Write .gz (and .br) files and an ETag manifest for the built site.")
+    parser.add_argument('--dir', type=Path, default=DEFAULT_DIR, help=f"site directory (default: {DEFAULT_DIR})")
+    parser.add_argument('--force', action='store_true', help="compress every asset, even if unchanged")
+    args = parser.parse_args()
+
+    if not args.dir.is_dir():
+        print(f"Error: {args.dir} not found, run `npm run build` first", file=sys.stderr)
+        return 1
+
+    manifest, compressed, unchanged = precompress(args.dir, args.force)
+    write_atomic(args.dir / MANIFEST_NAME,
+                 json.dumps(manifest, indent=2, ensure_ascii=False, sort_keys=True).encode('utf-8'))
+
+    total = sum(entry["bytes"] for entry in manifest["files"].values())
+    print(f"{len(manifest['files'])} assets ({total} bytes): {compressed} compressed, {unchanged} unchanged")
+    for encoding in available_encodings():
+        encoding = encoding[1:]
+        size = sum(entry["encodings"][encoding]["bytes"] if encoding in entry["encodings"] else entry["bytes"]
+                   for entry in manifest["files"].values())
+        print(f"  {encoding}: {size} bytes")
+    if brotli is None:
+        print("brotli module not installed, only gzip files were written")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,12 +2,45 @@
 
 # (C) 2025 dualshock-tools
 #
-# This script can be used to add or remove a sentence from all the language
-# files. It's really simple and hacking: just edit this files adding lines
-# In the corresponsing fields (add, remove) and run it.
+# This script adds, removes or renames sentences in all the language files.
+# The changes come from a patch file (or stdin), with one JSON operation per
+# line; blank lines and lines starting with # are ignored:
 #
-# Quick note: run it from the "root" directory of the project: it searches for
-# ./lang/ so the correct command should be `python3 scripts/process_lang.py`.
+#   {"op": "add", "key": "New sentence"}
+#   {"op": "remove", "key": "Old sentence"}
+#   {"op": "rename", "key": "Old sentence", "to": "New sentence"}
+#
+# Without a patch, the sentences listed in the data dict below are removed
+# and added.
+#
+# A rename keeps the translation of the old key under the new one, on the same
+# line. Only the entries touched by the operations change: every other line
+# keeps its text and position, and new keys are inserted into the sorted block
+# of untranslated keys at the end of the file (before the "" key). All the
+# operations are applied in one pass per language file, the files are
+# processed concurrently, files whose content does not change are not
+# written, and changed files are replaced atomically (temp file + rename).
+# A file that cannot be read or written is reported and the others are still
+# processed.
+#
+# Run it from the "root" directory of the project: it searches for ./lang/.
+#
+# Usage:
+#   python3 scripts/process_lang.py                      # Apply the data dict below
+#   python3 scripts/process_lang.py patch.jsonl          # Apply a patch file
+#   python3 scripts/process_lang.py - < patch.jsonl      # Read the patch from stdin
+#   python3 scripts/process_lang.py --check patch.jsonl  # Only report the files that would change
+#   python3 scripts/process_lang.py --jobs N patch.jsonl # Process N files at a time (default: all)
+#   python3 scripts/process_lang.py --no-index patch.jsonl  # Don't use or update the translation database
+#
+# With --check nothing is written, and the exit code is 1 if any file would
+# change, so it can be used in CI to verify that a patch has been applied.
+#
+# The keys of every language are looked up in the translation database shared
+# with check_translations.py (.translations.sqlite, see translation_index.py),
+# so the files a patch does not change are not even read, and the files that
+# are written are stored in the database at the same time. --no-index works
+# from the files alone.
 
 data = {
     "remove": [
@@ -20,55 +53,333 @@ data = {
 
 ## ---
 
-import os, json
+import os, sys, json, argparse
+from concurrent.futures import ThreadPoolExecutor
 
-def process_file(filename):
-    x = json.loads(open(filename, "r").read())
+from translation_index import TranslationDatabase
 
-    modified = False
-    for i in data["remove"]:
-        if i in x:
-            del x[i]
-            modified = True
-        else:
-            print("[REMOVE] %s: Cannot find '%s'" % (filename, i))
-    for i in data["add"]:
-        if i in x:
-            print("[ADD] %s: '%s' already present" % (filename, i))
-        else:
-            x[i] = ""
-            modified = True
+LANG_DIR = "lang"
+
+# Operations of a patch and the fields they require
+PATCH_OPS = {
+    "add": ("key",),
+    "remove": ("key",),
+    "rename": ("key", "to"),
+}
+
+def ops_from_data(data):
+    """Convert the data dict at the top of this file into patch operations."""
+    ops = [{"op": "remove", "key": i} for i in data["remove"]]
+    ops += [{"op": "add", "key": i} for i in data["add"]]
+    return ops
+
+def parse_patch(lines, source="<patch>"):
+    """Parse the lines of a patch into a list of operations.
+
+    Raises ValueError with the line number on malformed operations.
+    """
+    ops = []
+    for line_num, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            op = json.loads(line)
+        except ValueError as e:
+            raise ValueError("%s:%d: invalid JSON: %s" % (source, line_num, e))
+        if not isinstance(op, dict) or op.get("op") not in PATCH_OPS:
+            raise ValueError("%s:%d: expected an object with \"op\" set to one of %s"
+                             % (source, line_num, ", ".join(PATCH_OPS)))
+        for field in PATCH_OPS[op["op"]]:
+            if not isinstance(op.get(field), str):
+                raise ValueError("%s:%d: %s needs a string \"%s\"" % (source, line_num, op["op"], field))
+        ops.append(op)
+    return ops
+
+class LangFile:
+    """A language file parsed into entries that keep their source text.
+
+    Each entry is [key, value, text, key_start, key_end], text being the
+    exact source of the entry (including the whitespace before it) and
+    key_start:key_end the position of the quoted key in it. Entries that are
+    not edited are written back byte for byte, so keys keep their order and
+    formatting and a change only touches the lines it affects.
+    """
+
+    def __init__(self, content):
+        self.entries = []
+        self.added = []
+        self.prefix, self.suffix = self._parse(content)
+        self.by_key = {entry[0]: entry for entry in self.entries}
+        # Indentation of new entries, copied from the first one
+        self.indent = "\n    "
+        if self.entries:
+            self.indent = self.entries[0][2][:self.entries[0][3]]
+
+    def _parse(self, content):
+        decoder = json.JSONDecoder()
+        pos = _skip_ws(content, 0)
+        if content[pos:pos + 1] != "{":
+            raise ValueError("expected a JSON object")
+        prefix = content[:pos + 1]
+        start = pos + 1
+        pos = _skip_ws(content, start)
+        if content[pos:pos + 1] == "}":
+            return prefix, content[start:]
+        while True:
+            key_start = pos
+            key, pos = decoder.raw_decode(content, pos)
+            if not isinstance(key, str):
+                raise ValueError("expected a key at offset %d" % (key_start, ))
+            key_end = pos
+            pos = _skip_ws(content, pos)
+            if content[pos:pos + 1] != ":":
+                raise ValueError("expected ':' at offset %d" % (pos, ))
+            value, value_end = decoder.raw_decode(content, _skip_ws(content, pos + 1))
+            pos = _skip_ws(content, value_end)
+            if content[pos:pos + 1] == ",":
+                self.entries.append([key, value, content[start:pos], key_start - start, key_end - start])
+                start = pos + 1
+                pos = _skip_ws(content, start)
+            elif content[pos:pos + 1] == "}":
+                self.entries.append([key, value, content[start:value_end], key_start - start, key_end - start])
+                return prefix, content[value_end:]
+            else:
+                raise ValueError("expected ',' or '}' at offset %d" % (pos, ))
+
+    def __contains__(self, key):
+        return key in self.by_key
+
+    def remove(self, key):
+        entry = self.by_key.pop(key)
+        entry[2] = None
+
+    def add(self, key, value=""):
+        quoted = json.dumps(key, ensure_ascii=False)
+        text = self.indent + quoted + ": " + json.dumps(value, ensure_ascii=False)
+        entry = [key, value, text, len(self.indent), len(self.indent) + len(quoted)]
+        self.added.append(entry)
+        self.by_key[key] = entry
+
+    def rename(self, key, new_key):
+        entry = self.by_key.pop(key)
+        quoted = json.dumps(new_key, ensure_ascii=False)
+        entry[2] = entry[2][:entry[3]] + quoted + entry[2][entry[4]:]
+        entry[0] = new_key
+        entry[4] = entry[3] + len(quoted)
+        self.by_key[new_key] = entry
+
+    def render(self):
+        """Return the content of the file with the edits spliced in.
+
+        New keys have no translation yet: they go into the block of
+        untranslated keys at the end of the file, in sorted position when
+        that block is sorted, and the "" key stays last.
+        """
+        entries = [entry for entry in self.entries if entry[2] is not None]
+        sentinel = []
+        if entries and entries[-1][0] == "":
+            sentinel = [entries.pop()]
+        elif "" not in self.by_key:
+            self.add("")
+            sentinel = [self.added.pop()]
 
-    if "" in x:
-        del x[""]
-    empties = []
-    for i in x:
-        if len(x[i].strip()) == 0:
-            empties += [i]
+        added = sorted((entry for entry in self.added if entry[2] is not None), key=lambda entry: entry[0])
+        if added:
+            block_start = len(entries)
+            while block_start > 0 and isinstance(entries[block_start - 1][1], str) \
+                    and not entries[block_start - 1][1].strip():
+                block_start -= 1
+            block = entries[block_start:]
+            if all(a[0] <= b[0] for a, b in zip(block, block[1:])):
+                block = sorted(block + added, key=lambda entry: entry[0])
+            else:
+                block += added
+            entries[block_start:] = block
 
-    empties = sorted(empties)
+        return self.prefix + ",".join(entry[2] for entry in entries + sentinel) + self.suffix
 
-    for i in empties:
-        del x[i]
+class KeySet:
+    """The keys of a language file, to dry-run operations without reading it.
 
-    for i in empties:
-        x[i] = ""
+    It supports the same edits as LangFile, for apply_ops().
+    """
 
-    x[""] = ""
+    def __init__(self, keys):
+        self.keys = set(keys)
 
-    return (modified, json.dumps(x, indent=4, ensure_ascii=False))
+    def __contains__(self, key):
+        return key in self.keys
 
+    def remove(self, key):
+        self.keys.remove(key)
 
-files = list(os.listdir("lang"))
+    def add(self, key, value=""):
+        self.keys.add(key)
 
-for i in files:
-    modified, new_file = process_file("lang/" + i)
+    def rename(self, key, new_key):
+        self.keys.remove(key)
+        self.keys.add(new_key)
+
+def _skip_ws(content, pos):
+    while pos < len(content) and content[pos] in " \t\r\n":
+        pos += 1
+    return pos
+
+def apply_ops(x, ops, filename):
+    """Apply patch operations to a LangFile in place.
+
+    Returns (modified, messages), messages being the warnings to print.
+    """
+    modified = False
+    messages = []
+    for op in ops:
+        key = op["key"]
+        if op["op"] == "remove":
+            if key in x:
+                x.remove(key)
+                modified = True
+            else:
+                messages.append("[REMOVE] %s: Cannot find '%s'" % (filename, key))
+        elif op["op"] == "add":
+            if key in x:
+                messages.append("[ADD] %s: '%s' already present" % (filename, key))
+            else:
+                x.add(key)
+                modified = True
+        elif op["op"] == "rename":
+            if key not in x:
+                messages.append("[RENAME] %s: Cannot find '%s'" % (filename, key))
+            elif op["to"] in x:
+                messages.append("[RENAME] %s: '%s' already present" % (filename, op["to"]))
+            else:
+                x.rename(key, op["to"])
+                modified = True
+    return modified, messages
+
+def process_file(filename, ops=None):
+    """Apply operations (default: the data dict) to a language file's content.
+
+    Only the entries touched by the operations change; the rest of the file
+    is copied as is. Returns (modified, new_content, messages); nothing is
+    written.
+    """
+    if ops is None:
+        ops = ops_from_data(data)
+    with open(filename, "r", encoding="utf-8") as f:
+        x = LangFile(f.read())
+
+    modified, messages = apply_ops(x, ops, filename)
+
+    return (modified, x.render(), messages)
+
+def write_atomic(filename, content):
+    """Replace a file's content so readers never see a partial write."""
+    tmp_filename = filename + ".tmp"
+    f = open(tmp_filename, "wb")
+    try:
+        with f:
+            f.write(content)
+        os.replace(tmp_filename, filename)
+    except OSError:
+        os.remove(tmp_filename)
+        raise
+
+def update_file(filename, ops, check=False, keys=None):
+    """Apply operations to one language file and write it if it changed.
+
+    keys is the set of keys of the file according to the translation
+    database, if known: when the operations do not change them, the file is
+    not read at all.
+
+    Returns (status, messages, written), status being "modified", "not
+    modified", "invalid content" or "error", and written the bytes written
+    to the file (None if it was not written).
+    """
+    if keys is not None:
+        modified, messages = apply_ops(KeySet(keys), ops, filename)
+        if not modified:
+            return "not modified", messages, None
+    try:
+        modified, new_file, messages = process_file(filename, ops)
+    except (OSError, ValueError) as e:
+        return "error", ["Error reading %s: %s" % (filename, e)], None
     if not modified:
-        print("%s: not modified" % (i, ))
-        continue
+        return "not modified", messages, None
     if len(new_file) < 100:
-        print("%s: invalid content" % (i, ))
-        continue
-    print("%s: writing changes" % (i, ))
+        return "invalid content", messages, None
+
+    new_bytes = new_file.encode("utf-8")
+    with open(filename, "rb") as f:
+        if f.read() == new_bytes:
+            return "not modified", messages, None
+    if check:
+        return "modified", messages, None
+    try:
+        write_atomic(filename, new_bytes)
+    except OSError as e:
+        return "error", messages + ["Error writing %s: %s" % (filename, e)], None
+    return "modified", messages, new_bytes
+
+def main():
+    parser = argparse.ArgumentParser(description="Add, remove or rename sentences in all the language files.")
+    parser.add_argument("patch", nargs="?", help="patch file with one JSON operation per line, or - for stdin")
+    parser.add_argument("--check", action="store_true", help="only report the files that would change")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="number of files processed at a time")
+    parser.add_argument("--no-index", action="store_true", help="don't use or update the translation database")
+    args = parser.parse_args()
+
+    try:
+        if args.patch is None:
+            ops = ops_from_data(data)
+        elif args.patch == "-":
+            ops = parse_patch(sys.stdin, "<stdin>")
+        else:
+            with open(args.patch, "r", encoding="utf-8") as f:
+                ops = parse_patch(f, args.patch)
+    except (OSError, ValueError) as e:
+        print("Error: %s" % (e, ), file=sys.stderr)
+        return 2
+
+    files = sorted(i for i in os.listdir(LANG_DIR) if i.endswith(".json"))
+    db = None
+    keys_by_language = {}
+    if not args.no_index:
+        # Files that fail to load are left out, and read (and reported) by update_file()
+        db = TranslationDatabase(".")
+        db.refresh()
+        keys_by_language = db.keys_by_language()
+
+    def update(i):
+        return update_file(os.path.join(LANG_DIR, i), ops, args.check, keys_by_language.get(i[:-len(".json")]))
+
+    with ThreadPoolExecutor(max_workers=args.jobs or len(files) or 1) as executor:
+        results = list(executor.map(update, files))
+
+    # Keep the database in step with the files that were written
+    if db is not None:
+        for i, (status, _, written) in zip(files, results):
+            if written is not None:
+                db.store(os.path.join(LANG_DIR, i), written)
+        db.close()
+
+    changed = 0
+    errors = 0
+    for i, (status, messages, _) in zip(files, results):
+        for message in messages:
+            print(message)
+        if status == "modified":
+            changed += 1
+            print("%s: %s" % (i, "would change" if args.check else "writing changes"))
+        elif status == "error":
+            errors += 1
+        else:
+            print("%s: %s" % (i, status))
+
+    if args.check:
+        print("%d of %d files would change" % (changed, len(files)))
+        return 1 if changed or errors else 0
+    return 1 if errors else 0
 
-    open("lang/" + i, "w").write(new_file)
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+# (C) 2025 dualshock-tools
+#
+# Diff-scoped checks for check_translations.py --changed-since / --staged.
+#
+# Instead of extracting every source file, only the files that git reports
+# as changed are extracted, in their old and new versions, and only the
+# strings they add or remove are checked:
+# - An added string is missing if no language file has it
+# - A removed string (or a key added to a language file) is unused if no
+#   source file uses it anymore, and a key removed from the language files
+#   is missing if a source file still uses it
+#
+# The first kind only needs the changed files and the language key sets. The
+# others need the global view, so the full index is refreshed for them, but
+# only when there are such candidates; it is served from the extraction
+# cache, so this stays cheap too.
+#
+# With --staged, the new version of a changed file is the one in the git
+# index, and the old one is in HEAD; the language key sets are read from the
+# index too, so unstaged edits of the language files do not count. With
+# --changed-since REF, the new version is the working tree (untracked files
+# included) and the old one is in REF. The global view is always built from
+# the working tree.
+#
+# translation_index is only imported once git reports changes, so the
+# pre-commit hook costs little more than the git calls when nothing changed.
+
+import subprocess
+from pathlib import Path
+
+
+def _git(root, *args):
+    return subprocess.run(['git', *args], cwd=root, capture_output=True, check=True).stdout
+
+def changed_files(root, since=None, staged=False):
+    """Return the sorted source and language files changed since a revision, or staged."""
+    if staged:
+        output = _git(root, 'diff', '--name-only', '--no-renames', '-z', '--cached')
+    else:
+        output = _git(root, 'diff', '--name-only', '--no-renames', '-z', since, '--')
+        output += _git(root, 'ls-files', '--others', '--exclude-standard', '-z')
+    paths = {Path(name) for name in output.decode('utf-8').split('\0') if name}
+    if not paths:
+        return []
+    from translation_index import file_kind
+    return sorted(path for path in paths if file_kind(path) is not None)
+
+def _read_revision(root, revision, path):
+    """Return the content of path at revision ('' for the git index), or None if absent."""
+    try:
+        return _git(root, 'show', f"{revision}:{path.as_posix()}").decode('utf-8')
+    except subprocess.CalledProcessError:
+        return None
+
+def _read_index_files(root, paths):
+    """Return {path: content} for the paths in the git index, with one git call."""
+    if not paths:
+        return {}
+    request = "".join(f":{path.as_posix()}\n" for path in paths).encode('utf-8')
+    output = subprocess.run(['git', 'cat-file', '--batch'], cwd=root, input=request, capture_output=True,
+                            check=True).stdout
+    contents = {}
+    offset = 0
+    for path in paths:
+        end = output.index(b"\n", offset)
+        header = output[offset:end].split()
+        offset = end + 1
+        if header[-1] == b"missing":
+            continue
+        size = int(header[2])
+        contents[path] = output[offset:offset + size].decode('utf-8')
+        offset += size + 1
+    return contents
+
+def _read_new(root, path, staged):
+    if staged:
+        return _read_revision(root, '', path)
+    try:
+        with open(root / path, 'r', encoding='utf-8') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+def _strings(kind, content):
+    """Return {string: first (line, col)} for the content of a source file."""
+    from translation_index import FILE_PARSERS, should_exclude_string
+    if content is None:
+        return {}
+    strings = {}
+    for occurrences in FILE_PARSERS[kind](content).values():
+        for text, line, col in occurrences:
+            if not should_exclude_string(text):
+                strings.setdefault(text, (line, col))
+    return strings
+
+def _keys(content):
+    from translation_index import FILE_PARSERS, SPECIAL_KEYS
+    if content is None:
+        return set()
+    return set(FILE_PARSERS['entries'](content)['keys']) - SPECIAL_KEYS - {""}
+
+def check_changes(open_index, since=None, staged=False, fail_fast=False, root=Path(".")):
+    """Check the strings added and removed by the changed files.
+
+    open_index() returns a TranslationIndex for root (not refreshed yet); it
+    is only called when it is needed, for the language key sets of the
+    working tree and for the global view. With fail_fast the check stops at
+    the first missing string. Returns (result, index), where index is None
+    when it was not needed and result is a dict with changed_files,
+    missing_translations ([{string, locations}]) and unused_translations.
+    """
+    old_revision = 'HEAD' if staged else since
+    paths = changed_files(root, since, staged)
+    result = {
+        "since": None if staged else since,
+        "staged": staged,
+        "changed_files": [path.as_posix() for path in paths],
+        "missing_translations": [],
+        "unused_translations": [],
+    }
+    if not paths:
+        return result, None
+
+    from translation_index import LANG_DIR, SPECIAL_KEYS, WHITELIST_UNUSED, file_kind, find_lang_files
+    index = None
+
+    # Language key sets: the changed files and, with --staged, every file from git; the others through the database
+    changed_lang = {path for path in paths if file_kind(path) == 'entries'}
+    translation_keys = set()
+    if staged:
+        output = _git(root, 'ls-files', '-z', '--', (LANG_DIR / "*.json").as_posix())
+        lang_files = [Path(name) for name in output.decode('utf-8').split('\0') if name]
+        unchanged = [path for path in lang_files if file_kind(path) == 'entries' and path not in changed_lang]
+        for content in _read_index_files(root, unchanged).values():
+            translation_keys |= _keys(content)
+    else:
+        lang_files = [LANG_DIR / lang_file.name for lang_file in find_lang_files(root)]
+        index = open_index()
+        index.refresh_files([lang_file for lang_file in lang_files if lang_file not in changed_lang])
+        entries = index.language_entries()
+        for lang_file in lang_files:
+            if lang_file not in changed_lang:
+                translation_keys.update(entries.get(lang_file, {'keys': ()})['keys'])
+    translation_keys -= SPECIAL_KEYS | {""}
+
+    added_keys = set()
+    removed_keys = set()
+    for path in sorted(changed_lang):
+        new_keys = _keys(_read_new(root, path, staged))
+        old_keys = _keys(_read_revision(root, old_revision, path))
+        translation_keys |= new_keys
+        added_keys |= new_keys - old_keys
+        removed_keys |= old_keys - new_keys
+
+    # Strings added and removed by the changed source files
+    removed_strings = set()
+    missing = {}
+    for path in paths:
+        kind = file_kind(path)
+        if kind == 'entries':
+            continue
+        new_strings = _strings(kind, _read_new(root, path, staged))
+        old_strings = _strings(kind, _read_revision(root, old_revision, path))
+        removed_strings.update(set(old_strings) - set(new_strings))
+        for string, (line, col) in new_strings.items():
+            if string in old_strings or string in translation_keys:
+                continue
+            missing.setdefault(string, []).append({"file": path.as_posix(), "line": line, "col": col})
+            if fail_fast:
+                result["missing_translations"] = [{"string": string, "locations": missing[string]}]
+                return result, index
+
+    # Candidates that need the global view of the used strings
+    unused_candidates = ((removed_strings & translation_keys) | added_keys) - WHITELIST_UNUSED
+    missing_candidates = removed_keys - translation_keys
+    if unused_candidates or missing_candidates:
+        index = index or open_index()
+        index.refresh()
+        strings, _ = index.strings()
+        used_strings = index.comparison()['used_strings']
+        for string in sorted(missing_candidates & used_strings):
+            missing.setdefault(string, list(strings[string]))
+            if fail_fast:
+                break
+        result["unused_translations"] = sorted(unused_candidates - used_strings)
+
+    result["missing_translations"] = [{"string": string, "locations": missing[string]} for string in sorted(missing)]
+    return result, index
+
+def print_changes(result, compact=False):
+    """Print the report of check_changes(). Returns the exit code."""
+    source = "in the git index" if result["staged"] else f"since {result['since']}"
+    print(f"Checked {len(result['changed_files'])} file(s) changed {source}")
+    print()
+
+    missing = result["missing_translations"]
+    if missing:
+        print(f"⚠️  MISSING TRANSLATIONS ({len(missing)} strings)")
+        print("These strings are used in code but not found in translation files:")
+        print("-" * 80)
+        for entry in missing:
+            print(f"  - \"{entry['string']}\"")
+            if not compact and entry["locations"]:
+                loc = entry["locations"][0]
+                print(f"    → {loc['file']}:{loc['line']}:{loc['col']}")
+        print()
+
+    unused = result["unused_translations"]
+    if unused:
+        print(f"ℹ️  UNUSED TRANSLATIONS ({len(unused)} strings)")
+        print("These strings are in translation files but no longer used in code:")
+        print("-" * 80)
+        for string in unused:
+            print(f"  - \"{string}\"")
+        print()
+
+    if missing or unused:
+        print("⚠️  Translation files need updates!")
+        return 1
+    print("✅ The changes keep the translations in sync!")
+    return 0
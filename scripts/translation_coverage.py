@@ -0,0 +1,195 @@
+# (C) 2025 dualshock-tools
+#
+# Translation coverage for check_translations.py --coverage.
+#
+# The state of every key in every language (absent, empty or filled) is kept
+# in a key-by-language matrix stored as bitsets: for each language, one int
+# whose bit N is set when row N is present and one when it is filled; for
+# each key, one int whose bit N is set when language N has it filled.
+# Completeness, rankings and diffs between two revisions are then computed
+# with a few bitwise operations per language or per key, instead of nested
+# loops over strings and languages.
+
+import subprocess
+from pathlib import Path
+
+from translation_index import LANG_DIR, SPECIAL_KEYS, parse_lang_entries
+
+# Number of strings listed in the "most untranslated" part of the text report
+COVERAGE_TOP_COUNT = 10
+
+
+class CoverageMatrix:
+    """Key-by-language matrix of translation states.
+
+    entries maps language code to a parse_lang_entries() result. keys fixes
+    the rows (and their order); by default they are all the keys of all the
+    languages. Two matrices built with the same keys can be compared with
+    diff().
+    """
+
+    def __init__(self, entries, keys=None):
+        self.languages = sorted(entries)
+        if keys is None:
+            keys = set()
+            for language_entries in entries.values():
+                keys.update(language_entries['keys'])
+            keys = sorted(keys - SPECIAL_KEYS - {""})
+        self.keys = list(keys)
+        self.rows = {key: row for row, key in enumerate(self.keys)}
+
+        self.present = {}  # language -> bitset of rows present in it
+        self.filled = {}  # language -> bitset of rows with a translation
+        self.filled_in = [0] * len(self.keys)  # row -> bitset of languages with a translation
+        for column, language in enumerate(self.languages):
+            untranslated = set(entries[language]['untranslated'])
+            present = [self.rows[key] for key in entries[language]['keys'] if key in self.rows]
+            filled = [row for row in present if self.keys[row] not in untranslated]
+            for row in filled:
+                self.filled_in[row] |= 1 << column
+            self.present[language] = self._bitset(present)
+            self.filled[language] = self._bitset(filled)
+
+    def _bitset(self, rows):
+        # Setting bits in a bytearray keeps this linear; `bits |= 1 << row`
+        # would copy the whole int for every row
+        buffer = bytearray((len(self.keys) + 7) // 8)
+        for row in rows:
+            buffer[row >> 3] |= 1 << (row & 7)
+        return int.from_bytes(buffer, 'little')
+
+    def mask(self, keys):
+        """Return the bitset of the rows of keys (keys without a row are ignored)."""
+        return self._bitset(self.rows[key] for key in keys if key in self.rows)
+
+    def keys_of(self, bits):
+        """Return the keys of the rows set in a bitset, in row order."""
+        # bin() lists the bits from the highest; reversed, character N is row N
+        return [self.keys[row] for row, bit in enumerate(bin(bits)[:1:-1]) if bit == '1']
+
+    def completeness(self, required):
+        """Return per-language counts of the required keys by state.
+
+        required is a bitset (see mask()); percent is the share of them that
+        is filled.
+        """
+        total = required.bit_count()
+        result = {}
+        for language in self.languages:
+            filled = (self.filled[language] & required).bit_count()
+            present = (self.present[language] & required).bit_count()
+            result[language] = {
+                "filled": filled,
+                "empty": present - filled,
+                "absent": total - present,
+                "percent": 100.0 * filled / total if total else 100.0,
+            }
+        return result
+
+    def untranslated_ranking(self, required):
+        """Return the required keys not filled in some language, most untranslated first.
+
+        Each item is (key, list of languages without a translation).
+        """
+        all_languages = (1 << len(self.languages)) - 1
+        ranking = []
+        for key in self.keys_of(required):
+            missing = all_languages & ~self.filled_in[self.rows[key]]
+            if missing:
+                ranking.append((key, [language for column, language in enumerate(self.languages)
+                                      if missing >> column & 1]))
+        ranking.sort(key=lambda item: (-len(item[1]), item[0]))
+        return ranking
+
+    def diff(self, old, required):
+        """Compare with an older matrix built with the same keys.
+
+        Returns per-language lists of required keys that became translated
+        and that stopped being translated since old.
+        """
+        result = {}
+        for language in self.languages:
+            new_filled = self.filled[language] & required
+            old_filled = old.filled.get(language, 0) & required
+            result[language] = {
+                "translated": self.keys_of(new_filled & ~old_filled),
+                "untranslated": self.keys_of(old_filled & ~new_filled),
+            }
+        return result
+
+def load_revision_entries(revision, root=Path(".")):
+    """Return {language: entries} for the language files at a git revision."""
+    listing = subprocess.run(
+        ['git', 'ls-tree', '--name-only', revision, f"{LANG_DIR.as_posix()}/"],
+        cwd=root, capture_output=True, text=True, check=True)
+    entries = {}
+    for name in listing.stdout.splitlines():
+        path = Path(name)
+        if path.suffix != '.json':
+            continue
+        content = subprocess.run(['git', 'show', f"{revision}:{name}"],
+                                 cwd=root, capture_output=True, encoding='utf-8', check=True).stdout
+        entries[path.stem] = parse_lang_entries(content)
+    return entries
+
+def build_coverage(index, since=None):
+    """Compute the coverage of the strings used in code for a TranslationIndex.
+
+    With since (a git revision), the result also has a "diff" against the
+    language files at that revision. Returns a JSON-serializable dict.
+    """
+    entries = {path.stem: value for path, value in index.language_entries().items()}
+    used_strings = index.comparison()['used_strings']
+
+    old_entries = load_revision_entries(since, index.root) if since else {}
+    keys = set(used_strings)
+    for language_entries in list(entries.values()) + list(old_entries.values()):
+        keys.update(language_entries['keys'])
+    keys = sorted(keys - SPECIAL_KEYS - {""})
+
+    matrix = CoverageMatrix(entries, keys)
+    required = matrix.mask(used_strings)
+    coverage = {
+        "total_strings": required.bit_count(),
+        "languages": matrix.completeness(required),
+        "untranslated": [
+            {"string": key, "untranslated_in": len(languages), "languages": languages}
+            for key, languages in matrix.untranslated_ranking(required)
+        ],
+    }
+    if since:
+        coverage["diff"] = {"since": since, "languages": matrix.diff(CoverageMatrix(old_entries, keys), required)}
+    return coverage
+
+def print_coverage(coverage, top=COVERAGE_TOP_COUNT):
+    """Print the COVERAGE section of the text report."""
+    print("=" * 80)
+    print("COVERAGE")
+    print("=" * 80)
+    print(f"Strings used in code: {coverage['total_strings']}")
+    print()
+    print(f"{'Language':<10} {'Translated':>10} {'Empty':>7} {'Absent':>7} {'Complete':>9}")
+    ranked = sorted(coverage["languages"].items(), key=lambda item: (-item[1]["percent"], item[0]))
+    for language, counts in ranked:
+        print(f"{language:<10} {counts['filled']:>10} {counts['empty']:>7} {counts['absent']:>7} "
+              f"{counts['percent']:>8.1f}%")
+    print()
+
+    untranslated = coverage["untranslated"]
+    if untranslated:
+        print(f"Most untranslated strings ({len(untranslated)} strings are untranslated somewhere):")
+        for entry in untranslated[:top]:
+            print(f"  {entry['untranslated_in']:>3} languages  \"{entry['string']}\"")
+        print()
+
+    if "diff" in coverage:
+        print(f"Changes since {coverage['diff']['since']}:")
+        changed = False
+        for language, change in sorted(coverage["diff"]["languages"].items()):
+            if change["translated"] or change["untranslated"]:
+                changed = True
+                print(f"  {language}: +{len(change['translated'])} translated, "
+                      f"-{len(change['untranslated'])} untranslated")
+        if not changed:
+            print("  No coverage changes")
+        print()
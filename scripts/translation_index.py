@@ -0,0 +1,1681 @@
+# (C) 2025 dualshock-tools
+#
+# Library behind scripts/check_translations.py. It extracts the translation
+# strings used by the source files and compares them with the language files:
+# - HTML files: elements with ds-i18n class
+# - JavaScript files: l() function calls
+# - JavaScript files: HTML embedded in strings with ds-i18n class
+#
+# Commented-out code is ignored: HTML comments (<!-- ... -->) and JavaScript
+# single-line (// ...) and multi-line (/* ... */) comments. JavaScript is
+# tokenized in a single pass (strings, template literals, regular expressions
+# and comments), so only real l() calls and string contents count.
+#
+# It can be imported by long-lived tools (build scripts, test runners, editor
+# integrations) that want to keep the results warm between checks:
+#
+#   from translation_index import TranslationIndex
+#
+#   index = TranslationIndex(".")
+#   index.refresh()                    # Extract everything (uses the cache)
+#   index.missing()                    # Strings used in code but not translated
+#   index.unused()                     # Keys no longer used in code
+#   index.missing_in_language("de_de")
+#   index.refresh_file("js/core.js")   # After a file changed
+#   index.db.languages_lacking("Connect")  # Languages without a translation of a key
+#   index.close()                      # Save the cache
+#
+# Run it from the root directory of the project, or pass the root to
+# TranslationIndex. The scripts directory must be on sys.path to import it.
+
+import os
+import re
+import json
+import sys
+import time
+import struct
+import sqlite3
+import codecs
+import hashlib
+import tracemalloc
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter, namedtuple
+from collections.abc import Mapping
+from html.parser import HTMLParser
+from contextlib import contextmanager
+from pathlib import Path
+
+# Directories to scan, relative to the root of the project
+ROOT_DIR = Path(".")
+LANG_DIR = Path("lang")
+JS_DIR = Path("js")
+TEMPLATES_DIR = Path("templates")
+CACHE_FILE_NAME = ".check_translations_cache.json"
+CACHE_FILE = ROOT_DIR / CACHE_FILE_NAME
+DB_FILE_NAME = ".translations.sqlite"
+
+# Bump when the layout of the cache file changes. The cache is also invalidated
+# whenever this module is modified, since extraction rules live here.
+CACHE_VERSION = 1
+
+# Bump when the tables of the translation database change
+DB_VERSION = 1
+
+DB_SCHEMA = """
+CREATE TABLE files (
+    path TEXT PRIMARY KEY,
+    language TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER,
+    sha256 TEXT NOT NULL
+);
+CREATE TABLE entries (
+    language TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT,
+    is_empty INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (language, key)
+) WITHOUT ROWID;
+CREATE INDEX entries_by_key ON entries (key, language);
+"""
+
+# Files modified this recently are re-hashed on the next run instead of being
+# trusted by size and mtime alone (the mtime may not have ticked yet).
+CACHE_RACY_WINDOW_NS = 2 * 10**9
+
+# HTML files are read and parsed in pieces of this many bytes, so large
+# generated pages are never held in memory whole
+HTML_CHUNK_SIZE = 64 * 1024
+
+# Number of slowest files listed by --timings
+SLOWEST_FILES_COUNT = 5
+
+# With automatic --jobs, one worker process is started per this many files
+# that actually need parsing (cache misses)
+PARALLEL_MIN_FILES_PER_JOB = 32
+
+# Binary occurrence files (OccurrenceStore.save): magic, format version and
+# the header with the number of files, strings and occurrences
+OCCURRENCES_MAGIC = b'DSTO'
+OCCURRENCES_VERSION = 1
+OCCURRENCES_HEADER = struct.Struct('<4sIIII')
+
+# Extractors in the order their results are merged
+EXTRACTORS = ('ds_i18n', 'l_function', 'html_in_js')
+
+# HTML elements that never have content or a closing tag
+HTML_VOID_ELEMENTS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link',
+    'meta', 'source', 'track', 'wbr',
+}
+
+# Elements with ds-i18n class in HTML within JavaScript strings (any quote)
+HTML_IN_JS_PATTERN = re.compile(r'<(\w+)[^>]*class=["\'`][^"\'`]*ds-i18n[^"\'`]*["\'`][^>]*>(.*?)</\1>', re.DOTALL)
+
+# JavaScript tokens. Every alternative is unambiguous, so matching is linear;
+# template literals and regular expressions depend on context and are
+# handled by tokenize_js()
+JS_TOKEN_PATTERN = re.compile(r"""
+    (?P<space>\s+)
+  | (?P<comment>//[^\n]*|/\*.*?(?:\*/|\Z))
+  | (?P<name>[A-Za-z_$\u0080-\uffff][\w$\u0080-\uffff]*)
+  | (?P<number>\.?\d[\w.]*)
+  | (?P<string>"(?:[^"\\\n]|\\.)*"|'(?:[^'\\\n]|\\.)*')
+  | (?P<punct>.)
+""", re.VERBOSE | re.DOTALL)
+JS_TEMPLATE_CHUNK_PATTERN = re.compile(r'(?:[^`\\$]|\\.|\$(?!\{))*', re.DOTALL)
+JS_REGEX_LITERAL_PATTERN = re.compile(r'/(?:[^/\\\[\n]|\\.|\[(?:[^\]\\\n]|\\.)*\])+/[A-Za-z]*')
+
+# Keywords after which a '/' starts a regular expression rather than a division
+JS_KEYWORDS_BEFORE_REGEX = {
+    'return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete', 'void',
+    'throw', 'case', 'do', 'else', 'yield', 'await',
+}
+
+JS_ESCAPE_PATTERN = re.compile(r'\\(u\{[0-9a-fA-F]+\}|u[0-9a-fA-F]{4}|x[0-9a-fA-F]{2}|\r\n|.)', re.DOTALL)
+JS_SIMPLE_ESCAPES = {
+    'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f', 'v': '\v', '0': '\0',
+    # Line continuations
+    '\n': '', '\r\n': '', '\r': '', '\u2028': '', '\u2029': '',
+}
+
+# Special keys that are not in source code
+SPECIAL_KEYS = {".authorMsg", ".title"}
+
+# Patterns to exclude from translation checks (CSS selectors, technical strings, etc.)
+EXCLUDE_PATTERNS = [
+    r'^\.[\w-]+$',  # CSS class selectors like .alert, .hide
+    r'^#[\w-]+$',  # CSS ID selectors
+    r'^[\w-]+\.[\w-]+$',  # CSS compound selectors like circle.ds-touch
+    r'^path,rect,circle',  # SVG element lists
+    r'^\\x[0-9a-fA-F]+$',  # Hex escape sequences
+]
+
+# Whitelist of strings that are in language files but should be ignored by unused check
+# These strings may be used dynamically, in comments, or reserved for future use
+WHITELIST_UNUSED = {
+    "(beta)",
+    "30th Anniversary",
+    "Astro Bot",
+    "Chroma Indigo",
+    "Chroma Pearl",
+    "Chroma Teal",
+    "Cobalt Blue",
+    "Cosmic Red",
+    "Fortnite",
+    "Galactic Purple",
+    "God of War Ragnarok",
+    "Grey Camouflage",
+    "Midnight Black",
+    "Nova Pink",
+    "Spider-Man 2",
+    "Starlight Blue",
+    "Sterling Silver",
+    "The Last of Us",
+    "Volcanic Red",
+    "White",
+    "God of War 20th Anniversary",
+    "Icon Blue Limited Edition",
+    "Ghost of Yōtei Limited Edition",
+    "Marathon Limited Edition",
+    "Genshin Impact Limited Edition",
+    "007 First Light Limited Edition",
+
+    "Sony DualSense",
+    "Sony DualSense Edge",
+    "Sony DualShock 4 V1",
+    "Sony DualShock 4 V2",
+
+    "Calibration in progress",
+    "Continue",
+    "Start",
+    "Initializing...",
+    "Sampling...",
+    "left module",
+    "right module",
+    "Your device might not be a genuine Sony controller. If it is not a clone then please report this issue.",
+
+    "Adaptive Trigger",
+    "Buttons",
+    "Haptic Vibration",
+    "Headphone Jack",
+    "Lights",
+    "Microphone",
+    "Speaker",
+    "USB Connector",
+}
+
+
+class ExtractionCache:
+    """On-disk cache of per-file extraction results.
+
+    Entries are keyed by file path and validated by size and mtime first; when
+    those differ the file is re-hashed, and only a content change causes the
+    file to be parsed again.
+    """
+
+    def __init__(self, path, enabled=True):
+        self.path = Path(path)
+        self.enabled = enabled
+        self.entries = {}
+        self.seen = set()
+        self.hits = 0
+        self.misses = 0
+        self.parse_times = {}  # seconds spent parsing each file missing from the cache
+        self.dirty = False
+        self.signature = self._signature()
+        if enabled:
+            self._load()
+
+    @staticmethod
+    def _signature():
+        """Identify the extraction rules the cached results were built with."""
+        digest = hashlib.sha256(str(CACHE_VERSION).encode())
+        try:
+            with open(__file__, 'rb') as f:
+                digest.update(f.read())
+        except OSError:
+            pass
+        return digest.hexdigest()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if isinstance(data, dict) and data.get('signature') == self.signature:
+            self.entries = data.get('files', {})
+
+    def lookup(self, file_path, kind):
+        """Look up the cached result of extractor kind for a file.
+
+        Returns (True, result) on a hit, or (False, raw bytes) on a miss, in
+        which case the caller computes the result and passes it to store().
+        kind names the extractor, so several extractors can share one entry.
+        The kinds in CHUNKED_PARSERS are hashed in chunks and return
+        (False, None) on a miss: the file is parsed from disk the same way.
+        """
+        chunked = kind in CHUNKED_PARSERS
+        if not self.enabled:
+            if chunked:
+                return False, None
+            with open(file_path, 'rb') as f:
+                return False, f.read()
+
+        key = str(file_path)
+        self.seen.add(key)
+        st = os.stat(file_path)
+        entry = self.entries.get(key)
+        if (entry is not None and entry['size'] == st.st_size
+                and entry['mtime_ns'] == st.st_mtime_ns and kind in entry['results']):
+            self.hits += 1
+            return True, entry['results'][kind]
+
+        if chunked:
+            raw = None
+            digest, size = _file_digest(file_path)
+        else:
+            with open(file_path, 'rb') as f:
+                raw = f.read()
+            digest, size = hashlib.sha256(raw).hexdigest(), len(raw)
+        if entry is not None and entry['sha256'] == digest:
+            # Touched but unchanged: refresh the stat info and keep the results
+            entry['size'] = size
+            entry['mtime_ns'] = st.st_mtime_ns
+            self.dirty = True
+            if kind in entry['results']:
+                self.hits += 1
+                return True, entry['results'][kind]
+        else:
+            self.entries[key] = {'size': size, 'mtime_ns': st.st_mtime_ns, 'sha256': digest, 'results': {}}
+
+        self.misses += 1
+        return False, raw
+
+    def store(self, file_path, kind, result):
+        """Record the result of extractor kind for a file after a miss."""
+        if not self.enabled:
+            return
+        self.entries[str(file_path)]['results'][kind] = result
+        self.dirty = True
+
+    def get(self, file_path, kind, compute):
+        """Return the cached result of compute(content) for this file."""
+        hit, payload = self.lookup(file_path, kind)
+        if hit:
+            return payload
+        if payload is None:
+            result = CHUNKED_PARSERS[kind](read_text_chunks(file_path))
+        else:
+            result = compute(payload.decode('utf-8'))
+        self.store(file_path, kind, result)
+        return result
+
+    def get_many(self, tasks, pool=None):
+        """Resolve many (file_path, kind, compute) tasks at once.
+
+        Cache misses are computed through pool (serially when it is None).
+        Returns a list of (result, error) pairs in the order of tasks, where
+        error is a message for files that could not be read or parsed.
+        """
+        outcomes = [None] * len(tasks)
+        pending = []
+        for index, (file_path, kind, compute) in enumerate(tasks):
+            try:
+                hit, payload = self.lookup(file_path, kind)
+            except Exception as e:
+                outcomes[index] = (None, str(e))
+                continue
+            if hit:
+                outcomes[index] = (payload, None)
+            elif payload is None:
+                pending.append((index, (CHUNKED_PARSERS[kind], None, str(file_path))))
+            else:
+                pending.append((index, (compute, payload, None)))
+
+        computed = (pool or WorkerPool(1)).map(_compute_task, [task for _, task in pending])
+        for (index, _), (result, error, seconds) in zip(pending, computed):
+            file_path, kind, _ = tasks[index]
+            self.parse_times[str(file_path)] = seconds
+            if error is None:
+                self.store(file_path, kind, result)
+            outcomes[index] = (result, error)
+
+        return outcomes
+
+    def save(self):
+        """Write the cache back to disk, dropping files that no longer exist."""
+        if not self.enabled:
+            return
+        stale = set(self.entries) - self.seen
+        if not self.dirty and not stale:
+            return
+        for key in stale:
+            del self.entries[key]
+
+        now = time.time_ns()
+        for entry in self.entries.values():
+            if entry['mtime_ns'] is not None and now - entry['mtime_ns'] < CACHE_RACY_WINDOW_NS:
+                entry['mtime_ns'] = None
+
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'signature': self.signature, 'files': self.entries}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Warning: cannot write cache {self.path}: {e}", file=sys.stderr)
+        self.dirty = False
+
+
+class TranslationDatabase:
+    """SQLite index of the entries of the language files.
+
+    Every entry is a (language, key, value, is_empty) row, and every file is
+    recorded with its size, mtime and SHA-256, so refresh() only re-reads the
+    files whose content changed (validated like the extraction cache). Tools
+    query it instead of parsing the JSON files, and process_lang.py stores
+    the files it writes, so the files and the database change together.
+    With enabled=False the database lives in memory and is rebuilt by every
+    process.
+    """
+
+    def __init__(self, root=ROOT_DIR, enabled=True):
+        self.root = Path(root)
+        self.path = self.root / DB_FILE_NAME if enabled else None
+        self.connection = self._connect()
+
+    def _connect(self):
+        if self.path is not None:
+            try:
+                return self._setup(sqlite3.connect(self.path, timeout=10))
+            except sqlite3.OperationalError as e:
+                print(f"Warning: cannot use translation database {self.path}: {e}", file=sys.stderr)
+            except sqlite3.DatabaseError:
+                # Not a database (or a corrupt one): it only holds derived data, start over
+                os.remove(self.path)
+                return self._setup(sqlite3.connect(self.path, timeout=10))
+        return self._setup(sqlite3.connect(':memory:'))
+
+    @staticmethod
+    def _setup(connection):
+        version = connection.execute('PRAGMA user_version').fetchone()[0]
+        if version != DB_VERSION:
+            connection.executescript(f"""
+                BEGIN;
+                DROP TABLE IF EXISTS entries;
+                DROP TABLE IF EXISTS files;
+                {DB_SCHEMA}
+                PRAGMA user_version = {DB_VERSION};
+                COMMIT;
+            """)
+        return connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def refresh(self, paths=None):
+        """Bring the database up to date with the language files.
+
+        paths are relative to root; by default every language file is checked
+        and the languages whose file is gone are dropped. Returns (changed,
+        errors): the paths that were read again, and (path, message) for the
+        files that could not be read or parsed, which are dropped as well.
+        """
+        prune = paths is None
+        if prune:
+            paths = [Path(os.path.relpath(path, self.root)) for path in find_lang_files(self.root)]
+        known = {row[0]: row[1:] for row in self.connection.execute('SELECT path, size, mtime_ns, sha256 FROM files')}
+        changed = []
+        errors = []
+        with self.connection:
+            for path in paths:
+                path = Path(path)
+                entry = known.get(path.as_posix())
+                try:
+                    st = os.stat(self.root / path)
+                    if entry is not None and entry[:2] == (st.st_size, st.st_mtime_ns):
+                        continue
+                    with open(self.root / path, 'rb') as f:
+                        raw = f.read()
+                    digest = hashlib.sha256(raw).hexdigest()
+                    if entry is not None and entry[2] == digest:
+                        # Touched but unchanged: only refresh the stat info
+                        self.connection.execute('UPDATE files SET size = ?, mtime_ns = ? WHERE path = ?',
+                                                (len(raw), self._stable_mtime(st), path.as_posix()))
+                        continue
+                    self._store(path, raw, st, digest)
+                    changed.append(path)
+                except (OSError, ValueError) as e:
+                    errors.append((path, str(e)))
+                    self._forget(path)
+            if prune:
+                for name in set(known) - {Path(path).as_posix() for path in paths}:
+                    self._forget(Path(name))
+        return changed, errors
+
+    def store(self, path, raw):
+        """Record the content of a language file that was just written (path relative to root)."""
+        path = Path(path)
+        with self.connection:
+            self._store(path, raw, os.stat(self.root / path), hashlib.sha256(raw).hexdigest())
+
+    def forget(self, path):
+        """Drop a language file from the database."""
+        with self.connection:
+            self._forget(Path(path))
+
+    @staticmethod
+    def _stable_mtime(st):
+        # A file modified this recently may change again within the same mtime tick
+        return st.st_mtime_ns if time.time_ns() - st.st_mtime_ns >= CACHE_RACY_WINDOW_NS else None
+
+    def _store(self, path, raw, st, digest):
+        translations = json.loads(raw.decode('utf-8'))
+        if not isinstance(translations, dict):
+            raise ValueError("expected a JSON object")
+        language = path.stem
+        self.connection.execute('DELETE FROM entries WHERE language = ?', (language,))
+        self.connection.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)',
+                                (path.as_posix(), language, len(raw), self._stable_mtime(st), digest))
+        self.connection.executemany('INSERT INTO entries VALUES (?, ?, ?, ?, ?)', (
+            (language, key, value if isinstance(value, str) else None,
+             not isinstance(value, str) or not value.strip(), position)
+            for position, (key, value) in enumerate(translations.items())))
+
+    def _forget(self, path):
+        self.connection.execute('DELETE FROM entries WHERE language = ?', (path.stem,))
+        self.connection.execute('DELETE FROM files WHERE path = ?', (path.as_posix(),))
+
+    def languages(self):
+        """Return the sorted language codes in the database."""
+        return [language for language, in self.connection.execute('SELECT language FROM files ORDER BY language')]
+
+    def entries(self, language):
+        """Return the keys of a language and the untranslated ones, like parse_lang_entries()."""
+        rows = self.connection.execute('SELECT key, is_empty FROM entries WHERE language = ? ORDER BY position',
+                                       (language,)).fetchall()
+        return {
+            'keys': [key for key, _ in rows],
+            'untranslated': [key for key, is_empty in rows if is_empty],
+        }
+
+    def keys_by_language(self):
+        """Return a dict mapping each language code to the set of its keys."""
+        keys = {language: set() for language in self.languages()}
+        for language, key in self.connection.execute('SELECT language, key FROM entries'):
+            keys[language].add(key)
+        return keys
+
+    def translations(self):
+        """Return {language: {key: translation}} for the translated (non-empty) entries."""
+        translations = {language: {} for language in self.languages()}
+        for language, key, value in self.connection.execute(
+                'SELECT language, key, value FROM entries WHERE NOT is_empty ORDER BY language, position'):
+            translations[language][key] = value
+        return translations
+
+    def keys_missing_in(self, language):
+        """Return the keys of the other languages that language does not translate.
+
+        Returns a dict with the sorted 'absent' keys (not in its file) and
+        'untranslated' keys (empty in its file). Special keys are left out.
+        """
+        absent = self.connection.execute(
+            'SELECT DISTINCT key FROM entries WHERE key NOT IN (SELECT key FROM entries WHERE language = ?) '
+            'ORDER BY key', (language,))
+        untranslated = self.connection.execute(
+            'SELECT key FROM entries WHERE language = ? AND is_empty ORDER BY key', (language,))
+        return {
+            'absent': [key for key, in absent if key not in SPECIAL_KEYS and key != ""],
+            'untranslated': [key for key, in untranslated if key not in SPECIAL_KEYS and key != ""],
+        }
+
+    def languages_lacking(self, key):
+        """Return the languages that do not translate key.
+
+        Returns a dict with the sorted 'absent' languages (key not in their
+        file) and 'untranslated' languages (key empty in their file).
+        """
+        absent = self.connection.execute(
+            'SELECT language FROM files WHERE language NOT IN (SELECT language FROM entries WHERE key = ?) '
+            'ORDER BY language', (key,))
+        untranslated = self.connection.execute(
+            'SELECT language FROM entries WHERE key = ? AND is_empty ORDER BY language', (key,))
+        return {
+            'absent': [language for language, in absent],
+            'untranslated': [language for language, in untranslated],
+        }
+
+
+def _compute_task(task):
+    """Run an extractor on raw file bytes, or on a file read in chunks (pool worker).
+
+    task is (compute, raw, None), or (chunked compute, None, path).
+    Returns (result, error, seconds spent).
+    """
+    compute, raw, path = task
+    started = time.perf_counter()
+    try:
+        content = raw.decode('utf-8') if path is None else read_text_chunks(path)
+        return compute(content), None, time.perf_counter() - started
+    except Exception as e:
+        return None, str(e), time.perf_counter() - started
+
+def read_text_chunks(path, size=HTML_CHUNK_SIZE):
+    """Yield the UTF-8 content of a file as text chunks of at most size bytes."""
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(size)
+            if not data:
+                break
+            yield decoder.decode(data)
+    yield decoder.decode(b'', final=True)
+
+def _file_digest(path, size=HTML_CHUNK_SIZE):
+    """Return the SHA-256 hex digest and the size of a file, read in chunks."""
+    digest = hashlib.sha256()
+    total = 0
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(size)
+            if not data:
+                break
+            digest.update(data)
+            total += len(data)
+    return digest.hexdigest(), total
+
+class WorkerPool:
+    """Lazily started process pool for per-file extraction work.
+
+    jobs is the maximum number of worker processes, or None to pick one from
+    the CPU count and the amount of work. Small batches run in-process, since
+    starting workers costs more than parsing a handful of files. map()
+    always returns results in input order, so output does not depend on jobs.
+    """
+
+    def __init__(self, jobs=None):
+        self.jobs = jobs
+        self.executor = None
+
+    def _workers_for(self, count):
+        if self.jobs is not None:
+            return min(self.jobs, count)
+        return min(os.cpu_count() or 1, count // PARALLEL_MIN_FILES_PER_JOB)
+
+    def map(self, func, items):
+        workers = self._workers_for(len(items))
+        if workers <= 1:
+            return [func(item) for item in items]
+        if self.executor is None:
+            # Imported here: it is the slowest import, and most runs read everything from the cache
+            from concurrent.futures import ProcessPoolExecutor
+            self.executor = ProcessPoolExecutor(max_workers=workers)
+        chunksize = max(1, len(items) // (workers * 4))
+        return list(self.executor.map(func, items, chunksize=chunksize))
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+class PhaseTimer:
+    """Record the wall time and peak memory of the phases of a check.
+
+    By default the peak memory of a phase is the high-water mark of the
+    process (max RSS) when the phase ends, which costs nothing to measure.
+    With trace_memory, it is the peak of Python allocations made during the
+    phase, measured with tracemalloc; this is exact but makes every phase
+    noticeably slower. Worker processes started for --jobs are not included
+    in either. When disabled, phase() is a no-op, so callers can time
+    unconditionally.
+    """
+
+    def __init__(self, enabled=True, trace_memory=False):
+        self.enabled = enabled
+        self.trace_memory = enabled and trace_memory
+        self.phases = []  # (name, seconds, peak memory in bytes or None)
+        self.started = time.perf_counter()
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def phase(self, name):
+        if not self.enabled:
+            yield
+            return
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            if self.trace_memory:
+                peak = max(tracemalloc.get_traced_memory()[1] - before, 0)
+            else:
+                peak = _max_rss_bytes()
+            self.phases.append((name, seconds, peak))
+
+    def result(self, cache=None, slowest=SLOWEST_FILES_COUNT):
+        """Return the timings as a dict, with the slowest files parsed by cache."""
+        slowest_files = []
+        if cache is not None:
+            ranked = sorted(cache.parse_times.items(), key=lambda item: item[1], reverse=True)
+            slowest_files = [{"file": path, "seconds": seconds} for path, seconds in ranked[:slowest]]
+        return {
+            "total_seconds": time.perf_counter() - self.started,
+            "memory_source": "tracemalloc" if self.trace_memory else "max_rss",
+            "phases": [
+                {"name": name, "seconds": seconds, "peak_memory_bytes": peak}
+                for name, seconds, peak in self.phases
+            ],
+            "slowest_files": slowest_files,
+        }
+
+def _max_rss_bytes():
+    """Return the peak resident memory of this process, or None if unknown."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS reports bytes
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+def should_exclude_string(text):
+    """Check if a string should be excluded from translation checks."""
+    for pattern in EXCLUDE_PATTERNS:
+        if re.match(pattern, text):
+            return True
+    return False
+
+def find_html_files(root=ROOT_DIR):
+    """Find all HTML files in the project."""
+    root = Path(root)
+    html_files = []
+    # Root HTML files
+    html_files.extend(root.glob("*.html"))
+    # Template HTML files
+    html_files.extend((root / TEMPLATES_DIR).glob("*.html"))
+    return html_files
+
+def find_js_files(root=ROOT_DIR):
+    """Find all JavaScript files in the js directory."""
+    js_files = []
+    js_files.extend((Path(root) / JS_DIR).glob("**/*.js"))
+    return js_files
+
+def find_lang_files(root=ROOT_DIR):
+    """Find all language files in the lang directory."""
+    return list((Path(root) / LANG_DIR).glob("*.json"))
+
+class LineIndex:
+    """Map character offsets in a text to 1-based (line, column) pairs.
+
+    The newline offsets are collected once, so each lookup is a binary search
+    instead of a rescan of the text before the match.
+    """
+
+    def __init__(self, content):
+        self.line_starts = [0]
+        self.line_starts.extend(m.end() for m in re.finditer('\n', content))
+
+    def position(self, offset):
+        """Return (line, col) of offset, matching the editor's file:line:col."""
+        index = bisect_right(self.line_starts, offset) - 1
+        return index + 1, offset - self.line_starts[index] + 1
+
+def _is_complex_html(text):
+    """Check if text contains HTML tags other than simple formatting tags."""
+    # Allow simple formatting tags like <b>, <i>, <em>, <strong>, <span>
+    if '<' in text and '>' in text:
+        # Remove simple formatting tags temporarily to check for other HTML
+        text_without_simple_tags = re.sub(r'</?(?:b|i|em|strong|span)>', '', text)
+        if '<' in text_without_simple_tags:
+            # Contains other HTML elements (complex content)
+            return True
+    return False
+
+JsToken = namedtuple('JsToken', 'kind start end text depth')
+JsToken.__doc__ = """A JavaScript token; depth counts the template literals around it."""
+
+def tokenize_js(content):
+    """Split JavaScript source into tokens in a single linear pass.
+
+    Yields JsToken tuples of kind 'name', 'number', 'string', 'template',
+    'regex' or 'punct'; whitespace and comments are skipped. Template literals
+    are yielded whole (backticks included) once they end, after the tokens of
+    their ${...} expressions. Offsets always refer to content itself.
+    """
+    pos = 0
+    length = len(content)
+    templates = []  # [start, brace depth] of each template literal we are inside
+    in_template = False
+    previous = None
+
+    while pos < length:
+        if in_template:
+            pos = JS_TEMPLATE_CHUNK_PATTERN.match(content, pos).end()
+            if content.startswith('${', pos):
+                # Expression inside the template: back to code until the matching '}'
+                templates[-1][1] = 0
+                in_template = False
+                previous = JsToken('punct', pos, pos + 2, '${', len(templates))
+                pos += 2
+                continue
+            start = templates.pop()[0]
+            pos = min(pos + 1, length)
+            in_template = False
+            previous = JsToken('template', start, pos, content[start:pos], len(templates))
+            yield previous
+            continue
+
+        match = JS_TOKEN_PATTERN.match(content, pos)
+        kind = match.lastgroup
+        if kind == 'space' or kind == 'comment':
+            pos = match.end()
+            continue
+
+        text = match.group()
+        if kind == 'punct':
+            if text == '`':
+                templates.append([pos, 0])
+                in_template = True
+                pos += 1
+                continue
+            if text == '/' and _js_regex_allowed(previous):
+                regex_match = JS_REGEX_LITERAL_PATTERN.match(content, pos)
+                if regex_match:
+                    kind = 'regex'
+                    text = regex_match.group()
+            elif templates and text == '{':
+                templates[-1][1] += 1
+            elif templates and text == '}':
+                if templates[-1][1] == 0:
+                    # End of a ${...} expression: back inside the template
+                    in_template = True
+                    pos += 1
+                    continue
+                templates[-1][1] -= 1
+
+        previous = JsToken(kind, pos, pos + len(text), text, len(templates))
+        pos = previous.end
+        yield previous
+
+def _js_regex_allowed(previous):
+    """Check if a '/' after the previous token starts a regular expression."""
+    if previous is None:
+        return True
+    if previous.kind == 'name':
+        return previous.text in JS_KEYWORDS_BEFORE_REGEX
+    if previous.kind == 'punct':
+        return previous.text not in (')', ']')
+    return False
+
+def _js_unescape_match(match):
+    escape = match.group(1)
+    if len(escape) > 1 and escape[0] == 'u':
+        return chr(int(escape[2:-1] if escape[1] == '{' else escape[1:], 16))
+    if len(escape) == 3 and escape[0] == 'x':
+        return chr(int(escape[1:], 16))
+    return JS_SIMPLE_ESCAPES.get(escape, escape)
+
+def js_unescape(text):
+    """Resolve JavaScript escape sequences the way the browser does."""
+    if '\\' not in text:
+        return text
+    return JS_ESCAPE_PATTERN.sub(_js_unescape_match, text)
+
+def _match_l_call(tokens):
+    """Match an l() / this.l() call with a constant argument ending the token list.
+
+    Returns (offset, text) with the offset of the call ('this' included), or
+    None if the last tokens are not such a call.
+    """
+    if len(tokens) < 4:
+        return None
+    name, open_paren, argument, close_paren = tokens[-4:]
+    if not (name.text == 'l' and name.kind == 'name' and open_paren.text == '('
+            and argument.kind in ('string', 'template') and close_paren.text == ')'):
+        return None
+    if argument.kind == 'template' and '${' in argument.text:
+        # Not a constant string
+        return None
+
+    start = name.start
+    if len(tokens) >= 6 and tokens[-5].text == '.' and tokens[-6].text == 'this':
+        start = tokens[-6].start
+    return start, js_unescape(argument.text[1:-1])
+
+def iter_js_translatables(content):
+    """Yield (extractor, offset, text) for each translatable string in JavaScript.
+
+    extractor is 'l_function' for l() / this.l() calls with a constant
+    argument, and 'html_in_js' for ds-i18n elements inside string and template
+    literals. Inside a template, an element whose content is made of ${l(...)}
+    calls yields the arguments of those calls. Offsets point at the call or
+    at the element's opening tag.
+    """
+    recent = []  # last significant tokens, for call detection
+    call_offsets = []  # arguments offsets of the l() calls seen so far
+    call_texts = []
+
+    for token in tokenize_js(content):
+        recent.append(token)
+        if len(recent) > 6:
+            del recent[0]
+
+        if token.kind == 'punct':
+            if token.text == ')':
+                call = _match_l_call(recent)
+                if call and call[1]:
+                    call_offsets.append(recent[-2].start)
+                    call_texts.append(call[1])
+                    yield 'l_function', call[0], call[1]
+            continue
+
+        if token.kind not in ('string', 'template') or token.depth or 'ds-i18n' not in token.text:
+            continue
+
+        for match in HTML_IN_JS_PATTERN.finditer(content, token.start + 1, token.end - 1):
+            text = match.group(2)
+
+            # Skip if contains complex nested HTML tags, otherwise keep the
+            # original text with simple formatting tags
+            if not text or _is_complex_html(text):
+                continue
+
+            if token.kind == 'template' and '${' in text:
+                # Extract the template literal function calls like ${l('string')}
+                first = bisect_left(call_offsets, match.start(2))
+                last = bisect_left(call_offsets, match.end(2))
+                for extracted_string in call_texts[first:last]:
+                    yield 'html_in_js', match.start(), extracted_string
+            else:
+                yield 'html_in_js', match.start(), js_unescape(text)
+
+def _little_endian(column):
+    """Return an array column in little-endian byte order (the file format's)."""
+    if sys.byteorder == 'big':
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column
+
+class OccurrenceStore(Mapping):
+    """Read-only mapping from each extracted string to its {file, line, col} locations.
+
+    The occurrences are not stored as dicts but in parallel integer columns
+    (string ID, file ID, line, column), with the file names interned once in
+    files. The location dicts are only built when a string is looked up
+    (e.g. for the JSON report), and the rows of each string are grouped on
+    the first lookup, so building a store and computing set operations on its
+    strings stay cheap. Stores are built with OccurrenceBuilder, and can be
+    saved to and loaded from a binary file.
+    """
+
+    def __init__(self, files, string_ids, strings, file_ids, lines, cols, grouping=None):
+        self.files = files  # file ID -> file name
+        self.string_ids = string_ids  # string -> string ID
+        self.strings = strings  # string ID of each occurrence
+        self.file_ids = file_ids
+        self.lines = lines
+        self.cols = cols
+        # [occurrence rows grouped by string ID, start of each group] once
+        # computed, shared with the stores made by select()
+        self._grouping = grouping if grouping is not None else []
+
+    def __getitem__(self, text):
+        return [{'file': file_name, 'line': line, 'col': col} for file_name, line, col in self.positions(text)]
+
+    def __contains__(self, text):
+        return text in self.string_ids
+
+    def __iter__(self):
+        return iter(self.string_ids)
+
+    def __len__(self):
+        return len(self.string_ids)
+
+    def _group(self):
+        """Return the occurrence rows grouped by string ID, and where each group starts."""
+        if not self._grouping:
+            # Stable sort by string ID (done by C code), so each string keeps the order of its occurrences
+            strings = self.strings
+            order = array('I', sorted(range(len(strings)), key=strings.__getitem__))
+            counts = Counter(strings)
+            starts = array('I', [0])
+            for string_id in range(max(counts, default=-1) + 1):
+                starts.append(starts[-1] + counts[string_id])
+            self._grouping[:] = order, starts
+        return self._grouping
+
+    def rows(self, text):
+        """Return the occurrence rows of a string, in the order they were added."""
+        string_id = self.string_ids[text]
+        order, starts = self._group()
+        return order[starts[string_id]:starts[string_id + 1]]
+
+    def positions(self, text):
+        """Return the (file, line, col) tuples of a string, without building dicts."""
+        rows = self.rows(text)
+        files, file_ids, lines, cols = self.files, self.file_ids, self.lines, self.cols
+        return [(files[file_ids[row]], lines[row], cols[row]) for row in rows]
+
+    def count(self, text):
+        """Return the number of occurrences of a string."""
+        return len(self.rows(text))
+
+    def select(self, texts):
+        """Return a store restricted to texts, sharing the columns of this one."""
+        string_ids = self.string_ids
+        return OccurrenceStore(self.files, {text: string_ids[text] for text in texts if text in string_ids},
+                               self.strings, self.file_ids, self.lines, self.cols, self._grouping)
+
+    def save(self, path):
+        """Write the store to a binary file.
+
+        The file has a header (see OCCURRENCES_HEADER), the byte lengths and
+        UTF-8 bytes of the file names and of the strings, the number of
+        occurrences of each string, then the file ID, line and column of the
+        occurrences, grouped by string, as little-endian 32-bit integers.
+        """
+        rows = [self.rows(text) for text in self.string_ids]
+        order = array('I')
+        for string_rows in rows:
+            order.extend(string_rows)
+        files = [name.encode('utf-8') for name in self.files]
+        strings = [text.encode('utf-8') for text in self.string_ids]
+
+        tmp_path = Path(path).with_name(Path(path).name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(OCCURRENCES_HEADER.pack(OCCURRENCES_MAGIC, OCCURRENCES_VERSION,
+                                            len(files), len(strings), len(order)))
+            for blobs in (files, strings):
+                f.write(_little_endian(array('I', map(len, blobs))).tobytes())
+                f.write(b''.join(blobs))
+            f.write(_little_endian(array('I', map(len, rows))).tobytes())
+            for column in (self.file_ids, self.lines, self.cols):
+                f.write(_little_endian(array('I', map(column.__getitem__, order))).tobytes())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Read a store written by save(). Raises ValueError if the file is not one."""
+        with open(path, 'rb') as f:
+            data = memoryview(f.read())
+        try:
+            magic, version, file_count, string_count, count = OCCURRENCES_HEADER.unpack_from(data)
+        except struct.error:
+            raise ValueError(f"{path} is not an occurrence file")
+        if magic != OCCURRENCES_MAGIC:
+            raise ValueError(f"{path} is not an occurrence file")
+        if version != OCCURRENCES_VERSION:
+            raise ValueError(f"{path} has unsupported occurrence file version {version}")
+
+        position = OCCURRENCES_HEADER.size
+
+        def read_column(length):
+            nonlocal position
+            column = array('I')
+            column.frombytes(data[position:position + length * column.itemsize])
+            if len(column) != length:
+                raise ValueError(f"{path} is truncated")
+            if sys.byteorder == 'big':
+                column.byteswap()
+            position += length * column.itemsize
+            return column
+
+        def read_texts(length):
+            nonlocal position
+            texts = []
+            for size in read_column(length):
+                texts.append(str(data[position:position + size], 'utf-8'))
+                position += size
+            return texts
+
+        files = read_texts(file_count)
+        string_ids = {text: string_id for string_id, text in enumerate(read_texts(string_count))}
+        # The occurrences are already grouped by string
+        strings = array('I')
+        starts = array('I', [0])
+        for string_id, occurrences in enumerate(read_column(string_count)):
+            strings.extend(array('I', [string_id]) * occurrences)
+            starts.append(starts[-1] + occurrences)
+        file_ids, lines, cols = read_column(count), read_column(count), read_column(count)
+        return cls(files, string_ids, strings, file_ids, lines, cols, [array('I', range(count)), starts])
+
+class OccurrenceBuilder:
+    """Collects (text, line, col) occurrences file by file into an OccurrenceStore."""
+
+    def __init__(self):
+        self.files = []
+        self._file_ids = {}
+        self._string_ids = {}  # string -> ID, in order of first occurrence
+        self._strings = array('I')  # string ID of each occurrence
+        self._file_column = array('I')
+        self._lines = array('I')
+        self._cols = array('I')
+
+    def __len__(self):
+        return len(self._strings)
+
+    def _file_id(self, file_name):
+        file_id = self._file_ids.get(file_name)
+        if file_id is None:
+            file_id = self._file_ids[file_name] = len(self.files)
+            self.files.append(file_name)
+        return file_id
+
+    def add(self, path, occurrences):
+        """Append the (text, line, col) occurrences found in path."""
+        if not occurrences:
+            return
+        string_ids = self._string_ids
+        texts, lines, cols = zip(*occurrences)
+        # setdefault() gives a new string the next ID
+        self._strings.extend([string_ids.setdefault(text, len(string_ids)) for text in texts])
+        self._file_column.extend(array('I', [self._file_id(str(path))]) * len(texts))
+        self._lines.extend(lines)
+        self._cols.extend(cols)
+
+    def add_store(self, store):
+        """Append every occurrence of another OccurrenceStore (e.g. loaded from a file)."""
+        file_ids = [self._file_id(file_name) for file_name in store.files]
+        string_ids = self._string_ids
+        for text in store:
+            rows = store.rows(text)
+            self._strings.extend(array('I', [string_ids.setdefault(text, len(string_ids))]) * len(rows))
+            self._file_column.extend([file_ids[store.file_ids[row]] for row in rows])
+            self._lines.extend([store.lines[row] for row in rows])
+            self._cols.extend([store.cols[row] for row in rows])
+
+    def distinct_strings(self, start=0):
+        """Return the number of different strings among the occurrences added since row start."""
+        return len(set(self._strings[start:]))
+
+    def build(self):
+        """Return the OccurrenceStore of everything added so far.
+
+        The occurrences of each string keep the order they were added in.
+        """
+        return OccurrenceStore(list(self.files), dict(self._string_ids), self._strings[:],
+                               self._file_column[:], self._lines[:], self._cols[:])
+
+class DsI18nParser(HTMLParser):
+    """Streaming extractor for the content of ds-i18n elements.
+
+    Feed it HTML in chunks of any size; every element with the ds-i18n class
+    is tracked through nested elements (same tag name included) and its
+    inner HTML, with comments removed, is collected in found as
+    (text, line, col) once the element is closed.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.captures = []  # open ds-i18n elements, outermost first
+        self.found = []
+        self._endtag_handled = False
+
+    def _append(self, text):
+        for capture in self.captures:
+            capture.parts.append(text)
+
+    def handle_starttag(self, tag, attrs):
+        for capture in self.captures:
+            if capture.tag == tag:
+                capture.nesting += 1
+        self._append(self.get_starttag_text())
+
+        if tag in HTML_VOID_ELEMENTS:
+            return
+        classes = dict(attrs).get('class') or ''
+        if 'ds-i18n' in classes.split():
+            line, offset = self.getpos()
+            self.captures.append(_DsI18nCapture(tag, line, offset + 1))
+
+    def handle_startendtag(self, tag, attrs):
+        self._append(self.get_starttag_text())
+
+    def parse_endtag(self, i):
+        # Keep end tags as written in the source (case, whitespace), the
+        # same way start tags use get_starttag_text()
+        self._endtag_handled = False
+        j = super().parse_endtag(i)
+        if j > i and self._endtag_handled:
+            self._append(self.rawdata[i:j])
+        return j
+
+    def handle_endtag(self, tag):
+        self._endtag_handled = True
+        still_open = []
+        for capture in self.captures:
+            if capture.tag != tag:
+                still_open.append(capture)
+            elif capture.nesting:
+                capture.nesting -= 1
+                still_open.append(capture)
+            else:
+                self._close(capture)
+        self.captures = still_open
+
+    def _close(self, capture):
+        text = ''.join(capture.parts)
+
+        # Skip if contains complex nested HTML tags, otherwise keep the
+        # original text with simple formatting tags
+        if text and not _is_complex_html(text):
+            self.found.append((text, capture.line, capture.col))
+
+    def handle_data(self, data):
+        self._append(data)
+
+    def handle_entityref(self, name):
+        self._append(f'&{name};')
+
+    def handle_charref(self, name):
+        self._append(f'&#{name};')
+
+    def handle_comment(self, data):
+        # Commented-out content is not part of the element's text
+        pass
+
+class _DsI18nCapture:
+    """An open ds-i18n element and the inner HTML collected so far."""
+
+    __slots__ = ('tag', 'line', 'col', 'nesting', 'parts')
+
+    def __init__(self, tag, line, col):
+        self.tag = tag
+        self.line = line
+        self.col = col
+        self.nesting = 0  # open elements inside it with the same tag name
+        self.parts = []
+
+def scan_html_chunks(chunks):
+    """Run the HTML extractors over a file's content given in chunks.
+
+    Returns a dict mapping extractor name to (text, line, col) occurrences,
+    in document order.
+    """
+    parser = DsI18nParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+    parser.close()
+    return {'ds_i18n': sorted(parser.found, key=lambda occurrence: occurrence[1:])}
+
+def scan_html_content(content):
+    """Run the HTML extractors over one file's content (see scan_html_chunks()).
+
+    Files on disk are fed to scan_html_chunks() through read_text_chunks()
+    instead (see CHUNKED_PARSERS).
+    """
+    return scan_html_chunks((content,))
+
+def scan_js_content(content):
+    """Run all JavaScript extractors over one file's content.
+
+    The file is tokenized once and every extractor works on that same token
+    stream. Returns a dict mapping extractor name to occurrences.
+    """
+    line_index = LineIndex(content)
+    results = {'l_function': [], 'html_in_js': []}
+    for kind, offset, text in iter_js_translatables(content):
+        line_num, col_num = line_index.position(offset)
+        results[kind].append((text, line_num, col_num))
+    return results
+
+def scan_source_files(html_files, js_files, cache=None, pool=None):
+    """Run the extractors over HTML and JavaScript files.
+
+    Returns a list of (path, results) pairs in input order, where results maps
+    extractor name to (text, line, col) occurrences. Files that cannot be read
+    are reported and left out.
+    """
+    cache = cache or ExtractionCache(CACHE_FILE, enabled=False)
+    tasks = [(html_file, 'html', scan_html_content) for html_file in html_files]
+    tasks += [(js_file, 'js', scan_js_content) for js_file in js_files]
+
+    scanned = []
+    for (path, _, _), (results, error) in zip(tasks, cache.get_many(tasks, pool)):
+        if error is not None:
+            print(f"Error reading {path}: {error}")
+            continue
+        scanned.append((path, results))
+
+    return scanned
+
+def merge_scans(scanned):
+    """Merge per-file scan results into one table of string locations.
+
+    Locations are ordered by extractor (see EXTRACTORS), then by file.
+
+    Returns:
+        tuple: (strings, counts)
+            - strings: OccurrenceStore mapping string to its {file, line, col} locations
+            - counts: dict mapping extractor name to its number of unique strings
+    """
+    builder = OccurrenceBuilder()
+    counts = {}
+    for kind in EXTRACTORS:
+        start = len(builder)
+        for path, results in scanned:
+            builder.add(path, results.get(kind, ()))
+        counts[kind] = builder.distinct_strings(start)
+
+    return builder.build(), counts
+
+def extract_strings(html_files, js_files, cache=None, pool=None):
+    """Extract translation strings from all source files in a single pass.
+
+    Each file is read and prepared once, and every extractor writes into one
+    shared table mapping each string to its locations. The result does not
+    depend on whether the files were parsed in parallel through pool.
+
+    Returns:
+        tuple: (strings, counts), see merge_scans()
+    """
+    return merge_scans(scan_source_files(html_files, js_files, cache, pool))
+
+def parse_lang_entries(content):
+    """Return the keys of a language file's content and the untranslated ones.
+
+    A key is untranslated when its value is empty (or not a string).
+    """
+    translations = json.loads(content)
+    return {
+        'keys': list(translations.keys()),
+        'untranslated': [key for key, value in translations.items()
+                         if not isinstance(value, str) or not value.strip()],
+    }
+
+def merge_language_keys(loaded):
+    """Build (all_keys, keys_by_language) from (lang_file, keys) pairs."""
+    all_keys = set()
+    keys_by_language = {}
+
+    for lang_file, keys in loaded:
+        # Extract language code from filename (e.g., "en_us" from "en_us.json")
+        lang_code = lang_file.stem
+
+        keys = set(keys)
+        keys.discard("")  # Remove empty string key if present
+
+        keys_by_language[lang_code] = keys
+        all_keys.update(keys)
+
+    return all_keys, keys_by_language
+
+def filter_excluded_strings(strings_with_locations):
+    """Split extracted strings into (used_strings_with_locations, excluded_strings)."""
+    excluded_strings = {s for s in strings_with_locations if should_exclude_string(s)}
+    used_strings_with_locations = strings_with_locations.select(
+        s for s in strings_with_locations if s not in excluded_strings)
+    return used_strings_with_locations, excluded_strings
+
+def compare_translations(used_strings_with_locations, excluded_strings, translation_keys, keys_by_language,
+                         timer=None):
+    """Compare the strings used in code with the keys in the language files.
+
+    Returns a dict with the inputs and the derived sets used by the reports:
+    used_strings, translation_keys_for_comparison, missing_translations,
+    missing_by_language and unused_translations.
+    """
+    timer = timer or PhaseTimer(enabled=False)
+    with timer.phase('diff_sets'):
+        comparison = _diff_translation_sets(used_strings_with_locations, translation_keys, keys_by_language)
+    with timer.phase('missing_by_language'):
+        comparison['missing_by_language'] = _find_missing_by_language(
+            comparison['missing_translations'], comparison['keys_by_language_filtered'])
+    del comparison['keys_by_language_filtered']
+    comparison['used_strings_with_locations'] = used_strings_with_locations
+    comparison['excluded_strings'] = excluded_strings
+    comparison['translation_keys'] = translation_keys
+    comparison['keys_by_language'] = keys_by_language
+    return comparison
+
+def _diff_translation_sets(used_strings_with_locations, translation_keys, keys_by_language):
+    """Compute the set differences between used strings and translation keys."""
+    used_strings = set(used_strings_with_locations.keys())
+
+    # Remove special keys from comparison
+    translation_keys_for_comparison = translation_keys - SPECIAL_KEYS
+
+    # Remove special keys from each language's key set
+    keys_by_language_filtered = {}
+    for lang_code, keys in keys_by_language.items():
+        keys_by_language_filtered[lang_code] = keys - SPECIAL_KEYS
+
+    # Find missing translations (used in code but not in translation files)
+    missing_translations = used_strings - translation_keys_for_comparison
+
+    # Find unused translations (in translation files but not used in code)
+    # Exclude whitelisted strings from unused check
+    unused_translations = (translation_keys_for_comparison - used_strings) - WHITELIST_UNUSED
+
+    return {
+        'used_strings': used_strings,
+        'keys_by_language_filtered': keys_by_language_filtered,
+        'translation_keys_for_comparison': translation_keys_for_comparison,
+        'missing_translations': missing_translations,
+        'unused_translations': unused_translations,
+    }
+
+def _find_missing_by_language(missing_translations, keys_by_language_filtered):
+    """For each missing translation, find which languages are missing it."""
+    missing_by_language = {}
+    for string in missing_translations:
+        missing_langs = []
+        for lang_code, keys in keys_by_language_filtered.items():
+            if string not in keys:
+                missing_langs.append(lang_code)
+        missing_by_language[string] = sorted(missing_langs)
+    return missing_by_language
+
+def build_json_result(comparison):
+    """Build the --json result object from compare_translations() output."""
+    missing_translations = comparison['missing_translations']
+    missing_by_language = comparison['missing_by_language']
+    used_strings_with_locations = comparison['used_strings_with_locations']
+
+    # Build missing translations with locations and missing languages
+    missing_with_locations = []
+    for string in sorted(missing_translations):
+        entry = {
+            "string": string,
+            "missing_from_languages": missing_by_language.get(string, [])
+        }
+        if string in used_strings_with_locations:
+            entry["locations"] = used_strings_with_locations[string]
+        missing_with_locations.append(entry)
+
+    return {
+        "summary": {
+            "total_strings_used": len(comparison['used_strings']),
+            "total_translation_keys": len(comparison['translation_keys_for_comparison']),
+            "total_languages": len(comparison['keys_by_language']),
+            "missing_count": len(missing_translations),
+            "unused_count": len(comparison['unused_translations']),
+            "excluded_count": len(comparison['excluded_strings']),
+            "whitelisted_count": len(WHITELIST_UNUSED)
+        },
+        "missing_translations": missing_with_locations,
+        "unused_translations": sorted(comparison['unused_translations']),
+        "excluded_strings": sorted(comparison['excluded_strings']),
+        "whitelisted_strings": sorted(WHITELIST_UNUSED)
+    }
+
+def _file_signature(path):
+    """Return (size, mtime_ns) of a file, or None if it is gone."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+# Function extracting the results of each kind of file from its content
+FILE_PARSERS = {
+    'html': scan_html_content,
+    'js': scan_js_content,
+    'entries': parse_lang_entries,
+}
+
+# Kinds of files parsed straight from disk in chunks, with the function taking
+# the chunks, instead of from their whole content
+CHUNKED_PARSERS = {
+    'html': scan_html_chunks,
+}
+
+def file_kind(path):
+    """Return the kind of a path relative to the project root, or None.
+
+    The kind is 'html' or 'js' for source files, 'entries' for language files.
+    """
+    path = Path(path)
+    if path.suffix == '.json' and path.parent == LANG_DIR:
+        return 'entries'
+    if path.suffix == '.html' and path.parent in (Path("."), TEMPLATES_DIR):
+        return 'html'
+    if path.suffix == '.js' and JS_DIR in path.parents:
+        return 'js'
+    return None
+
+class TranslationIndex:
+    """The translation strings used by a project and its language file keys.
+
+    The index keeps the extraction results of every file in memory, so a
+    long-lived process only pays for what changed: refresh() re-discovers the
+    project and re-extracts the files whose size or mtime changed since the
+    previous call, refresh_file() updates a single file, and the queries reuse
+    one comparison until something changes. File paths in results are
+    relative to root. The language files are read through the translation
+    database (db), which can also be queried directly.
+    """
+
+    def __init__(self, root=ROOT_DIR, use_cache=True, jobs=None):
+        self.root = Path(root)
+        self.cache = ExtractionCache(self.root / CACHE_FILE_NAME, enabled=use_cache)
+        self.db = TranslationDatabase(self.root, enabled=use_cache)
+        self.pool = WorkerPool(jobs)
+        self.html_files = []
+        self.js_files = []
+        self.lang_files = []
+        self.errors = []  # (path, message) for the files that failed to load and did not change since
+        self._signatures = {}  # path -> (size, mtime_ns) when it was last extracted
+        self._scans = {}  # source file path -> extractor results
+        self._lang_entries = {}  # language file path -> parse_lang_entries() result
+        self._derived = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Stop the worker processes, write the cache to disk and close the database."""
+        self.pool.close()
+        self.cache.save()
+        self.db.close()
+
+    def _relative(self, path):
+        return Path(os.path.relpath(path, self.root))
+
+    def refresh(self, timer=None):
+        """Bring the index up to date with the files on disk.
+
+        Returns the list of files that were added, changed or removed.
+        """
+        timer = timer or PhaseTimer(enabled=False)
+        with timer.phase('discovery'):
+            self.html_files = [self._relative(path) for path in find_html_files(self.root)]
+            self.js_files = [self._relative(path) for path in find_js_files(self.root)]
+            self.lang_files = [self._relative(path) for path in find_lang_files(self.root)]
+            signatures = {}
+            for path in self.html_files + self.js_files + self.lang_files:
+                signature = _file_signature(self.root / path)
+                if signature is not None:
+                    signatures[path] = signature
+
+        changed = {path for path, signature in signatures.items() if self._signatures.get(path) != signature}
+        removed = [path for path in self._signatures if path not in signatures]
+        for path in removed:
+            self._forget(path)
+        self._signatures = signatures
+        self.errors = [(path, message) for path, message in self.errors
+                       if path in signatures and path not in changed]
+
+        with timer.phase('extract_html'):
+            self._extract([path for path in self.html_files if path in changed], 'html', scan_html_content)
+        with timer.phase('extract_js'):
+            self._extract([path for path in self.js_files if path in changed], 'js', scan_js_content)
+        with timer.phase('load_translation_keys'):
+            self._load_languages([path for path in self.lang_files if path in changed], prune=True)
+        with timer.phase('cache_save'):
+            self.cache.save()
+
+        if changed or removed:
+            self._derived = {}
+        return sorted(changed) + removed
+
+    def refresh_file(self, path):
+        """Update the index after a single source or language file changed.
+
+        path is relative to root, or absolute. Raises ValueError if it is not
+        one of the files the checker scans.
+        """
+        path = Path(path)
+        if path.is_absolute():
+            path = self._relative(path)
+        kind = file_kind(path)
+        if kind is None:
+            raise ValueError(f"{path} is not a source or language file")
+        files = {'html': self.html_files, 'js': self.js_files, 'entries': self.lang_files}[kind]
+        compute = FILE_PARSERS[kind]
+
+        self._derived = {}
+        self.errors = [(p, message) for p, message in self.errors if p != path]
+        signature = _file_signature(self.root / path)
+        if signature is None:
+            self._forget(path)
+            if path in files:
+                files.remove(path)
+            return
+        if path not in files:
+            files.append(path)
+        self._signatures[path] = signature
+        if kind == 'entries':
+            self._load_languages([path])
+        else:
+            self._extract([path], kind, compute)
+
+    def refresh_files(self, paths):
+        """Update the index after several language files changed, in one database transaction.
+
+        paths are relative to root. Missing files are dropped from the index.
+        """
+        self._derived = {}
+        loaded = []
+        for path in map(Path, paths):
+            if file_kind(path) != 'entries':
+                raise ValueError(f"{path} is not a language file")
+            self.errors = [(p, message) for p, message in self.errors if p != path]
+            signature = _file_signature(self.root / path)
+            if signature is None:
+                self._forget(path)
+                if path in self.lang_files:
+                    self.lang_files.remove(path)
+                continue
+            if path not in self.lang_files:
+                self.lang_files.append(path)
+            self._signatures[path] = signature
+            loaded.append(path)
+        self._load_languages(loaded)
+
+    def _forget(self, path):
+        self._signatures.pop(path, None)
+        self._scans.pop(path, None)
+        if file_kind(path) == 'entries':
+            self._lang_entries.pop(path, None)
+            self.db.forget(path)
+        self.cache.seen.discard(str(self.root / path))
+
+    def _extract(self, paths, kind, compute):
+        store = self._scans
+        tasks = [(self.root / path, kind, compute) for path in paths]
+        for path, (result, error) in zip(paths, self.cache.get_many(tasks, self.pool)):
+            if error is not None:
+                self.errors.append((path, error))
+                # The signature is kept, so the file is only read again once it changes
+                store.pop(path, None)
+            else:
+                store[path] = result
+
+    def _load_languages(self, paths, prune=False):
+        """Bring the translation database up to date and load the entries of paths from it.
+
+        With prune, every language file is checked, so languages whose file
+        is gone are dropped from the database too.
+        """
+        _, errors = self.db.refresh(None if prune else paths)
+        failed = dict(errors)
+        for path in paths:
+            if path in failed:
+                self.errors.append((path, failed[path]))
+                self._lang_entries.pop(path, None)
+            else:
+                self._lang_entries[path] = self.db.entries(path.stem)
+
+    def strings(self, timer=None):
+        """Return (strings, counts) for every extracted string, see merge_scans()."""
+        if 'strings' not in self._derived:
+            timer = timer or PhaseTimer(enabled=False)
+            with timer.phase('merge'):
+                scanned = [(path, self._scans[path]) for path in self.html_files + self.js_files
+                           if path in self._scans]
+                self._derived['strings'] = merge_scans(scanned)
+        return self._derived['strings']
+
+    def comparison(self, timer=None):
+        """Return the compare_translations() result for the current state."""
+        if 'comparison' not in self._derived:
+            timer = timer or PhaseTimer(enabled=False)
+            strings, _ = self.strings(timer)
+            with timer.phase('exclude'):
+                used_strings_with_locations, excluded_strings = filter_excluded_strings(strings)
+            translation_keys, keys_by_language = merge_language_keys(
+                [(path, entries['keys']) for path, entries in self.language_entries().items()])
+            self._derived['comparison'] = compare_translations(
+                used_strings_with_locations, excluded_strings, translation_keys, keys_by_language, timer)
+        return self._derived['comparison']
+
+    def derived(self, name, build):
+        """Return build(self), computed once until a file of the index changes."""
+        if name not in self._derived:
+            self._derived[name] = build(self)
+        return self._derived[name]
+
+    def language_entries(self):
+        """Return a dict mapping each language file to its keys and untranslated keys."""
+        return {path: self._lang_entries[path] for path in self.lang_files if path in self._lang_entries}
+
+    def languages(self):
+        """Return the sorted language codes of the language files."""
+        return sorted(self.comparison()['keys_by_language'])
+
+    def missing(self):
+        """Return the sorted strings used in code but missing from every language file."""
+        return sorted(self.comparison()['missing_translations'])
+
+    def unused(self):
+        """Return the sorted translation keys no longer used in code."""
+        return sorted(self.comparison()['unused_translations'])
+
+    def missing_by_language(self):
+        """Return a dict mapping each missing string to the languages lacking it."""
+        return dict(self.comparison()['missing_by_language'])
+
+    def missing_in_language(self, lang_code):
+        """Return the sorted strings used in code that lang_code does not translate."""
+        comparison = self.comparison()
+        keys = comparison['keys_by_language'][lang_code] - SPECIAL_KEYS
+        return sorted(comparison['used_strings'] - keys)
+
+    def locations(self, string):
+        """Return the list of {file, line, col} where string is used in code."""
+        return list(self.strings()[0].get(string, []))
+
+    def report(self):
+        """Return the --json result object for the current state."""
+        return build_json_result(self.comparison())
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+
+# (C) 2025 dualshock-tools
+#
+# This script maintains a stable table of integer ids for the translation
+# strings, and compiles each language file into a dense array aligned to it.
+# Instead of repeating every English sentence as a key in every language, a
+# compiled language is just the list of its translations, where the
+# translation of the string with id N is at index N.
+#
+# The table (scripts/translation_key_table.json) contains every string that
+# the source files use (see check_translations.py), the whitelisted strings
+# and the special keys. It only ever grows: new strings get the next free id,
+# and strings that are no longer used leave a null slot behind, so ids never
+# change meaning. Its version is bumped whenever it changes, and compiled
+# arrays record the version they were built against. It is kept out of lang/,
+# whose JSON files the build copies to dist/.
+#
+# Usage:
+#   python3 scripts/translation_key_table.py update   # Add new strings to the table
+#   python3 scripts/translation_key_table.py compile  # Write dist/lang/<code>.keys.json
+#   python3 scripts/translation_key_table.py verify   # Check the table and the compiled arrays
+#   python3 scripts/translation_key_table.py compile --out-dir DIR
+#   python3 scripts/translation_key_table.py verify --out-dir DIR
+#
+# verify exits with 1 if a used string has no id, if the table is malformed,
+# or if a compiled array does not match the table or its language file.
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+from pathlib import Path
+
+from translation_index import SPECIAL_KEYS, WHITELIST_UNUSED, TranslationIndex
+
+TABLE_FILE = Path("scripts") / "translation_key_table.json"
+DEFAULT_OUT_DIR = Path("dist") / "lang"
+COMPILED_SUFFIX = ".keys.json"
+
+def table_keys(index):
+    """Return the set of strings that need an id."""
+    return index.comparison()['used_strings'] | WHITELIST_UNUSED | SPECIAL_KEYS
+
+def load_table(path):
+    """Load the key table, or an empty one if it does not exist yet."""
+    if not path.exists():
+        return {"version": 0, "keys": []}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def write_json(path, data, **options):
+    """Write JSON through a temp file, so readers never see a partial file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, **options)
+        if options.get('indent') is not None:
+            f.write("\n")
+    os.replace(tmp_path, path)
+
+def save_table(path, table):
+    write_json(path, table, indent=1)
+
+def table_digest(table):
+    """Hash of the keys of a table, recorded in compiled arrays."""
+    return hashlib.sha256(json.dumps(table["keys"], ensure_ascii=False).encode('utf-8')).hexdigest()
+
+def update_table(table, keys):
+    """Append new keys and clear the slots of removed ones.
+
+    Returns (table, added, removed); the version is bumped on any change.
+    """
+    slots = list(table["keys"])
+    present = {key for key in slots if key is not None}
+    added = sorted(keys - present)
+    removed = present - keys
+    if not added and not removed:
+        return table, [], []
+
+    slots = [None if key in removed else key for key in slots]
+    slots.extend(added)
+    return {"version": table["version"] + 1, "keys": slots}, added, sorted(removed)
+
+def compile_language(table, translations):
+    """Return the dense array of translations aligned to the table.
+
+    Untranslated strings and free slots are null.
+    """
+    values = []
+    for key in table["keys"]:
+        value = translations.get(key) if key is not None else None
+        values.append(value if isinstance(value, str) and value.strip() else None)
+    return {"version": table["version"], "table_sha256": table_digest(table), "values": values}
+
+def read_translations(index, lang_file):
+    with open(index.root / lang_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def compiled_path(out_dir, lang_file):
+    return out_dir / (lang_file.stem + COMPILED_SUFFIX)
+
+def verify(index, table, out_dir=None):
+    """Return the list of problems found in the table and compiled arrays.
+
+    Compiled arrays are only checked when out_dir is given.
+    """
+    problems = []
+    slots = table.get("keys")
+    if not isinstance(table.get("version"), int) or not isinstance(slots, list):
+        return ["table: expected an object with an integer \"version\" and a \"keys\" list"]
+
+    seen = set()
+    for i, key in enumerate(slots):
+        if key is None:
+            continue
+        if not isinstance(key, str):
+            problems.append(f"table: id {i} is not a string")
+        elif key in seen:
+            problems.append(f"table: \"{key}\" has more than one id")
+        seen.add(key)
+    for key in sorted(table_keys(index) - seen):
+        problems.append(f"table: no id for \"{key}\" (run update)")
+
+    if out_dir is None or not out_dir.is_dir():
+        return problems
+    for lang_file in sorted(index.lang_files):
+        path = compiled_path(out_dir, lang_file)
+        if not path.exists():
+            continue
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                compiled = json.load(f)
+            expected = compile_language(table, read_translations(index, lang_file))
+        except Exception as e:
+            problems.append(f"Error reading {path}: {e}")
+            continue
+        if compiled.get("version") != table["version"] or compiled.get("table_sha256") != expected["table_sha256"]:
+            problems.append(f"{path}: built for table version {compiled.get('version')}, "
+                            f"table is version {table['version']} (run compile)")
+        elif len(compiled.get("values", [])) != len(slots):
+            problems.append(f"{path}: {len(compiled.get('values', []))} values for {len(slots)} ids")
+        elif compiled["values"] != expected["values"]:
+            stale = sum(1 for a, b in zip(compiled["values"], expected["values"]) if a != b)
+            problems.append(f"{path}: {stale} values differ from {lang_file} (run compile)")
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the integer key table of the translations.")
+    parser.add_argument('command', choices=['update', 'compile', 'verify'])
+    parser.add_argument('--out-dir', type=Path, default=DEFAULT_OUT_DIR,
+                        help=f"directory of the compiled arrays (default: {DEFAULT_OUT_DIR})")
+    parser.add_argument('--no-cache', action='store_true', help="don't use the extraction cache")
+    args = parser.parse_args()
+
+    with TranslationIndex(use_cache=not args.no_cache) as index:
+        index.refresh()
+        for path, error in index.errors:
+            print(f"Error reading {path}: {error}")
+        try:
+            table = load_table(TABLE_FILE)
+        except Exception as e:
+            print(f"Error reading {TABLE_FILE}: {e}")
+            return 1
+
+        if args.command == 'update':
+            table, added, removed = update_table(table, table_keys(index))
+            if not added and not removed:
+                print(f"{TABLE_FILE}: up to date (version {table['version']}, {len(table['keys'])} ids)")
+                return 0
+            save_table(TABLE_FILE, table)
+            print(f"{TABLE_FILE}: version {table['version']}, {len(added)} added, {len(removed)} removed, "
+                  f"{len(table['keys'])} ids")
+            return 0
+
+        if args.command == 'compile':
+            problems = verify(index, table)
+            if problems:
+                for problem in problems:
+                    print(problem)
+                return 1
+            args.out_dir.mkdir(parents=True, exist_ok=True)
+            for lang_file in sorted(index.lang_files):
+                compiled = compile_language(table, read_translations(index, lang_file))
+                path = compiled_path(args.out_dir, lang_file)
+                write_json(path, compiled, separators=(',', ':'))
+                translated = sum(1 for value in compiled["values"] if value is not None)
+                print(f"{path}: {translated} of {len(compiled['values'])} ids translated")
+            return 0
+
+        problems = verify(index, table, args.out_dir)
+        for problem in problems:
+            print(problem)
+        if problems:
+            return 1
+        print(f"{TABLE_FILE}: version {table['version']}, {len(table['keys'])} ids, consistent")
+        return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+# (C) 2025 dualshock-tools
+#
+# Translation memory for check_translations.py --suggest.
+#
+# For a string that is missing from the language files, this module looks for
+# existing keys that share phrases with it and offers their translations as
+# drafts, e.g. the translations of "Calibrate stick center" for a new
+# "Calibrate stick range". Keys that appear word for word inside the missing
+# string (such as "Test Speaker" in 'Click "Test Speaker" to listen...') are
+# reported as fragments: their translation is the translation of that part.
+#
+# Keys are indexed once by word n-grams (phrases of 1 to PHRASE_MAX_WORDS
+# words) in an inverted index, so a lookup only scores the keys that share a
+# phrase with the missing string. The index is built once per state of the
+# TranslationIndex, and the translations are read from its translation
+# database instead of the language files.
+
+import re
+from collections import Counter
+
+from translation_index import SPECIAL_KEYS
+
+# Longest phrase (in words) indexed; longer shared phrases count as several
+PHRASE_MAX_WORDS = 3
+
+# Suggestions kept for each missing string
+SUGGESTIONS_COUNT = 3
+
+# Minimum overlap (0-1) for a key to be suggested
+SUGGESTION_MIN_OVERLAP = 0.3
+
+# Single words too common to suggest a key on their own
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "for", "from", "if", "in", "is", "it",
+    "not", "of", "on", "or", "so", "that", "the", "this", "to", "will", "with", "you", "your",
+}
+
+WORD_PATTERN = re.compile(r"\w+(?:['’]\w+)*")
+
+
+def words(text):
+    """Return the lowercase words of a string, ignoring HTML tags and punctuation."""
+    return WORD_PATTERN.findall(re.sub(r"<[^>]*>", " ", text).lower())
+
+def phrases(word_list):
+    """Return the set of word n-grams of a word list used for matching."""
+    grams = set()
+    for n in range(1, PHRASE_MAX_WORDS + 1):
+        for i in range(len(word_list) - n + 1):
+            gram = tuple(word_list[i:i + n])
+            if n == 1 and gram[0] in STOPWORDS:
+                continue
+            grams.add(gram)
+    return grams
+
+def _longest_common_run(a, b):
+    """Return the longest run of consecutive words shared by two word lists."""
+    best = ()
+    previous = [0] * (len(b) + 1)
+    for i in range(1, len(a) + 1):
+        current = [0] * (len(b) + 1)
+        for j in range(1, len(b) + 1):
+            if a[i - 1] == b[j - 1]:
+                current[j] = previous[j - 1] + 1
+                if current[j] > len(best):
+                    best = tuple(a[i - current[j]:i])
+        previous = current
+    return best
+
+def _contains_run(haystack, needle):
+    n = len(needle)
+    return any(tuple(haystack[i:i + n]) == needle for i in range(len(haystack) - n + 1))
+
+class TranslationMemory:
+    """Inverted index from English phrases to the translated keys containing them.
+
+    translations maps language code to {key: translation}.
+    """
+
+    def __init__(self, translations):
+        self.translations = translations
+        keys = set()
+        for entries in translations.values():
+            keys.update(entries)
+        self.keys = sorted(keys - SPECIAL_KEYS - {""})
+        self.words = [tuple(words(key)) for key in self.keys]
+        self.phrases = [phrases(word_list) for word_list in self.words]
+        self.postings = {}
+        for i, grams in enumerate(self.phrases):
+            for gram in grams:
+                self.postings.setdefault(gram, []).append(i)
+
+    def lookup(self, text, count=SUGGESTIONS_COUNT, min_overlap=SUGGESTION_MIN_OVERLAP):
+        """Return suggestions for text, best first.
+
+        Each suggestion is a dict with the source key, its overlap with text
+        (Dice coefficient of their phrases), the longest shared phrase,
+        whether the key appears word for word in text (fragment), and its
+        translations by language.
+        """
+        text_words = tuple(words(text))
+        grams = phrases(text_words)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.postings.get(gram, ()))
+
+        scored = []
+        for i, common in shared.items():
+            overlap = 2 * common / (len(grams) + len(self.phrases[i]))
+            fragment = len(self.words[i]) > 1 and _contains_run(text_words, self.words[i])
+            if overlap >= min_overlap or fragment:
+                scored.append((fragment, overlap, i))
+        # Fragments are exact, aligned translations of part of text: list them first
+        scored.sort(key=lambda item: (not item[0], -item[1], self.keys[item[2]]))
+
+        suggestions = []
+        for fragment, overlap, i in scored[:count]:
+            key = self.keys[i]
+            suggestions.append({
+                "source": key,
+                "overlap": round(overlap, 3),
+                "phrase": " ".join(_longest_common_run(text_words, self.words[i])),
+                "fragment": fragment,
+                "translations": {language: entries[key]
+                                 for language, entries in sorted(self.translations.items()) if key in entries},
+            })
+        return suggestions
+
+def load_translations(index):
+    """Return {language: {key: translation}} for a TranslationIndex, from its translation database."""
+    return index.db.translations()
+
+def suggest_translations(index, strings):
+    """Return {string: suggestions} for the strings that have any."""
+    memory = index.derived('translation_memory', lambda index: TranslationMemory(load_translations(index)))
+    suggestions = {}
+    for string in sorted(strings):
+        found = memory.lookup(string)
+        if found:
+            suggestions[string] = found
+    return suggestions
+
+def print_suggestions(suggestions, verbose=False):
+    """Print the SUGGESTIONS section of the text report."""
+    print("=" * 80)
+    print("SUGGESTIONS")
+    print("=" * 80)
+    if not suggestions:
+        print("No existing translation shares a phrase with the missing strings")
+        print()
+        return
+    print("Existing translations that share phrases with missing strings:")
+    print("-" * 80)
+    for string, found in suggestions.items():
+        print(f"  - \"{string}\"")
+        for suggestion in found:
+            kind = "fragment" if suggestion["fragment"] else f"{suggestion['overlap'] * 100:.0f}%"
+            print(f"    {kind:>8}  \"{suggestion['source']}\" "
+                  f"({len(suggestion['translations'])} languages, shared: \"{suggestion['phrase']}\")")
+            if verbose:
+                for language, translation in suggestion["translations"].items():
+                    print(f"              {language}: {translation}")
+    print()
@@ -0,0 +1,104 @@
+# (C) 2025 dualshock-tools
+#
+# Rename detection for check_translations.py --renames.
+#
+# When a sentence is reworded in the code, the checker reports the new text
+# as missing and the old one as unused, although the existing translations
+# of the old text are usually a good start for the new one. This module
+# pairs missing strings with similar unused keys, so the translations can be
+# moved over with process_lang.py instead of being redone.
+#
+# Similarity is the Jaccard index of the character trigrams of the two
+# strings (case and whitespace are ignored). Candidates come from an
+# inverted index from trigram to unused key, so each missing string is only
+# compared with the keys it shares trigrams with, not with every unused key.
+
+import json
+from collections import Counter
+
+# Minimum trigram similarity (0-1) for a pair to be proposed as a rename
+RENAME_MIN_SIMILARITY = 0.5
+
+
+def trigrams(text):
+    """Return the set of character trigrams of a normalized string."""
+    text = " ".join(text.lower().split())
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class TrigramIndex:
+    """Inverted index from trigram to the strings that contain it."""
+
+    def __init__(self, strings):
+        self.strings = list(strings)
+        self.grams = [trigrams(string) for string in self.strings]
+        self.postings = {}
+        for i, grams in enumerate(self.grams):
+            for gram in grams:
+                self.postings.setdefault(gram, []).append(i)
+
+    def search(self, text, min_similarity=RENAME_MIN_SIMILARITY):
+        """Return [(similarity, string)] for the indexed strings similar to text, best first."""
+        grams = trigrams(text)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.postings.get(gram, ()))
+
+        results = []
+        for i, count in shared.items():
+            similarity = count / (len(grams) + len(self.grams[i]) - count)
+            if similarity >= min_similarity:
+                results.append((similarity, self.strings[i]))
+        results.sort(key=lambda result: (-result[0], result[1]))
+        return results
+
+def detect_renames(missing_strings, unused_strings, min_similarity=RENAME_MIN_SIMILARITY):
+    """Propose renames from unused keys to missing strings.
+
+    Each string is used in at most one proposal; the most similar pairs are
+    picked first. Returns a list of {from, to, similarity} dicts sorted by
+    the new string.
+    """
+    index = TrigramIndex(sorted(unused_strings))
+    candidates = []
+    for missing in sorted(missing_strings):
+        for similarity, unused in index.search(missing, min_similarity):
+            candidates.append((similarity, missing, unused))
+    candidates.sort(key=lambda candidate: (-candidate[0], candidate[1], candidate[2]))
+
+    renames = []
+    taken_missing = set()
+    taken_unused = set()
+    for similarity, missing, unused in candidates:
+        if missing in taken_missing or unused in taken_unused:
+            continue
+        taken_missing.add(missing)
+        taken_unused.add(unused)
+        renames.append({"from": unused, "to": missing, "similarity": round(similarity, 3)})
+    renames.sort(key=lambda rename: rename["to"])
+    return renames
+
+def write_rename_patch(renames, path):
+    """Write the renames as a process_lang.py patch file."""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("# Renames proposed by check_translations.py --renames; review before applying with\n")
+        f.write("# python3 scripts/process_lang.py <this file>\n")
+        for rename in renames:
+            f.write(json.dumps({"op": "rename", "key": rename["from"], "to": rename["to"]}, ensure_ascii=False))
+            f.write("\n")
+
+def print_renames(renames):
+    """Print the POSSIBLE RENAMES section of the text report."""
+    print("=" * 80)
+    print("POSSIBLE RENAMES")
+    print("=" * 80)
+    if not renames:
+        print("No missing string looks like a reworded unused one")
+        print()
+        return
+    print("These missing strings look like reworded versions of unused ones:")
+    print("-" * 80)
+    for rename in renames:
+        print(f"  {rename['similarity'] * 100:.0f}%  \"{rename['from']}\"")
+        print(f"        → \"{rename['to']}\"")
+    print()
@@ -0,0 +1,1128 @@
+#!/usr/bin/env python3
+
+# (C) 2025 dualshock-tools
+#
+# This script simulates DS4 / DualSense controllers at the level of their
+# feature reports, to measure how long the calibration workflows of the web
+# app take without a physical controller. It has three parts:
+# - virtual controllers implementing the feature-report state machines the
+#   app relies on: stick center and range calibration (0x90-0x92 on the DS4,
+#   0x82/0x83 on the DualSense), NVS lock states and the commands on 0x80/0x81
+#   (NVS, system info, finetune data, and the module commands of the
+#   DualSense Edge, which complete after MODULE_WRITE_MS), plus the quirks of
+#   DS4 clones (rejected 0x81 report, short 0xa3 report, no calibration)
+# - LocalTransport, the stand-in for WebHID: it forwards feature reports to a
+#   virtual controller and keeps a virtual clock, so a workflow runs
+#   instantly while its round trips and sleeps are counted
+# - ports of the JavaScript workflows (js/controllers/*, js/controller-manager.js
+#   and the calibration modals), with the same reports, checks and sleep()
+#   calls in the same order
+#
+# `run` prints what each workflow costs: the feature report round trips, the
+# fixed sleeps, and the total with --transfer-ms per round trip. `serve`
+# exposes a virtual controller on a local TCP port (one JSON request per
+# line), for a test harness that drives it with the JavaScript classes
+# through a fake HIDDevice. `verify` checks that the sleeps of the ports
+# match the JavaScript sources and that the workflows succeed (or fail, for
+# clones) as they should.
+#
+# `run` exits with 1 if a workflow has an unexpected outcome: a failure on a
+# genuine controller, or a success on a clone.
+#
+# Usage:
+#   python3 scripts/virtual_controller.py run                                # Every workflow on every model
+#   python3 scripts/virtual_controller.py run --model ds5 --workflow save -v # One workflow, with its transfers
+#   python3 scripts/virtual_controller.py run --nv unlocked --transfer-ms 8  # Unlocked NVS, Bluetooth-like latency
+#   python3 scripts/virtual_controller.py serve ds4_clone --port 8765        # Local transport for a test harness
+#   python3 scripts/virtual_controller.py verify                             # Check against the JavaScript sources
+#
+# Run it from the root directory of the project.
+
+import re
+import sys
+import json
+import struct
+import inspect
+import argparse
+import socketserver
+from pathlib import Path
+
+# Virtual time of one feature report transfer (ms), about one USB frame
+DEFAULT_TRANSFER_MS = 1.0
+
+# Time the DualSense Edge takes to complete a module command (ms)
+MODULE_WRITE_MS = 120
+
+DEFAULT_PORT = 8765
+
+NV_STATES = ('locked', 'unlocked', 'pending_reboot')
+
+# NVS status of the DualSense, as read by queryNvStatus()
+DS5_NV_CODES = {
+    'locked': 0x03030201,
+    'unlocked': 0x03030200,
+    'pending_reboot': 0x15010100,
+}
+
+DS4_UNLOCK_KEY = (0x3e, 0x71, 0x7f, 0x89)
+DS5_UNLOCK_KEY = (101, 50, 64, 12)
+
+CALIBRATION_BEGIN = 1
+CALIBRATION_END = 2
+CALIBRATION_SAMPLE = 3
+CALIBRATION_CENTER = 1
+CALIBRATION_RANGE = 2
+
+NOT_GENUINE_SONY_CONTROLLER_MSG = ("Your device might not be a genuine Sony controller. "
+                                   "If it is not a clone then please report this issue.")
+
+DEFAULT_FINETUNE_DATA = (1924, 1985, 2043, 2109, 1937, 2048, 1953, 2047, 2099, 2048, 1984, 2040)
+
+
+class FeatureReportError(Exception):
+    """A feature report transfer rejected by the device (a DOMException in WebHID)."""
+
+class WorkflowError(Exception):
+    """A workflow failed the way the web app reports it."""
+
+def _u32be(data, offset):
+    return struct.unpack_from('>I', data, offset)[0]
+
+def _hex32(value):
+    return f"{value:08X}"
+
+# ---- Virtual controllers ----
+
+class VirtualDevice:
+    """Base of the virtual controllers.
+
+    feature_report_sizes gives the size (report ID excluded) of each feature
+    report, like reportCount in the HID descriptor. Received reports start
+    with their report ID, like the DataView WebHID returns.
+    """
+
+    model = None
+    feature_report_sizes = {}
+
+    def __init__(self, nv_status='locked'):
+        if nv_status not in NV_STATES:
+            raise ValueError(f"unknown NVS state {nv_status!r}")
+        self.nv_status = nv_status
+        # Calibration in progress: [kind, samples]
+        self.calibration = None
+        # Calibrations ended: (kind, samples, stored permanently)
+        self.stored = []
+        self.resets = 0
+
+    def _report(self, report_id, payload, size=None):
+        size = self.feature_report_sizes[report_id] if size is None else size
+        return bytes((report_id,)) + bytes(payload).ljust(size, b'\0')[:size]
+
+    def _reset(self):
+        self.resets += 1
+        self.calibration = None
+        self.nv_status = 'locked'
+
+    def _store(self, kind):
+        self.stored.append((kind, self.calibration[1], self.nv_status == 'unlocked'))
+        self.calibration = None
+
+    def set_feature_report(self, report_id, data, now):
+        raise FeatureReportError(f"feature report {report_id:#04x} is not supported")
+
+    def get_feature_report(self, report_id, now):
+        raise FeatureReportError(f"feature report {report_id:#04x} is not supported")
+
+class VirtualDS4(VirtualDevice):
+    """DualShock 4. clone is None, 'no_81' (rejects 0x81) or 'short_info' (0xa3 shorter than 49 bytes)."""
+
+    model = 'DS4'
+    # 0x91/0x92 and 0xa3 are checked by the app; the other sizes only pad the writes
+    feature_report_sizes = {0x08: 47, 0x11: 47, 0x12: 15, 0x81: 63, 0x90: 63, 0x91: 3, 0x92: 3, 0xa0: 63,
+                            0xa3: 48}
+
+    def __init__(self, nv_status='locked', clone=None):
+        if nv_status == 'pending_reboot':
+            raise ValueError("the DS4 has no pending reboot state")
+        if clone not in (None, 'no_81', 'short_info'):
+            raise ValueError(f"unknown clone kind {clone!r}")
+        super().__init__(nv_status)
+        self.clone = clone
+        self.status = (0, 0)
+        self.bd_addr = bytes((0x5e, 0x4d, 0x3c, 0x2b, 0x1a, 0xa4))
+
+    def set_feature_report(self, report_id, data, now):
+        if report_id == 0xa0 and not self.clone:
+            if data[:3] == bytes((4, 1, 0)):
+                self._reset()
+            elif data[:3] == bytes((10, 1, 0)):
+                self.nv_status = 'locked'
+            elif data[:2] == bytes((10, 2)) and tuple(data[2:6]) == DS4_UNLOCK_KEY:
+                self.nv_status = 'unlocked'
+        elif report_id == 0x90:
+            if not self.clone:
+                self._calibrate(data[0], data[2])
+        elif report_id != 0x08:
+            super().set_feature_report(report_id, data, now)
+
+    def _calibrate(self, action, kind):
+        active = self.calibration is not None and self.calibration[0] == kind
+        if action == CALIBRATION_BEGIN:
+            self.calibration = [kind, 0]
+            self.status = (0x91010001 | kind << 8, 0x920100ff | kind << 8)
+        elif action == CALIBRATION_SAMPLE and active and kind == CALIBRATION_CENTER:
+            self.calibration[1] += 1
+            self.status = (0x91010101, 0x920101ff)
+        elif action == CALIBRATION_END and active:
+            self._store(kind)
+            self.status = (0x91010002 | kind << 8, 0x92010001 | kind << 8)
+        else:
+            self.status = (0x910100ff | kind << 8, 0x920100ff | kind << 8)
+
+    def get_feature_report(self, report_id, now):
+        if report_id == 0xa3:
+            size = 47 if self.clone == 'short_info' else None
+            payload = bytearray(48)
+            payload[0:11] = b"Sep 21 2018"
+            payload[15:23] = b"04:50:51"
+            struct.pack_into('<HHIH', payload, 0x20, 0x0100, 0x5400, 0x0100, 0x0001)
+            return self._report(report_id, payload, size)
+        if report_id == 0x12:
+            return self._report(report_id, self.bd_addr)
+        if self.clone:
+            if report_id in (0x91, 0x92):
+                # Clones answer with a whole report of zeros
+                return self._report(report_id, b'', 63)
+            return super().get_feature_report(report_id, now)
+        if report_id in (0x91, 0x92):
+            return self.status[report_id - 0x91].to_bytes(4, 'big')
+        if report_id == 0x11:
+            return self._report(report_id, bytes((1 if self.nv_status == 'locked' else 0,)))
+        if report_id == 0x81:
+            return self._report(report_id, b'')
+        return super().get_feature_report(report_id, now)
+
+class VirtualDS5(VirtualDevice):
+    """DualSense."""
+
+    model = 'DS5'
+    module_data_command = 2
+    feature_report_sizes = {0x20: 63, 0x80: 63, 0x81: 63, 0x82: 63, 0x83: 63}
+
+    # getSystemInfo() (base, num) -> value
+    SYSTEM_INFO = {
+        (1, 9): bytes.fromhex("0123456789abcdef01"),
+        (1, 17): b"41BA0000000000",
+        (1, 19): b"E12345678901234AB",
+        (1, 24): b"BB0123456789ABCDEFGHIJK",
+        (1, 26): b"VL0123456789ABCD",
+        (1, 28): b"VR0123456789ABCD",
+        (5, 2): bytes.fromhex("0102030405060708"),
+        (5, 4): bytes.fromhex("0000010203040506"),
+    }
+
+    def __init__(self, nv_status='locked', build_date="Jun 10 2022"):
+        super().__init__(nv_status)
+        self.build_date = build_date
+        self.finetune = list(DEFAULT_FINETUNE_DATA)
+        self.response = b''
+        self.status = 0x83000000
+        self.bd_addr = bytes((0x6f, 0x5e, 0x4d, 0x3c, 0x2b, 0xa4))
+
+    def set_feature_report(self, report_id, data, now):
+        if report_id == 0x80:
+            self.response = self._command(data, now)
+        elif report_id == 0x82:
+            self.status = self._calibrate(data[0], data[2])
+        else:
+            super().set_feature_report(report_id, data, now)
+
+    def _command(self, data, now):
+        """Run a command written to 0x80. Returns the payload of the next 0x81 report."""
+        command = tuple(data[:2])
+        if command == (1, 1):
+            self._reset()
+            return b''
+        if command == (3, 1):
+            if self.nv_status == 'unlocked':
+                self.nv_status = 'locked'
+            return bytes((3, 1, 2))
+        if command == (3, 2):
+            if tuple(data[2:6]) == DS5_UNLOCK_KEY and self.nv_status == 'locked':
+                self.nv_status = 'unlocked'
+            return bytes((3, 2, 2))
+        if command == (3, 3):
+            return DS5_NV_CODES[self.nv_status].to_bytes(4, 'big')
+        if command == (9, 2):
+            return bytes((9, 2, 2)) + self.bd_addr
+        if command == (12, self.module_data_command):
+            return bytes((12, self.module_data_command, 2)) + struct.pack('<12H', *self.finetune)
+        if command == (12, 1):
+            self.finetune = list(struct.unpack_from('<12H', data, 2))
+            return bytes((12, 1, 2))
+        if command in self.SYSTEM_INFO:
+            return bytes((*command, 2)) + self.SYSTEM_INFO[command]
+        return bytes((*command, 0))
+
+    def _calibrate(self, action, kind):
+        """Run a calibration command written to 0x82. Returns the status read from 0x83."""
+        active = self.calibration is not None and self.calibration[0] == kind
+        if action == CALIBRATION_BEGIN:
+            self.calibration = [kind, 0]
+            return 0x83010001 | kind << 8
+        if action == CALIBRATION_SAMPLE and active and kind == CALIBRATION_CENTER:
+            self.calibration[1] += 1
+            return 0x83010101
+        if action == CALIBRATION_END and active:
+            self._store(kind)
+            return 0x83010002 | kind << 8
+        return 0x830100ff | kind << 8
+
+    def get_feature_report(self, report_id, now):
+        if report_id == 0x20:
+            payload = bytearray(63)
+            payload[0:11] = self.build_date.encode('ascii')
+            payload[11:19] = b"11:22:33"
+            struct.pack_into('<HHII', payload, 19, 0x0044, 0x0000, 0x00000501, 0x01040034)
+            return self._report(report_id, payload)
+        if report_id == 0x81:
+            return self._report(report_id, self.response(now) if callable(self.response) else self.response)
+        if report_id == 0x83:
+            # The status includes the report ID as its first byte
+            return self._report(report_id, self.status.to_bytes(4, 'big')[1:])
+        return super().get_feature_report(report_id, now)
+
+class VirtualDS5Edge(VirtualDS5):
+    """DualSense Edge: two-step calibration ends and stick modules that take MODULE_WRITE_MS per command."""
+
+    model = 'DS5_Edge'
+    module_data_command = 4
+
+    # Module commands: (command, parameters) -> reply once done
+    MODULE_COMMANDS = {
+        (21, 6): (21, 6),  # unlock
+        (21, 4): (21, 4),  # lock
+        (21, 5): (21, 3),  # store
+    }
+
+    def __init__(self, nv_status='locked', build_date="Jun 10 2022"):
+        super().__init__(nv_status, build_date)
+        self.modules_locked = [True, True]
+        self.barcodes = [b"RMOD0123456789ABC", b"LMOD0123456789ABC"]
+
+    def _command(self, data, now):
+        command = tuple(data[:2])
+        if command in self.MODULE_COMMANDS:
+            reply = self.MODULE_COMMANDS[command]
+            module = data[2]
+            if command == (21, 6):
+                self.modules_locked[module] = False
+            elif command == (21, 4):
+                self.modules_locked[module] = True
+            done = now + MODULE_WRITE_MS
+            return lambda now: bytes((*reply, 2 if now >= done else 1))
+        if command == (21, 34):
+            payload = bytearray(63)
+            payload[20:37] = self.barcodes[data[2]]
+            return bytes(payload)
+        return super()._command(data, now)
+
+    def _calibrate(self, action, kind):
+        # The first end acknowledges, the second one stores
+        if action == CALIBRATION_END and self.calibration is not None and self.calibration[0] == kind:
+            if len(self.calibration) == 2:
+                self.calibration.append('ending')
+                return 0x83010001 | kind << 8
+            self._store(kind)
+            return 0x83010003 | kind << 8
+        return super()._calibrate(action, kind)
+
+MODELS = {
+    'ds4': lambda nv: VirtualDS4(nv),
+    'ds4_clone': lambda nv: VirtualDS4(nv, clone='no_81'),
+    'ds4_clone_short': lambda nv: VirtualDS4(nv, clone='short_info'),
+    'ds5': lambda nv: VirtualDS5(nv),
+    'ds5_edge': lambda nv: VirtualDS5Edge(nv),
+}
+
+# ---- Transport ----
+
+class LocalTransport:
+    """Stand-in for a WebHID device, with a virtual clock.
+
+    Every feature report transfer is a round trip of transfer_ms; sleep()
+    advances the clock without waiting. log lists the transfers and sleeps.
+    """
+
+    def __init__(self, device, transfer_ms=DEFAULT_TRANSFER_MS):
+        self.device = device
+        self.transfer_ms = transfer_ms
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.clock = 0.0
+        self.round_trips = 0
+        self.sleeps = []
+        self.log = []
+
+    def send_feature_report(self, report_id, data):
+        """Send a feature report; data is padded or truncated to the report size, like alloc_req()."""
+        size = self.device.feature_report_sizes.get(report_id, len(data))
+        data = bytes(data[:size]).ljust(size, b'\0')
+        self._transfer('send', report_id, data)
+        self.device.set_feature_report(report_id, data, self.clock)
+
+    def receive_feature_report(self, report_id):
+        """Receive a feature report (report ID first)."""
+        try:
+            data = self.device.get_feature_report(report_id, self.clock)
+        except FeatureReportError:
+            # A rejected transfer still costs its round trip
+            self._transfer('receive', report_id, b'')
+            raise
+        self._transfer('receive', report_id, data)
+        return data
+
+    def _transfer(self, op, report_id, data):
+        self.clock += self.transfer_ms
+        self.round_trips += 1
+        self.log.append({"time": round(self.clock, 3), "op": op, "report_id": report_id, "data": data.hex()})
+
+    def sleep(self, ms):
+        self.clock += ms
+        self.sleeps.append(ms)
+        self.log.append({"time": round(self.clock, 3), "op": "sleep", "ms": ms})
+
+    def stats(self):
+        return {
+            "round_trips": self.round_trips,
+            "sleeps": len(self.sleeps),
+            "sleep_ms": sum(self.sleeps),
+            "transfer_ms": round(self.round_trips * self.transfer_ms, 3),
+            "total_ms": round(self.clock, 3),
+        }
+
+# ---- Ports of js/controllers ----
+
+class DS4Protocol:
+    """Port of DS4Controller (js/controllers/ds4-controller.js)."""
+
+    def __init__(self, transport):
+        self.transport = transport
+        self.send_feature_report = transport.send_feature_report
+        self.receive_feature_report = transport.receive_feature_report
+        self.sleep = transport.sleep
+
+    def get_serial_number(self):
+        return self.get_bd_addr()
+
+    def get_info(self):
+        try:
+            is_clone = False
+            view = self.receive_feature_report(0xa3)
+            if (view[0] != 0xa3 or len(view) < 49) and len(view) != 49:
+                is_clone = True
+            try:
+                if not is_clone:
+                    self.receive_feature_report(0x81)
+            except FeatureReportError:
+                is_clone = True
+            self.get_bd_addr()
+            nv = self.query_nv_status()
+            return {"ok": True, "is_clone": is_clone, "nv": nv, "disable_bits": 1 if is_clone else 0}
+        except FeatureReportError as e:
+            return {"ok": False, "error": str(e), "disable_bits": 1}
+
+    def flash(self):
+        self.nvs_unlock()
+        lock = self.nvs_lock()
+        if not lock["ok"]:
+            raise WorkflowError("Error while saving changes")
+        return {"success": True}
+
+    def reset(self):
+        try:
+            self.send_feature_report(0xa0, [4, 1, 0])
+        except FeatureReportError:
+            pass
+
+    def nvs_lock(self):
+        try:
+            self.send_feature_report(0xa0, [10, 1, 0])
+            return {"ok": True}
+        except FeatureReportError as e:
+            return {"ok": False, "error": str(e)}
+
+    def nvs_unlock(self):
+        try:
+            self.send_feature_report(0xa0, [10, 2, *DS4_UNLOCK_KEY])
+            return {"ok": True}
+        except FeatureReportError as e:
+            return {"ok": False, "error": str(e)}
+
+    def get_bd_addr(self):
+        view = self.receive_feature_report(0x12)
+        return ":".join(f"{view[1 + 5 - i]:02X}" for i in range(6))
+
+    def _calibration_status(self):
+        data = self.receive_feature_report(0x91)
+        data2 = self.receive_feature_report(0x92)
+        return [_u32be(v, 0) if len(v) == 4 else None for v in (data, data2)]
+
+    def _calibrate(self, command, expected, code):
+        try:
+            self.send_feature_report(0x90, command)
+            self.sleep(200)
+            d1, d2 = self._calibration_status()
+            if (d1, d2) != expected:
+                return {"ok": False, "code": code, "d1": d1, "d2": d2}
+            return {"ok": True}
+        except FeatureReportError as e:
+            return {"ok": False, "error": str(e)}
+
+    def calibrate_range_begin(self):
+        return self._calibrate([1, 1, 2], (0x91010201, 0x920102ff), 1)
+
+    def calibrate_range_end(self):
+        return self._calibrate([2, 1, 2], (0x91010202, 0x92010201), 3)
+
+    def calibrate_sticks_begin(self):
+        return self._calibrate([1, 1, 1], (0x91010101, 0x920101ff), 1)
+
+    def calibrate_sticks_sample(self):
+        return self._calibrate([3, 1, 1], (0x91010101, 0x920101ff), 2)
+
+    def calibrate_sticks_end(self):
+        return self._calibrate([2, 1, 1], (0x91010102, 0x92010101), 3)
+
+    def query_nv_status(self):
+        try:
+            self.send_feature_report(0x08, [0xff, 0, 12])
+            data = self.receive_feature_report(0x11)
+            ret = data[1]
+            if ret == 1:
+                return {"device": 'ds4', "status": 'locked', "locked": True, "code": ret}
+            if ret == 0:
+                return {"device": 'ds4', "status": 'unlocked', "locked": False, "code": ret}
+            return {"device": 'ds4', "status": 'unknown', "locked": None, "code": ret}
+        except FeatureReportError as e:
+            return {"device": 'ds4', "status": 'error', "locked": None, "code": 2, "error": str(e)}
+
+class DS5Protocol:
+    """Port of DS5Controller (js/controllers/ds5-controller.js)."""
+
+    module_data_command = 2
+
+    def __init__(self, transport):
+        self.transport = transport
+        self.send_feature_report = transport.send_feature_report
+        self.receive_feature_report = transport.receive_feature_report
+        self.sleep = transport.sleep
+
+    def get_serial_number(self):
+        return self.get_system_info(1, 19, 17)
+
+    def get_info(self):
+        try:
+            view = self.receive_feature_report(0x20)
+            if view[0] != 0x20 or len(view) != 64:
+                return {"ok": False, "error": "Invalid response for ds5_info"}
+            build_date = view[1:12].decode('ascii', 'replace')
+            self.get_system_info(1, 19, 17)
+            for base, num, length, decode in ((1, 9, 9, False), (1, 17, 14, True), (1, 24, 23, True),
+                                              (1, 26, 16, True), (1, 28, 16, True), (5, 2, 8, False),
+                                              (5, 4, 8, False)):
+                self.get_system_info(base, num, length, decode)
+            disable_bits = 2 if re.search(r" 2020| 2021", build_date) else 0
+            nv = self.query_nv_status()
+            self.get_bd_addr()
+            return {"ok": True, "nv": nv, "disable_bits": disable_bits,
+                    "pending_reboot": nv["status"] == 'pending_reboot'}
+        except FeatureReportError as e:
+            return {"ok": False, "error": str(e), "disable_bits": 1}
+
+    def flash(self):
+        self.nvs_unlock()
+        lock = self.nvs_lock()
+        if not lock["ok"]:
+            raise WorkflowError("Error while saving changes")
+        return {"success": True}
+
+    def reset(self):
+        try:
+            self.send_feature_report(0x80, [1, 1])
+        except FeatureReportError:
+            pass
+
+    def nvs_lock(self):
+        try:
+            self.send_feature_report(0x80, [3, 1])
+            self.receive_feature_report(0x81)
+            return {"ok": True}
+        except FeatureReportError as e:
+            return {"ok": False, "error": str(e)}
+
+    def nvs_unlock(self):
+        try:
+            self.send_feature_report(0x80, [3, 2, *DS5_UNLOCK_KEY])
+            self.receive_feature_report(0x81)
+        except FeatureReportError as e:
+            self.sleep(500)
+            raise WorkflowError("NVS Unlock failed") from e
+
+    def get_bd_addr(self):
+        self.send_feature_report(0x80, [9, 2])
+        data = self.receive_feature_report(0x81)
+        return ":".join(f"{data[4 + 5 - i]:02X}" for i in range(6))
+
+    def get_system_info(self, base, num, length, decode=True):
+        self.send_feature_report(0x80, [base, num])
+        data = self.receive_feature_report(0x81)
+        if data[1] != base or data[2] != num or data[3] != 2:
+            return "error"
+        value = data[4:4 + length]
+        return value.decode('ascii', 'replace') if decode else value.hex()
+
+    def _calibrate(self, command, expected):
+        try:
+            self.send_feature_report(0x82, command)
+            data = self.receive_feature_report(0x83)
+            if _u32be(data, 0) != expected:
+                return {"ok": False, "error": f"Stick calibration failed: {_hex32(_u32be(data, 0))}"}
+            return {"ok": True}
+        except FeatureReportError as e:
+            return {"ok": False, "error": str(e)}
+
+    def calibrate_sticks_begin(self):
+        return self._calibrate([1, 1, 1], 0x83010101)
+
+    def calibrate_sticks_sample(self):
+        return self._calibrate([3, 1, 1], 0x83010101)
+
+    def calibrate_sticks_end(self):
+        return self._calibrate([2, 1, 1], 0x83010102)
+
+    def calibrate_range_begin(self):
+        return self._calibrate([1, 1, 2], 0x83010201)
+
+    def calibrate_range_end(self):
+        return self._calibrate([2, 1, 2], 0x83010202)
+
+    def query_nv_status(self):
+        try:
+            self.send_feature_report(0x80, [3, 3])
+            data = self.receive_feature_report(0x81)
+            ret = _u32be(data, 1)
+            for status, code in DS5_NV_CODES.items():
+                if ret == code:
+                    return {"device": 'ds5', "status": status, "locked": {'locked': True, 'unlocked': False}.get(status),
+                            "raw": ret}
+            return {"device": 'ds5', "status": 'unknown', "locked": None, "raw": ret}
+        except FeatureReportError as e:
+            return {"device": 'ds5', "status": 'error', "locked": None, "code": 2, "error": str(e)}
+
+    def get_in_memory_module_data(self):
+        self.send_feature_report(0x80, [12, self.module_data_command])
+        self.sleep(100)
+        data = self.receive_feature_report(0x81)
+        if data[0] != 129 or data[1] != 12 or data[2] not in (2, 4) or data[3] != 2:
+            return None
+        return list(struct.unpack_from('<12H', data, 4))
+
+    def write_finetune_data(self, data):
+        self.send_feature_report(0x80, [12, 1] + [byte for value in data for byte in (value & 0xff, value >> 8)])
+
+class DS5EdgeProtocol(DS5Protocol):
+    """Port of DS5EdgeController (js/controllers/ds5-edge-controller.js)."""
+
+    module_data_command = 4
+
+    def get_info(self):
+        result = super().get_info()
+        if result["ok"]:
+            try:
+                self.get_barcode()
+            except WorkflowError:
+                pass
+        return result
+
+    def flash(self):
+        if self.flash_modules():
+            return {"success": True}
+
+    def get_barcode(self):
+        try:
+            self.send_feature_report(0x80, [21, 34, 0])
+            self.sleep(100)
+            r_data = self.receive_feature_report(0x81)
+            self.send_feature_report(0x80, [21, 34, 1])
+            self.sleep(100)
+            l_data = self.receive_feature_report(0x81)
+            return [l_data[21:38], r_data[21:38]]
+        except FeatureReportError as e:
+            raise WorkflowError("Cannot read module barcodes") from e
+
+    def unlock_module(self, i):
+        self.send_feature_report(0x80, [21, 6, i, 11])
+        self.sleep(200)
+        if not self.wait_until_written([21, 6, 2]):
+            raise WorkflowError(f"Cannot unlock module {i}")
+
+    def lock_module(self, i):
+        self.send_feature_report(0x80, [21, 4, i, 8])
+        self.sleep(200)
+        if not self.wait_until_written([21, 4, 2]):
+            raise WorkflowError(f"Cannot lock module {i}")
+
+    def flash_modules(self):
+        self.sleep(100)
+        self.unlock_module(0)
+        self.unlock_module(1)
+        self.nvs_unlock()
+        self.sleep(50)
+        data = self.get_in_memory_module_data()
+        self.sleep(50)
+        self.write_finetune_data(data)
+        self.sleep(100)
+        self.lock_module(0)
+        self.lock_module(1)
+        self.sleep(100)
+        lock = self.nvs_lock()
+        if not lock["ok"]:
+            raise WorkflowError("NVS lock failed")
+        self.sleep(250)
+        return True
+
+    def wait_until_written(self, expected):
+        for _ in range(10):
+            data = self.receive_feature_report(0x81)
+            if list(data[1:1 + len(expected)]) == expected:
+                return True
+            self.sleep(50)
+        return False
+
+    def _calibrate_twice(self, command, first, second, code):
+        try:
+            self.send_feature_report(0x82, command)
+            data = self.receive_feature_report(0x83)
+            if _u32be(data, 0) != first:
+                return {"ok": False, "code": code, "d1": _hex32(_u32be(data, 0))}
+            self.send_feature_report(0x82, command)
+            data = self.receive_feature_report(0x83)
+            if _u32be(data, 0) not in second:
+                return {"ok": False, "code": code + 1, "d1": _hex32(_u32be(data, 0))}
+            return {"ok": True}
+        except FeatureReportError as e:
+            return {"ok": False, "error": str(e)}
+
+    def calibrate_sticks_end(self):
+        return self._calibrate_twice([2, 1, 1], 0x83010101, (0x83010103, 0x83010312), 4)
+
+    def calibrate_range_end(self):
+        return self._calibrate_twice([2, 1, 2], 0x83010201, (0x83010203,), 4)
+
+PROTOCOLS = {
+    'DS4': DS4Protocol,
+    'DS5': DS5Protocol,
+    'DS5_Edge': DS5EdgeProtocol,
+}
+
+# ---- Ports of js/controller-manager.js and the modals ----
+
+class ControllerManager:
+    """Port of the calibration and NVS methods of ControllerManager (js/controller-manager.js)."""
+
+    def __init__(self, controller):
+        self.controller = controller
+        self.sleep = controller.sleep
+
+    def query_nv_status(self):
+        return self.controller.query_nv_status()
+
+    def flash(self):
+        # _clearControllerState() reads the serial number
+        self.controller.get_serial_number()
+        return self.controller.flash()
+
+    def nvs_unlock(self):
+        self.controller.nvs_unlock()
+        self.query_nv_status()
+
+    def nvs_lock(self):
+        res = self.controller.nvs_lock()
+        if not res["ok"]:
+            raise WorkflowError("NVS Lock failed")
+        self.query_nv_status()
+        return res
+
+    def calibrate_sticks_begin(self):
+        res = self.controller.calibrate_sticks_begin()
+        if not res["ok"]:
+            raise WorkflowError(NOT_GENUINE_SONY_CONTROLLER_MSG)
+
+    def calibrate_sticks_sample(self):
+        res = self.controller.calibrate_sticks_sample()
+        if not res["ok"]:
+            self.sleep(500)
+            raise WorkflowError("Stick calibration failed")
+
+    def calibrate_sticks_end(self):
+        res = self.controller.calibrate_sticks_end()
+        if not res["ok"]:
+            self.sleep(500)
+            raise WorkflowError("Stick calibration failed")
+
+    def calibrate_range_begin(self):
+        res = self.controller.calibrate_range_begin()
+        if not res["ok"]:
+            raise WorkflowError(NOT_GENUINE_SONY_CONTROLLER_MSG)
+
+    def calibrate_range_on_close(self):
+        res = self.controller.calibrate_range_end()
+        if res["ok"] or res.get("code") in (3, 4, 5):
+            return {"success": True}
+        self.sleep(500)
+        return {"success": False, "message": "Range calibration failed"}
+
+    def calibrate_sticks(self):
+        self.calibrate_sticks_begin()
+        for _ in range(5):
+            self.sleep(100)
+            self.calibrate_sticks_sample()
+        self.calibrate_sticks_end()
+        return {"success": True}
+
+def multi_calibrate_sticks(manager):
+    """Automatic stick center calibration (multiCalibrateSticks() in js/modals/calib-center-modal.js)."""
+    manager.sleep(1000)
+    manager.calibrate_sticks()
+    manager.sleep(500)
+
+def _hide_spinner(manager):
+    manager.sleep(200)
+
+def calibration_steps(manager):
+    """Step-by-step stick center calibration (calibrationSteps() in js/modals/calib-center-modal.js).
+
+    The time the user takes between the steps is not counted.
+    """
+    manager.sleep(100)
+    manager.calibrate_sticks_begin()
+    _hide_spinner(manager)
+    for _ in range(3):
+        manager.sleep(150)
+        manager.calibrate_sticks_sample()
+        _hide_spinner(manager)
+    manager.calibrate_sticks_sample()
+    manager.sleep(200)
+    manager.sleep(500)
+    manager.calibrate_sticks_end()
+    _hide_spinner(manager)
+
+def range_calibration(manager):
+    """Stick range calibration (open() and onClose() in js/modals/calib-range-modal.js), without the rotations."""
+    manager.sleep(1000)
+    manager.calibrate_range_begin()
+    result = manager.calibrate_range_on_close()
+    if not result["success"]:
+        raise WorkflowError(result["message"])
+
+def finetune_open(manager):
+    """Opening the finetune modal (init() in js/modals/finetune-modal.js)."""
+    nv = manager.query_nv_status()
+    if not nv["locked"]:
+        manager.nvs_lock()
+        nv2 = manager.query_nv_status()
+        if not nv2["locked"]:
+            raise WorkflowError("Cannot lock NVS")
+    elif nv["status"] != 'locked':
+        raise WorkflowError("Cannot read NVS status. Finetuning is not safe on this device.")
+    if manager.controller.get_in_memory_module_data() is None:
+        raise WorkflowError("Cannot read calibration data")
+
+def finetune_write(manager):
+    """One change of a finetune value (_writeFinetuneData() in js/modals/finetune-modal.js)."""
+    manager.controller.write_finetune_data(list(DEFAULT_FINETUNE_DATA))
+
+def connect_info(manager):
+    """Reading the controller information on connection (getInfo())."""
+    info = manager.controller.get_info()
+    if not info["ok"]:
+        raise WorkflowError(info["error"])
+    if info.get("is_clone"):
+        raise WorkflowError("clone detected")
+
+def save_changes(manager):
+    """Saving the changes permanently (flash_all_changes() in js/core.js)."""
+    manager.flash()
+
+# name -> (function, models it applies to or None for all)
+WORKFLOWS = {
+    'info': (connect_info, None),
+    'center-auto': (multi_calibrate_sticks, None),
+    'center-steps': (calibration_steps, None),
+    'range': (range_calibration, None),
+    'finetune-open': (finetune_open, ('DS5', 'DS5_Edge')),
+    'finetune-write': (finetune_write, ('DS5', 'DS5_Edge')),
+    'save': (save_changes, None),
+}
+
+def run_workflow(name, device, transfer_ms=DEFAULT_TRANSFER_MS):
+    """Run a workflow on a virtual controller. Returns (result dict, transport)."""
+    function, _ = WORKFLOWS[name]
+    transport = LocalTransport(device, transfer_ms)
+    manager = ControllerManager(PROTOCOLS[device.model](transport))
+    result = {"model": device.model, "workflow": name, "ok": True}
+    try:
+        function(manager)
+    except (WorkflowError, FeatureReportError) as e:
+        result["ok"] = False
+        result["error"] = str(e)
+    result.update(transport.stats())
+    return result, transport
+
+def expected_ok(model):
+    """Whether the workflows should succeed on a model.
+
+    Clones are detected on connection and reject calibration and NVS commands,
+    so every workflow fails on them, like in the web app.
+    """
+    return not model.startswith('ds4_clone')
+
+def run(models, workflows, nv_status='locked', transfer_ms=DEFAULT_TRANSFER_MS, verbose=False):
+    """Run workflows on fresh virtual controllers.
+
+    Returns the list of results; "expected" tells whether "ok" is the expected outcome.
+    """
+    results = []
+    for model in models:
+        for name in workflows:
+            device = MODELS[model](nv_status)
+            allowed = WORKFLOWS[name][1]
+            if allowed is not None and device.model not in allowed:
+                continue
+            result, transport = run_workflow(name, device, transfer_ms)
+            result["model"] = model
+            result["expected"] = result["ok"] == expected_ok(model)
+            if verbose:
+                result["log"] = transport.log
+            results.append(result)
+    return results
+
+def print_results(results, verbose=False):
+    print(f"{'Model':<16} {'Workflow':<15} {'Round trips':>11} {'Sleeps':>7} {'Sleep ms':>9} {'Transfer ms':>11} "
+          f"{'Total ms':>9}  Result")
+    for result in results:
+        status = "ok" if result["ok"] else f"failed: {result['error']}"
+        if not result["expected"]:
+            status = f"UNEXPECTED, {status}"
+        print(f"{result['model']:<16} {result['workflow']:<15} {result['round_trips']:>11} {result['sleeps']:>7} "
+              f"{result['sleep_ms']:>9} {result['transfer_ms']:>11.1f} {result['total_ms']:>9.1f}  {status}")
+        if verbose:
+            for entry in result["log"]:
+                if entry["op"] == 'sleep':
+                    print(f"  {entry['time']:>9.1f}  sleep {entry['ms']}")
+                else:
+                    print(f"  {entry['time']:>9.1f}  {entry['op']:<7} {entry['report_id']:#04x} {entry['data']}")
+
+# ---- Local transport server ----
+
+class _TransportHandler(socketserver.StreamRequestHandler):
+    """One JSON request per line: {"op": "send", "report_id", "data": hex}, {"op": "receive", "report_id"},
+    {"op": "sleep", "ms"}, {"op": "stats"} or {"op": "reset_stats"}; one JSON reply per line.
+    """
+
+    def handle(self):
+        transport = self.server.transport
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                op = request["op"]
+                if op == 'send':
+                    transport.send_feature_report(request["report_id"], bytes.fromhex(request["data"]))
+                    reply = {"ok": True}
+                elif op == 'receive':
+                    reply = {"ok": True, "data": transport.receive_feature_report(request["report_id"]).hex()}
+                elif op == 'sleep':
+                    transport.sleep(request["ms"])
+                    reply = {"ok": True}
+                elif op == 'stats':
+                    reply = {"ok": True, **transport.stats()}
+                elif op == 'reset_stats':
+                    transport.reset_stats()
+                    reply = {"ok": True}
+                else:
+                    reply = {"ok": False, "error": f"unknown op {op!r}"}
+            except (ValueError, KeyError, TypeError, FeatureReportError) as e:
+                reply = {"ok": False, "error": str(e)}
+            self.wfile.write(json.dumps(reply).encode('utf-8') + b"\n")
+
+def serve(model, nv_status='locked', port=DEFAULT_PORT, transfer_ms=DEFAULT_TRANSFER_MS):
+    """Serve a virtual controller on 127.0.0.1:port until interrupted."""
+    with socketserver.TCPServer(('127.0.0.1', port), _TransportHandler) as server:
+        server.transport = LocalTransport(MODELS[model](nv_status), transfer_ms)
+        print(f"Virtual {model} ({nv_status}) on 127.0.0.1:{server.server_address[1]}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+# ---- Synchronization with the JavaScript sources ----
+
+DS4_JS = Path("js/controllers/ds4-controller.js")
+DS5_JS = Path("js/controllers/ds5-controller.js")
+DS5_EDGE_JS = Path("js/controllers/ds5-edge-controller.js")
+MANAGER_JS = Path("js/controller-manager.js")
+CALIB_CENTER_JS = Path("js/modals/calib-center-modal.js")
+CALIB_RANGE_JS = Path("js/modals/calib-range-modal.js")
+
+# Port -> JavaScript methods it mirrors, in order; their sleep() calls must be the same
+SYNCED_SLEEPS = (
+    (DS4Protocol._calibrate, [(DS4_JS, 'calibrateSticksBegin')]),
+    (DS4Protocol.nvs_lock, [(DS4_JS, 'nvsLock')]),
+    (DS4Protocol.query_nv_status, [(DS4_JS, 'queryNvStatus')]),
+    (DS5Protocol.nvs_unlock, [(DS5_JS, 'nvsUnlock')]),
+    (DS5Protocol._calibrate, [(DS5_JS, 'calibrateSticksBegin')]),
+    (DS5Protocol.get_in_memory_module_data, [(DS5_JS, 'getInMemoryModuleData')]),
+    (DS5Protocol.write_finetune_data, [(DS5_JS, 'writeFinetuneData')]),
+    (DS5EdgeProtocol.get_barcode, [(DS5_EDGE_JS, 'getBarcode')]),
+    (DS5EdgeProtocol.unlock_module, [(DS5_EDGE_JS, 'unlockModule')]),
+    (DS5EdgeProtocol.lock_module, [(DS5_EDGE_JS, 'lockModule')]),
+    (DS5EdgeProtocol.flash_modules, [(DS5_EDGE_JS, 'flashModules')]),
+    (DS5EdgeProtocol.wait_until_written, [(DS5_EDGE_JS, 'waitUntilWritten')]),
+    (DS5EdgeProtocol._calibrate_twice, [(DS5_EDGE_JS, 'calibrateSticksEnd')]),
+    (ControllerManager.calibrate_sticks_sample, [(MANAGER_JS, 'calibrateSticksSample')]),
+    (ControllerManager.calibrate_sticks_end, [(MANAGER_JS, 'calibrateSticksEnd')]),
+    (ControllerManager.calibrate_range_on_close, [(MANAGER_JS, 'calibrateRangeOnClose')]),
+    (ControllerManager.calibrate_sticks, [(MANAGER_JS, 'calibrateSticks')]),
+    (multi_calibrate_sticks, [(CALIB_CENTER_JS, 'multiCalibrateSticks')]),
+    (calibration_steps, [(CALIB_CENTER_JS, 'calibrationSteps')]),
+    (_hide_spinner, [(CALIB_CENTER_JS, '_hideSpinner')]),
+    (range_calibration, [(CALIB_RANGE_JS, 'open'), (CALIB_RANGE_JS, 'onClose')]),
+)
+
+# Calibration methods whose sleeps are the same as the one listed above for the shared helper
+SYNCED_SAME_SLEEPS = (
+    (DS4_JS, ('calibrateSticksSample', 'calibrateSticksEnd', 'calibrateRangeBegin', 'calibrateRangeEnd')),
+    (DS5_JS, ('calibrateSticksSample', 'calibrateSticksEnd', 'calibrateRangeBegin', 'calibrateRangeEnd')),
+    (DS5_EDGE_JS, ('calibrateRangeEnd',)),
+)
+
+SLEEP_PATTERN = re.compile(r"\bsleep\((\d+)\)")
+
+def read_js_method(path, name, root=Path(".")):
+    """Return the body of a class method in a JavaScript file."""
+    with open(Path(root) / path, 'r', encoding='utf-8') as f:
+        source = f.read()
+    match = re.search(rf"\n  (?:async\*? )?{re.escape(name)}\([^)]*\) \{{", source)
+    if match is None:
+        raise ValueError(f"cannot find {name}()")
+    return source[match.end():source.index("\n  }\n", match.end())]
+
+def _sleeps(text):
+    return [int(ms) for ms in SLEEP_PATTERN.findall(text)]
+
+def check_sleeps(root=Path(".")):
+    """Compare the sleep() calls of the ports with the JavaScript methods. Returns the problems."""
+    problems = []
+    for port, methods in SYNCED_SLEEPS:
+        expected = []
+        try:
+            for path, name in methods:
+                expected += _sleeps(read_js_method(path, name, root))
+        except (OSError, ValueError) as e:
+            problems.append(f"Error reading {path}: {e}")
+            continue
+        actual = _sleeps(inspect.getsource(port))
+        if actual != expected:
+            js_names = ", ".join(f"{name}()" for _, name in methods)
+            problems.append(f"{port.__qualname__} sleeps {actual}, {js_names} sleeps {expected}")
+    for path, names in SYNCED_SAME_SLEEPS:
+        try:
+            reference = _sleeps(read_js_method(path, {DS5_EDGE_JS: 'calibrateSticksEnd'}.get(path,
+                                                                                         'calibrateSticksBegin'), root))
+            for name in names:
+                if _sleeps(read_js_method(path, name, root)) != reference:
+                    problems.append(f"{path}: {name}() does not sleep like the other calibration methods")
+        except (OSError, ValueError) as e:
+            problems.append(f"Error reading {path}: {e}")
+    return problems
+
+def check_workflows():
+    """Run every workflow on every model and compare with the expected outcomes. Returns the problems."""
+    problems = []
+    for result in run(MODELS, WORKFLOWS):
+        if not result["expected"]:
+            problems.append(f"{result['model']} {result['workflow']}: "
+                            f"{'succeeded' if result['ok'] else 'failed: ' + result['error']}")
+
+    # Finetuning locks an unlocked NVS first; saving leaves it locked, with the calibration stored
+    device = VirtualDS5('unlocked')
+    result, _ = run_workflow('finetune-open', device)
+    if not result["ok"] or device.nv_status != 'locked':
+        problems.append(f"ds5 finetune-open with unlocked NVS: NVS {device.nv_status}, {result}")
+    device = VirtualDS5Edge()
+    transport = LocalTransport(device)
+    manager = ControllerManager(DS5EdgeProtocol(transport))
+    calibration_steps(manager)
+    manager.flash()
+    if device.stored != [(CALIBRATION_CENTER, 4, False)] or device.modules_locked != [True, True] \
+            or device.nv_status != 'locked':
+        problems.append(f"ds5_edge calibration and save: stored {device.stored}, "
+                        f"modules locked {device.modules_locked}, NVS {device.nv_status}")
+    return problems
+
+def verify(root=Path(".")):
+    """Check the ports against the JavaScript sources and the workflows. Returns the exit code."""
+    sleep_problems = check_sleeps(root)
+    for problem in sleep_problems:
+        print(f"  - {problem}")
+    print(f"{len(SYNCED_SLEEPS)} ports compared with the JavaScript sources, {len(sleep_problems)} problems")
+    workflow_problems = check_workflows()
+    for problem in workflow_problems:
+        print(f"  - {problem}")
+    print(f"Workflows run on {len(MODELS)} models, {len(workflow_problems)} problems")
+    return 1 if sleep_problems or workflow_problems else 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate controllers to measure the calibration workflows.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    run_parser = subparsers.add_parser('run', help="run workflows on virtual controllers")
+    run_parser.add_argument('--model', choices=sorted(MODELS), action='append',
+                            help="virtual controller (repeatable, default: all)")
+    run_parser.add_argument('--workflow', choices=list(WORKFLOWS), action='append',
+                            help="workflow (repeatable, default: all)")
+    run_parser.add_argument('--nv', choices=NV_STATES[:2], default='locked', help="initial NVS state (default: locked)")
+    run_parser.add_argument('--transfer-ms', type=float, default=DEFAULT_TRANSFER_MS,
+                            help=f"time of a feature report round trip (default: {DEFAULT_TRANSFER_MS})")
+    run_parser.add_argument('--json', action='store_true', help="print the results in JSON format")
+    run_parser.add_argument('-v', '--verbose', action='store_true', help="list the transfers and sleeps")
+    serve_parser = subparsers.add_parser('serve', help="serve a virtual controller on a local TCP port")
+    serve_parser.add_argument('model', choices=sorted(MODELS))
+    serve_parser.add_argument('--nv', choices=NV_STATES, default='locked', help="initial NVS state (default: locked)")
+    serve_parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f"port (default: {DEFAULT_PORT})")
+    serve_parser.add_argument('--transfer-ms', type=float, default=DEFAULT_TRANSFER_MS,
+                              help=f"time of a feature report round trip (default: {DEFAULT_TRANSFER_MS})")
+    subparsers.add_parser('verify', help="check the ports against the JavaScript sources")
+    args = parser.parse_args()
+
+    if args.command == 'verify':
+        return verify()
+    if args.command == 'serve':
+        try:
+            serve(args.model, args.nv, args.port, args.transfer_ms)
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 2
+        return 0
+
+    results = run(args.model or sorted(MODELS), args.workflow or list(WORKFLOWS), args.nv, args.transfer_ms,
+                  args.verbose)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_results(results, args.verbose)
+    return 0 if all(result["expected"] for result in results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())